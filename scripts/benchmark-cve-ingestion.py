@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+
+"""
+Time the set-based CVE ingestion path with a synthetic CVE feed,
+in three passes: creating every CVE, resyncing the same feed and
+resyncing it with a tenth of the CVEs changed.
+
+Run it against a database migrated with `alembic upgrade head`:
+
+    scripts/benchmark-cve-ingestion.py --count 100000
+
+The synthetic CVEs are deleted afterwards.
+"""
+
+# Standard library
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+# Local
+from webapp.security.database import db_session  # noqa: E402
+from webapp.security.ingestion import (  # noqa: E402
+    batches,
+    new_counters,
+    upsert_cves,
+)
+from webapp.security.models import CVE, Package, Status  # noqa: E402
+from webapp.security.registry import release_registry  # noqa: E402
+from webapp.security.schemas import CVESchema  # noqa: E402
+
+
+STATUSES = ["released", "needed", "DNE", "not-affected"]
+
+
+def synthetic_cve(number, codenames, revision=0):
+    packages = []
+
+    for package_number in (number % 5000, (number * 7) % 5000):
+        packages.append(
+            {
+                "name": f"bench-package-{package_number}",
+                "source": "",
+                "ubuntu": "",
+                "debian": "",
+                "statuses": [
+                    {
+                        "release_codename": codename,
+                        "status": STATUSES[(number + index) % len(STATUSES)],
+                        "description": f"revision {revision}",
+                    }
+                    for index, codename in enumerate(codenames)
+                ],
+            }
+        )
+
+    return {
+        "id": f"CVE-BENCH-{number:07d}",
+        "published": "2021-01-01T00:00:00",
+        "description": f"Synthetic vulnerability {number}, rev {revision}",
+        "status": "active",
+        "priority": "medium",
+        "notes": [{"author": "benchmark", "note": "Synthetic"}],
+        "references": [f"https://example.com/{number}"],
+        "bugs": [],
+        "patches": {},
+        "tags": {},
+        "packages": packages,
+    }
+
+
+def ingest(feed, batch_size):
+    cves_schema = CVESchema(many=True)
+    cves_schema.context["release_codenames"] = release_registry.codenames()
+    counters = new_counters()
+
+    start = time.perf_counter()
+
+    # Committed batch by batch, like the API does
+    for batch in batches(feed, batch_size):
+        upsert_cves(cves_schema.load(batch), counters)
+        db_session.commit()
+
+    return time.perf_counter() - start, counters
+
+
+def cleanup():
+    bench_cves = CVE.id.like("CVE-BENCH-%")
+    db_session.query(Status).filter(Status.cve_id.like("CVE-BENCH-%")).delete(
+        synchronize_session=False
+    )
+    db_session.query(CVE).filter(bench_cves).delete(synchronize_session=False)
+    db_session.query(Package).filter(
+        Package.name.like("bench-package-%")
+    ).delete(synchronize_session=False)
+    db_session.commit()
+
+
+parser = argparse.ArgumentParser(description="Benchmark CVE ingestion")
+parser.add_argument("--count", action="store", type=int, default=100000)
+parser.add_argument("--batch-size", action="store", type=int, default=1000)
+parser.add_argument("--releases", action="store", type=int, default=4)
+args = parser.parse_args()
+
+release_count = args.releases
+supported = release_registry.supported_releases()[-release_count:]
+codenames = [release.codename for release in supported]
+
+passes = [
+    ("create", lambda number: 0),
+    ("resync", lambda number: 0),
+    ("10% changed", lambda number: 1 if number % 10 == 0 else 0),
+]
+
+print(f"{args.count} CVEs, {len(codenames)} releases, 2 packages per CVE\n")
+
+try:
+    for name, revision in passes:
+        feed = (
+            synthetic_cve(number, codenames, revision(number))
+            for number in range(args.count)
+        )
+        seconds, counters = ingest(feed, args.batch_size)
+        changes = {
+            kind: dict(+counts) for kind, counts in counters.items() if +counts
+        }
+        print(
+            f"{name:<14}{seconds:>8.1f}s "
+            f"{args.count / seconds:>10.0f} CVEs/s  {changes}"
+        )
+finally:
+    cleanup()
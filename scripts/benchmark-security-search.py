@@ -0,0 +1,120 @@
+#! /usr/bin/env python3
+
+"""
+Compare the ilike search path against the search_vector full-text
+search path on the CVE table.
+
+To generate a synthetic corpus first (into an empty database that has
+been migrated with `alembic upgrade head`):
+
+    scripts/benchmark-security-search.py --populate 300000
+"""
+
+# Standard library
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+# Packages
+from sqlalchemy import text  # noqa: E402
+
+# Local
+from webapp.security.database import db_engine  # noqa: E402
+from webapp.security.search import tsquery_text  # noqa: E402
+
+
+WORDS = [
+    "buffer",
+    "overflow",
+    "openssl",
+    "kernel",
+    "denial",
+    "service",
+    "remote",
+    "attacker",
+    "memory",
+    "corruption",
+    "privilege",
+    "escalation",
+    "certificate",
+    "validation",
+    "heap",
+    "use-after-free",
+    "integer",
+    "crafted",
+    "packet",
+    "sandbox",
+]
+
+ILIKE_QUERY = text(
+    "SELECT id FROM cve "
+    "WHERE description ILIKE :pattern OR ubuntu_description ILIKE :pattern "
+    "ORDER BY published DESC NULLS LAST LIMIT 20"
+)
+
+SEARCH_QUERY = text(
+    "SELECT id FROM cve "
+    "WHERE search_vector @@ to_tsquery('english', :tsquery) "
+    "ORDER BY ts_rank_cd(search_vector, to_tsquery('english', :tsquery)) "
+    "DESC, published DESC NULLS LAST LIMIT 20"
+)
+
+
+def populate(connection, count):
+    words = "ARRAY[" + ", ".join(f"'{word}'" for word in WORDS) + "]"
+    random_word = f"({words})[1 + floor(random() * {len(WORDS)})::int]"
+    description = " || ' ' || ".join([random_word] * 12)
+
+    connection.execute(
+        text(
+            "INSERT INTO cve (id, published, description, status) "
+            "SELECT 'CVE-BENCH-' || n, "
+            "now() - (n || ' minutes')::interval, "
+            f"{description}, 'active' "
+            "FROM generate_series(1, :count) AS n"
+        ),
+        count=count,
+    )
+    connection.execute("ANALYZE cve")
+
+
+def time_query(connection, query, repeat, **params):
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(query, **params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(timings)
+
+
+parser = argparse.ArgumentParser(description="Benchmark CVE search")
+parser.add_argument("--populate", action="store", type=int, default=0)
+parser.add_argument("--repeat", action="store", type=int, default=5)
+parser.add_argument(
+    "terms", action="store", nargs="*", default=["openssl", "heap overflow"]
+)
+args = parser.parse_args()
+
+with db_engine.connect() as connection:
+    if args.populate:
+        print(f"Inserting {args.populate} synthetic CVEs...")
+        populate(connection, args.populate)
+
+    cve_count = connection.execute("SELECT count(*) FROM cve").scalar()
+    print(f"{cve_count} CVEs in database\n")
+    print(f"{'term':<24}{'ilike (ms)':>12}{'search (ms)':>14}")
+
+    for term in args.terms:
+        ilike_time = time_query(
+            connection, ILIKE_QUERY, args.repeat, pattern=f"%{term}%"
+        )
+        search_time = time_query(
+            connection, SEARCH_QUERY, args.repeat, tsquery=tsquery_text(term)
+        )
+        print(f"{term:<24}{ilike_time:>12.2f}{search_time:>14.2f}")
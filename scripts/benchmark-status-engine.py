@@ -0,0 +1,173 @@
+#! /usr/bin/env python3
+
+"""
+Benchmark the in-process status engine against SQL for the CVE index.
+
+Loads webapp.security.status_engine from the database, then times a
+page of the CVE index, its count and its facet counts for a set of
+filter combinations, through get_cves_query and through the engine,
+and checks that they agree. Requires NumPy.
+
+Usage:
+  DATABASE_URL=postgresql://... scripts/benchmark-status-engine.py \\
+    --repeat 5
+"""
+
+# Standard library
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+# Packages
+from sqlalchemy import func  # noqa: E402
+
+# Local
+from webapp.security.database import db_session  # noqa: E402
+from webapp.security.models import CVEFacet  # noqa: E402
+from webapp.security.pagination import paginate  # noqa: E402
+from webapp.security.queries import (  # noqa: E402
+    count_cves,
+    get_cve_facet_counts,
+    get_cves_query,
+)
+from webapp.security.registry import release_registry  # noqa: E402
+from webapp.security.status_engine import StatusEngine, numpy  # noqa: E402
+
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+parser.add_argument("--repeat", type=int, default=5)
+parser.add_argument("--limit", type=int, default=20)
+
+
+def filter_combinations():
+    """
+    Filters like the ones the CVE index is used with, for the most
+    common packages and the supported releases
+    """
+
+    codenames = [
+        release.codename for release in release_registry.supported_releases()
+    ]
+    packages = [
+        name
+        for name, in db_session.query(CVEFacet.package_name)
+        .group_by(CVEFacet.package_name)
+        .order_by(func.count().desc())
+        .limit(2)
+    ]
+    combinations = {
+        "none": {},
+        "priority": {"priority": "high"},
+        "component": {"component": "universe"},
+        "release status": {
+            "clean_versions": [codenames[-1:]],
+            "clean_statuses": [["needed"]],
+        },
+        "current releases": {
+            "priority": "medium",
+            "clean_versions": [codenames],
+            "clean_statuses": [["needed", "pending", "needs-triage"]],
+        },
+    }
+
+    for package in packages:
+        combinations[f"package {package}"] = {"package": package}
+        combinations[f"package {package} release"] = {
+            "package": package,
+            "clean_versions": [codenames[-1:], codenames[:1]],
+            "clean_statuses": [["released"], ["needed", "released"]],
+        }
+
+    for name, filters in combinations.items():
+        yield name, {
+            "query": "",
+            "priority": None,
+            "package": None,
+            "component": None,
+            "clean_versions": [],
+            "clean_statuses": [],
+            **filters,
+        }, codenames
+
+
+def timed(function, repeat):
+    """
+    The result of a function, and its median time in milliseconds
+    """
+
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+
+    return result, statistics.median(times)
+
+
+def main():
+    args = parser.parse_args()
+
+    if numpy is None:
+        sys.exit("The status engine requires NumPy")
+
+    engine = StatusEngine(enabled=True)
+    _, load_ms = timed(engine.load, 1)
+    index = engine.current()
+    size = sum(
+        value.nbytes
+        for value in vars(index).values()
+        if isinstance(value, numpy.ndarray)
+    )
+
+    print(
+        f"Loaded {len(index.cve_ids)} CVEs and {len(index.row_cve)} "
+        f"statuses in {load_ms:.0f}ms, {size / 2**20:.1f}MiB of arrays"
+    )
+    print(f"{'filters':<40} {'sql ms':>10} {'engine ms':>10} {'speedup':>8}")
+
+    mismatches = 0
+
+    for name, filters, codenames in filter_combinations():
+
+        def sql():
+            cves_query, sort_keys = get_cves_query(**filters)
+            ids, _ = paginate(cves_query, sort_keys, args.limit)
+
+            return (
+                ids,
+                count_cves(**filters),
+                get_cve_facet_counts(codenames, **filters),
+            )
+
+        def in_engine():
+            ids, _ = index.paginate(args.limit, **filters)
+
+            return (
+                ids,
+                index.count(**filters),
+                index.facet_counts(codenames, **filters),
+            )
+
+        sql_result, sql_ms = timed(sql, args.repeat)
+        engine_result, engine_ms = timed(in_engine, args.repeat)
+
+        if sql_result != engine_result:
+            mismatches += 1
+            name = f"{name} (MISMATCH)"
+
+        print(
+            f"{name:<40} {sql_ms:>10.1f} {engine_ms:>10.1f} "
+            f"{sql_ms / engine_ms:>7.0f}x"
+        )
+
+    if mismatches:
+        sys.exit(f"{mismatches} filter combinations didn't match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#! /usr/bin/env python3
+
+"""
+Bulk load CVEs or notices from tracker exports into the database.
+
+Reads JSON files, or every *.json file in directories, each holding a
+list of CVEs or notices in the shape the API accepts. Files are split
+into chunks which are validated, copied into staging tables and merged
+by parallel worker processes, see webapp.security.bulk_load.
+
+With --checkpoint, the chunks loaded are recorded in a file and are
+skipped when the same command is run again, so an interrupted load
+resumes where it stopped. Once loaded, the notices are rendered and
+the sitemap is refreshed. Load CVEs before the notices which refer to
+them, or the notices will create stub CVEs.
+
+Usage:
+  DATABASE_URL=postgresql://... scripts/bulk-load-security.py \\
+    cves --workers 4 --checkpoint cves.checkpoint path/to/cves/
+"""
+
+# Standard library
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+)
+
+sys.path.append(os.getcwd())
+
+# Packages
+import flask  # noqa: E402
+from marshmallow.exceptions import ValidationError  # noqa: E402
+from psycopg2 import Error as DatabaseError  # noqa: E402
+from sqlalchemy.exc import SQLAlchemyError  # noqa: E402
+
+# Local
+from webapp.security.bulk_load import load, validate  # noqa: E402
+from webapp.security.cache import VersionedCache  # noqa: E402
+from webapp.security.database import db_engine, db_session  # noqa: E402
+from webapp.security.registry import release_registry  # noqa: E402
+from webapp.security.rendering import rerender_notices  # noqa: E402
+from webapp.security.sitemaps import refresh_sitemap  # noqa: E402
+
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+parser.add_argument("kind", choices=["cves", "notices"])
+parser.add_argument("paths", nargs="+", help="JSON files or directories")
+parser.add_argument("--workers", type=int, default=os.cpu_count())
+parser.add_argument("--chunk-size", type=int, default=5000)
+parser.add_argument("--checkpoint", help="File recording the chunks loaded")
+
+
+def json_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".json"):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+
+    with open(path) as checkpoint_file:
+        return set(json.load(checkpoint_file))
+
+
+def write_checkpoint(path, loaded):
+    # Replaced atomically, so an interrupted write can't lose it
+    with open(f"{path}.tmp", "w") as checkpoint_file:
+        json.dump(sorted(loaded), checkpoint_file, indent=2)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def chunks(kind, paths, chunk_size, loaded):
+    """
+    The chunks of items to load, with a key identifying each one,
+    skipping the chunks already loaded
+    """
+
+    for path in json_files(paths):
+        stat = os.stat(path)
+
+        # A changed file is loaded again
+        file_key = f"{kind}:{os.path.abspath(path)}:{stat.st_mtime_ns}"
+
+        with open(path) as json_file:
+            items = json.load(json_file)
+
+        for start in range(0, len(items), chunk_size):
+            key = f"{file_key}:{start}"
+
+            if key not in loaded:
+                end = start + chunk_size
+                yield key, f"{path} [{start}:{end}]", items[start:end]
+
+
+def load_chunk(kind, items, release_codenames):
+    start = time.perf_counter()
+    counts, rows = load(kind, validate(kind, items, release_codenames))
+
+    return counts, rows, time.perf_counter() - start
+
+
+def main():
+    args = parser.parse_args()
+    loaded = read_checkpoint(args.checkpoint)
+    release_codenames = release_registry.codenames()
+
+    # So that the workers don't inherit, and share, open connections
+    db_session.remove()
+    db_engine.dispose()
+
+    totals = {"created": Counter(), "updated": Counter(), "deleted": Counter()}
+    total_rows = 0
+    failed = 0
+    start = time.perf_counter()
+
+    def finish(future, key, name):
+        nonlocal total_rows, failed
+
+        try:
+            counts, rows, seconds = future.result()
+        except ValidationError as error:
+            print(f"{name}: invalid: {json.dumps(error.messages)[:500]}")
+            failed += 1
+            return
+        except (DatabaseError, SQLAlchemyError) as error:
+            print(f"{name}: failed: {error}")
+            failed += 1
+            return
+
+        for name_counts in ["created", "updated", "deleted"]:
+            totals[name_counts].update(counts[name_counts])
+
+        total_rows += rows
+        print(
+            f"{name}: {rows} rows in {seconds:.1f}s "
+            f"({rows / seconds:.0f} rows/s)"
+        )
+
+        if args.checkpoint:
+            loaded.add(key)
+            write_checkpoint(args.checkpoint, loaded)
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = {}
+
+        for key, name, items in chunks(
+            args.kind, args.paths, args.chunk_size, loaded
+        ):
+            # Only a few chunks wait for a worker at a time, so that
+            # the parsed files aren't all held in memory
+            if len(futures) >= 2 * args.workers:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    finish(future, *futures.pop(future))
+
+            future = pool.submit(
+                load_chunk, args.kind, items, release_codenames
+            )
+            futures[future] = (key, name)
+
+        for future in as_completed(futures):
+            finish(future, *futures[future])
+
+    seconds = time.perf_counter() - start
+
+    # Every process reloads its cached stats and feeds
+    for version_name in ["security_stats", "notices_feed"]:
+        VersionedCache(version_name, ttl=0).invalidate()
+
+    db_session.commit()
+
+    if args.kind == "notices":
+        rendered = rerender_notices()
+
+        if rendered is None:
+            print("Notices are being rerendered by another process")
+        else:
+            print(f"Rendered {rendered} notices")
+
+    # Rendered with the site's templates
+    app = flask.Flask(
+        __name__, template_folder=os.path.join(os.getcwd(), "templates")
+    )
+
+    with app.app_context():
+        print(f"Wrote sitemap shards {refresh_sitemap(args.kind)}")
+
+    for name_counts, counts in totals.items():
+        print(f"{name_counts.capitalize()}: {dict(+counts)}")
+
+    print(
+        f"Loaded {total_rows} rows in {seconds:.1f}s "
+        f"({total_rows / seconds:.0f} rows/s), {failed} chunks failed"
+    )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,16 @@
 import argparse
 import json
 import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from http.cookiejar import MozillaCookieJar
+from statistics import median
 
 # Packages
+import requests
 from macaroonbakery import httpbakery
 
 
@@ -57,89 +63,243 @@ def guess_binary_links(binary, version, sources):
     return (source_link, version_link)
 
 
+def format_notice(notice):
+    """Build the notice payload accepted by /security/notices from a USN
+    in the database JSON format.
+    """
+
+    # format release_packages
+    release_packages = {}
+
+    for codename, packages in notice["releases"].items():
+        release_packages[codename] = []
+        for name, info in packages["sources"].items():
+            release_packages[codename].append(
+                {
+                    "name": name,
+                    "version": info["version"],
+                    "description": info["description"],
+                    "is_source": "true",
+                }
+            )
+
+        # Binaries mostly share a few versions, and the guess only
+        # depends on the version
+        links = {}
+
+        for name, info in packages["binaries"].items():
+            if info["version"] not in links:
+                links[info["version"]] = guess_binary_links(
+                    name, info["version"], packages["sources"]
+                )
+
+            source_link, version_link = links[info["version"]]
+            release_packages[codename].append(
+                {
+                    "name": name,
+                    "version": info["version"],
+                    "is_source": "false",
+                    "source_link": source_link,
+                    "version_link": version_link,
+                }
+            )
+
+    # format CVEs and references
+    cves = []
+    references = []
+    for reference in notice["cves"]:
+        if reference.startswith("CVE-"):
+            cves.append(reference)
+        else:
+            references.append(reference)
+
+    return {
+        "id": f"USN-{notice['id']}",
+        "description": notice["description"],
+        "references": references,
+        "cves": cves,
+        "release_packages": release_packages,
+        "title": notice["title"],
+        "published": datetime.fromtimestamp(notice["timestamp"]).isoformat(),
+        "summary": notice["summary"],
+        "instructions": notice.get("action"),
+    }
+
+
 parser = argparse.ArgumentParser(description="CLI to post USNs")
 parser.add_argument("file_path", action="store", type=str)
-parser.add_argument("--update", action="store_true", default=False)
+parser.add_argument(
+    "--update",
+    action="store_true",
+    default=False,
+    help="Update existing notices, rather than create new ones",
+)
+parser.add_argument(
+    "--batch",
+    action="store_true",
+    default=False,
+    help=(
+        "Send the notices in batches to the bulk endpoint, which "
+        "creates or updates them, rather than one request each"
+    ),
+)
+parser.add_argument(
+    "--batch-size",
+    action="store",
+    type=int,
+    default=100,
+    help="Number of notices to send in each request, with --batch",
+)
+parser.add_argument(
+    "--concurrency",
+    action="store",
+    type=int,
+    default=1,
+    help="Number of requests to send at once",
+)
+parser.add_argument(
+    "--retries",
+    action="store",
+    type=int,
+    default=5,
+    help=(
+        "Times to retry a PUT which failed with a 429, a 5xx or a "
+        "connection error, or a POST the server turned away"
+    ),
+)
 parser.add_argument(
     "--host", action="store", type=str, default="http://localhost:8001"
 )
 args = parser.parse_args()
 
 
+def notice_requests(notices):
+    """The method, URL and payload of each request to send the notices
+    with: batches for the bulk endpoint with --batch, otherwise one
+    POST, or PUT with --update, for each notice.
+    """
+
+    if args.batch:
+        for start in range(0, len(notices), args.batch_size):
+            end = start + args.batch_size
+            yield "PUT", notice_endpoint, notices[start:end]
+    elif args.update:
+        for notice in notices:
+            yield "PUT", f"{notice_endpoint}/{notice['id']}", notice
+    else:
+        for notice in notices:
+            yield "POST", notice_endpoint, notice
+
+
+def should_retry(method, response):
+    """Whether a request can be sent again after this response, or
+    connection error. PUTs can be retried after any failure, but a
+    POST which failed after reaching the server may have created its
+    notice, so it's only retried when the server turned it away.
+    """
+
+    if method != "POST":
+        return isinstance(response, requests.ConnectionError) or (
+            response.status_code == 429 or response.status_code >= 500
+        )
+
+    if isinstance(response, requests.ConnectionError):
+        return isinstance(response, requests.ConnectTimeout)
+
+    return response.status_code in [429, 503]
+
+
+def send_request(notice_request):
+    """Send a request, retrying with exponential backoff, or after the
+    Retry-After delay, while the server is overloaded or failing, see
+    should_retry.
+
+    Returns the last response, or the connection error, and the
+    latency of each attempt.
+    """
+
+    method, url, payload = notice_request
+    latencies = []
+
+    for attempt in range(args.retries + 1):
+        start = time.perf_counter()
+
+        try:
+            response = client.request(method, url=url, json=payload)
+        except requests.ConnectionError as error:
+            response = error
+
+        latencies.append(time.perf_counter() - start)
+
+        if not should_retry(method, response) or attempt == args.retries:
+            return response, latencies
+
+        delay = 2**attempt + random.random()
+        retry_after = getattr(response, "headers", {}).get("Retry-After")
+
+        if retry_after and retry_after.isdigit():
+            delay = int(retry_after)
+
+        time.sleep(delay)
+
+
 client = httpbakery.Client(cookies=MozillaCookieJar(".login"))
 
 if os.path.exists(client.cookies.filename):
     client.cookies.load(ignore_discard=True)
 
 notice_endpoint = f"{args.host}/security/notices"
-http_method = "PUT" if args.update else "POST"
 
-# Make a first call to make sure we are logged in
-response = client.request(http_method, url=notice_endpoint)
-client.cookies.save(ignore_discard=True)
+with open(args.file_path) as usn_json:
+    notices = [
+        format_notice(notice) for notice in json.load(usn_json).values()
+    ]
 
+requests_to_send = list(notice_requests(notices))
 
-with open(args.file_path) as usn_json:
-    payload = json.load(usn_json).items()
-
-    for notice_id, notice in payload:
-        # format release_packages
-        release_packages = {}
-
-        for codename, packages in notice["releases"].items():
-            release_packages[codename] = []
-            for name, info in packages["sources"].items():
-                release_packages[codename].append(
-                    {
-                        "name": name,
-                        "version": info["version"],
-                        "description": info["description"],
-                        "is_source": "true",
-                    }
-                )
+if requests_to_send:
+    # Make a first call to make sure we are logged in, so that the
+    # workers share the authenticated cookies, to the endpoint of the
+    # chosen mode. Without a payload, it doesn't write anything.
+    method, url, _ = requests_to_send[0]
+    client.request(method, url=url)
+    client.cookies.save(ignore_discard=True)
+
+latencies = []
+failed = 0
+start = time.perf_counter()
+
+with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+    for response, request_latencies in pool.map(
+        send_request, requests_to_send
+    ):
+        latencies.extend(request_latencies)
+
+        if isinstance(response, requests.ConnectionError):
+            print(response)
+            failed += 1
+            continue
 
-            for name, info in packages["binaries"].items():
-                source_link, version_link = guess_binary_links(
-                    name, info["version"], packages["sources"]
-                )
-                release_packages[codename].append(
-                    {
-                        "name": name,
-                        "version": info["version"],
-                        "is_source": "false",
-                        "source_link": source_link,
-                        "version_link": version_link,
-                    }
-                )
-        # format CVEs and references
-        cves = []
-        references = []
-        for reference in notice["cves"]:
-            if reference.startswith("CVE-"):
-                cves.append(reference)
-            else:
-                references.append(reference)
-
-        # Build endpoint
-        endpoint = notice_endpoint
-        if http_method == "PUT":
-            endpoint = f"{notice_endpoint}/USN-{notice['id']}"
-
-        response = client.request(
-            http_method,
-            url=endpoint,
-            json={
-                "id": f"USN-{notice['id']}",
-                "description": notice["description"],
-                "references": references,
-                "cves": cves,
-                "release_packages": release_packages,
-                "title": notice["title"],
-                "published": datetime.fromtimestamp(
-                    notice["timestamp"]
-                ).isoformat(),
-                "summary": notice["summary"],
-                "instructions": notice.get("action"),
-            },
-        )
         print(response, response.text)
+
+        if not response.ok:
+            failed += 1
+
+elapsed = time.perf_counter() - start
+
+print(
+    f"Sent {len(notices)} notices in {len(requests_to_send)} requests, "
+    f"{failed} failed, {len(latencies) - len(requests_to_send)} retries"
+)
+
+if latencies:
+    p95 = sorted(latencies)[int(len(latencies) * 0.95)]
+
+    print(
+        f"{elapsed:.1f}s, {len(notices) / elapsed:.1f} notices/s, "
+        f"request latency median {median(latencies):.2f}s, "
+        f"p95 {p95:.2f}s, max {max(latencies):.2f}s"
+    )
+
+if failed:
+    sys.exit(1)
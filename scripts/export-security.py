@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+
+"""
+Export the CVEs and notices to files, for /security/exports/.
+
+Writes a gzipped NDJSON file for the CVEs and one for the notices of
+each release, and an index.json listing them, to SECURITY_EXPORTS_DIR.
+Only the files of the releases with changes since the last export are
+rebuilt, see webapp.security.exports. Meant to be run regularly, e.g.
+from cron.
+
+Usage:
+  DATABASE_URL=postgresql://... SECURITY_EXPORTS_DIR=/srv/exports \\
+    scripts/export-security.py
+"""
+
+# Standard library
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+# Local
+from webapp.security.exports import (  # noqa: E402
+    EXPORT_FORMATS,
+    EXPORTS_DIR,
+    read_manifest,
+    refresh_exports,
+)
+
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+parser.add_argument("--directory", default=EXPORTS_DIR)
+parser.add_argument(
+    "--format", choices=sorted(EXPORT_FORMATS), default="ndjson"
+)
+parser.add_argument(
+    "--rebuild",
+    action="store_true",
+    help="Rebuild every file, rather than the ones with changes",
+)
+
+
+def main():
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    written = refresh_exports(
+        args.directory, export_format=args.format, rebuild=args.rebuild
+    )
+
+    manifest = read_manifest(args.directory)
+    rows = sum(manifest["files"][name]["rows"] for name in written)
+
+    print(
+        f"Wrote {len(written)} of {len(manifest['files'])} files, "
+        f"{rows} rows, in {time.perf_counter() - start:.1f}s"
+    )
+
+    for name in written:
+        print(f"  {manifest['files'][name]['file']}")
+
+    print(f"Export version {manifest['version']}")
+
+
+if __name__ == "__main__":
+    main()
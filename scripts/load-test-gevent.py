@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+
+"""
+Check that slow security queries don't stall the other requests served
+by a gevent worker.
+
+Serves a cheap template page and a page running a slow query from one
+gevent WSGI server, as a gevent worker would, and measures the latency
+of the template page alone and then while the slow queries run, along
+with how long the event loop was stalled. Exits with an error if the
+slow queries held up the template page.
+
+Usage:
+  DATABASE_URL=postgresql://... scripts/load-test-gevent.py
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+# Standard library
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+from statistics import median, quantiles  # noqa: E402
+from time import perf_counter  # noqa: E402
+from urllib.request import urlopen  # noqa: E402
+
+# Packages
+import flask  # noqa: E402
+import gevent  # noqa: E402
+from gevent.pool import Pool  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+sys.path.append(os.getcwd())
+
+# Local
+from webapp.security.database import (  # noqa: E402
+    cooperative_psycopg2,
+    db_session,
+)
+
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+parser.add_argument("--slow-queries", type=int, default=20)
+parser.add_argument("--query-seconds", type=float, default=2)
+parser.add_argument("--page-requests", type=int, default=200)
+parser.add_argument("--concurrency", type=int, default=10)
+args = parser.parse_args()
+
+app = flask.Flask(__name__)
+
+
+@app.route("/page")
+def page():
+    return flask.render_template_string(
+        "<ul>{% for item in items %}<li>{{ item }}</li>{% endfor %}</ul>",
+        items=range(100),
+    )
+
+
+@app.route("/slow")
+def slow():
+    db_session.execute(
+        "SELECT pg_sleep(:seconds)", {"seconds": args.query_seconds}
+    )
+    db_session.remove()
+
+    return "Done"
+
+
+def page_latencies(url):
+    def timed_request(_):
+        start = perf_counter()
+        urlopen(url).read()
+
+        return perf_counter() - start
+
+    return Pool(args.concurrency).map(timed_request, range(args.page_requests))
+
+
+def summary(latencies):
+    p95 = quantiles(latencies, n=20)[-1]
+
+    return f"median {median(latencies) * 1000:.1f}ms, p95 {p95 * 1000:.1f}ms"
+
+
+server = WSGIServer(("127.0.0.1", 0), app, log=None)
+server.start()
+base_url = f"http://127.0.0.1:{server.server_port}"
+
+print(f"Cooperative psycopg2: {cooperative_psycopg2}")
+
+baseline = page_latencies(f"{base_url}/page")
+print(f"Template page alone: {summary(baseline)}")
+
+# How late the event loop runs a greenlet which sleeps, which is
+# as long as any blocking call stalled the worker
+loop_delays = []
+
+
+def monitor_loop():
+    while True:
+        start = perf_counter()
+        gevent.sleep(0.01)
+        loop_delays.append(perf_counter() - start - 0.01)
+
+
+monitor = gevent.spawn(monitor_loop)
+slow_requests = [
+    gevent.spawn(lambda: urlopen(f"{base_url}/slow").read())
+    for _ in range(args.slow_queries)
+]
+# Let the slow queries start
+gevent.sleep(0.2)
+
+loaded = page_latencies(f"{base_url}/page")
+print(
+    f"Template page next to {args.slow_queries} queries of "
+    f"{args.query_seconds}s: {summary(loaded)}"
+)
+
+gevent.joinall(slow_requests, raise_error=True)
+monitor.kill()
+server.stop()
+
+print(f"Longest event loop stall: {max(loop_delays) * 1000:.1f}ms")
+
+if max(loop_delays + loaded) >= args.query_seconds / 2:
+    print("Slow queries delayed the template page")
+    sys.exit(1)
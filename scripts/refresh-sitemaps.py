@@ -0,0 +1,42 @@
+#! /usr/bin/env python3
+
+"""
+Build, or bring up to date, the pre-rendered CVE and notice sitemaps.
+
+Shards are also refreshed when CVEs and notices are written, so this
+is only needed to build the sitemaps of a new database, e.g. after
+the migrations on deploy. Only the shards whose rows changed are
+written, and concurrent runs take turns, so it's safe to run from
+every instance.
+
+Usage:
+  DATABASE_URL=postgresql://... scripts/refresh-sitemaps.py
+"""
+
+# Standard library
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+# Packages
+import flask  # noqa: E402
+
+# Local
+from webapp.security.sitemaps import SITEMAPS, refresh_sitemap  # noqa: E402
+
+
+def main():
+    # Rendered with the site's templates
+    app = flask.Flask(
+        __name__, template_folder=os.path.join(os.getcwd(), "templates")
+    )
+
+    with app.app_context():
+        for sitemap in SITEMAPS:
+            written = refresh_sitemap(sitemap)
+            print(f"Wrote {len(written)} {sitemap} sitemap shards")
+
+
+if __name__ == "__main__":
+    main()
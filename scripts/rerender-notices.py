@@ -0,0 +1,24 @@
+#! /usr/bin/env python3
+
+"""
+Render and store the page fragments of every notice rendered by an
+older version of webapp.security.rendering. Run it once per release
+that bumps RENDERER_VERSION, as a release job. Safe to run while the
+site is serving, as notices are rendered on the fly until then, and
+it exits if another process is already rerendering.
+"""
+
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from webapp.security.rendering import rerender_notices  # noqa
+
+
+rendered = rerender_notices()
+
+if rendered is None:
+    sys.exit("Notices are being rerendered by another process")
+
+print(f"Rendered {rendered} notices")
@@ -0,0 +1,84 @@
+# Standard library
+import os
+import unittest
+
+# Packages
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import OperationalError
+
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+
+@unittest.skipUnless(DATABASE_URL, "Requires a PostgreSQL DATABASE_URL")
+class ScratchDatabaseTestCase(unittest.TestCase):
+    """
+    Runs the tests against a scratch PostgreSQL database, next to the
+    one in DATABASE_URL, migrated to the latest revision. db_session
+    is bound to it for the duration of the tests. More databases, e.g.
+    to stand in for replicas, can be made with create_database().
+    """
+
+    scratch_database = None
+
+    @classmethod
+    def create_database(cls, name):
+        """
+        Create a scratch database, migrated to the latest revision,
+        which is dropped after the tests
+        """
+
+        try:
+            with cls.admin_engine.connect() as connection:
+                connection.execute(f"DROP DATABASE IF EXISTS {name}")
+                connection.execute(f"CREATE DATABASE {name}")
+        except OperationalError as error:
+            raise unittest.SkipTest(f"Cannot create database: {error}")
+
+        cls.scratch_databases.append(name)
+
+        scratch_url = make_url(DATABASE_URL)
+        scratch_url.database = name
+        engine = create_engine(scratch_url)
+
+        with engine.begin() as connection:
+            alembic_config = Config("alembic.ini")
+            alembic_config.attributes["connection"] = connection
+            command.upgrade(alembic_config, "head")
+
+        cls.scratch_engines.append(engine)
+
+        return engine
+
+    @classmethod
+    def setUpClass(cls):
+        cls.admin_engine = create_engine(
+            DATABASE_URL, isolation_level="AUTOCOMMIT"
+        )
+        cls.scratch_databases = []
+        cls.scratch_engines = []
+        cls.engine = cls.create_database(cls.scratch_database)
+
+        # Imported here, as the database module needs DATABASE_URL
+        from webapp.security.database import db_session
+
+        cls.db_session = db_session
+        cls.db_session.remove()
+        cls.db_session.configure(bind=cls.engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        from webapp.security.database import db_engine
+
+        cls.db_session.remove()
+        cls.db_session.configure(bind=db_engine)
+
+        for engine in cls.scratch_engines:
+            engine.dispose()
+
+        with cls.admin_engine.connect() as connection:
+            for name in cls.scratch_databases:
+                connection.execute(f"DROP DATABASE {name}")
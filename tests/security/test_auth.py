@@ -0,0 +1,68 @@
+# Standard library
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Local
+from webapp.security import auth
+
+
+def membership(team, status="Approved"):
+    return SimpleNamespace(
+        team_link=f"https://api.launchpad.net/devel/~{team}", status=status
+    )
+
+
+class TestIsAuthorizedUser(unittest.TestCase):
+    def setUp(self):
+        auth.authorized_users.clear()
+        auth.unauthorized_users.clear()
+
+        self.launchpad = MagicMock()
+        self.launchpad.people = {
+            "member": SimpleNamespace(
+                memberships_details=[
+                    membership("ubuntu-dev"),
+                    membership("canonical-security"),
+                ]
+            ),
+            "former-member": SimpleNamespace(
+                memberships_details=[
+                    membership("canonical-security", status="Expired")
+                ]
+            ),
+            "outsider": SimpleNamespace(
+                memberships_details=[membership("ubuntu-dev")]
+            ),
+        }
+
+        patcher = patch.object(
+            auth, "get_launchpad", return_value=self.launchpad
+        )
+        self.get_launchpad = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_memberships(self):
+        self.assertTrue(auth.is_authorized_user("member"))
+        self.assertFalse(auth.is_authorized_user("former-member"))
+        self.assertFalse(auth.is_authorized_user("outsider"))
+        self.assertFalse(auth.is_authorized_user("nobody"))
+
+    @patch.object(auth.launchpad_calls_saved, "inc")
+    def test_results_are_cached(self, inc):
+        self.assertTrue(auth.is_authorized_user("member"))
+        self.assertFalse(auth.is_authorized_user("outsider"))
+        self.assertEqual(self.get_launchpad.call_count, 2)
+        inc.assert_not_called()
+
+        self.launchpad.people = {}
+
+        self.assertTrue(auth.is_authorized_user("member"))
+        self.assertFalse(auth.is_authorized_user("outsider"))
+        self.assertEqual(self.get_launchpad.call_count, 2)
+        self.assertEqual(inc.call_count, 2)
+        inc.assert_called_with(auth.LOOKUP_CALLS)
+
+
+if __name__ == "__main__":
+    unittest.main()
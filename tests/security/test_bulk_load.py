@@ -0,0 +1,186 @@
+# Standard library
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+from tests.security.test_ingestion import make_cve
+
+
+def make_notice(notice_id, cves, codename="focal"):
+    return {
+        "id": notice_id,
+        "title": f"Notice {notice_id}",
+        "summary": "Summary",
+        "instructions": "Update",
+        "references": [],
+        "cves": cves,
+        "published": "2021-01-01T12:00:00",
+        "description": "Tabs\tand\nnew lines \\ backslashes",
+        "release_packages": {
+            codename: [
+                {
+                    "name": "openssl",
+                    "version": "1.1.1",
+                    "is_source": True,
+                }
+            ]
+        },
+    }
+
+
+class TestBulkLoad(ScratchDatabaseTestCase):
+    scratch_database = "security_bulk_load"
+
+    def tearDown(self):
+        self.db_session.rollback()
+
+        for table in [
+            "notice_cves",
+            "notice_releases",
+            "notice",
+            "status",
+            "cve",
+            "package",
+        ]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+
+    def load(self, kind, items):
+        from webapp.security.bulk_load import load, validate
+        from webapp.security.registry import release_registry
+
+        # As they would be read from a JSON export
+        items = json.loads(json.dumps(items, default=str))
+        counts, _ = load(
+            kind, validate(kind, items, release_registry.codenames())
+        )
+
+        return counts
+
+    def test_load_cves(self):
+        from webapp.security.models import CVE, CVEFacet
+
+        counts = self.load(
+            "cves", [make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")]
+        )
+
+        self.assertEqual(counts["created"]["CVE"], 2)
+        self.assertEqual(counts["created"]["Status"], 4)
+        self.assertEqual(self.db_session.query(CVEFacet).count(), 4)
+
+        # Resyncing the same CVEs writes nothing
+        counts = self.load("cves", [make_cve("CVE-2021-0001")])
+
+        self.assertEqual(counts["updated"], {"CVE": 0, "Status": 0})
+
+        counts = self.load(
+            "cves",
+            [
+                make_cve(
+                    "CVE-2021-0001",
+                    description="Changed",
+                    statuses=[
+                        {
+                            "release_codename": "focal",
+                            "status": "released",
+                            "description": "1.1.1-1ubuntu2.2",
+                        }
+                    ],
+                )
+            ],
+        )
+
+        self.assertEqual(counts["updated"], {"CVE": 1, "Status": 1})
+        self.assertEqual(counts["deleted"], {"Status": 1})
+        self.assertEqual(
+            self.db_session.query(CVE).get("CVE-2021-0001").description,
+            "Changed",
+        )
+        self.assertEqual(
+            self.db_session.query(CVEFacet.status)
+            .filter(CVEFacet.cve_id == "CVE-2021-0001")
+            .all(),
+            [("released",)],
+        )
+
+    def test_load_notices(self):
+        from webapp.security.models import CVE, Notice
+
+        self.load("cves", [make_cve("CVE-2021-0001")])
+        counts = self.load(
+            "notices",
+            [make_notice("USN-1-1", ["CVE-2021-0001", "CVE-2021-0002"])],
+        )
+
+        self.assertEqual(counts["created"], {"CVE": 1, "Notice": 1})
+
+        notice = self.db_session.query(Notice).get("USN-1-1")
+
+        self.assertEqual(notice.details, "Tabs\tand\nnew lines \\ backslashes")
+        self.assertEqual(
+            [cve.id for cve in notice.cves], ["CVE-2021-0001", "CVE-2021-0002"]
+        )
+        self.assertEqual(
+            [release.codename for release in notice.releases], ["focal"]
+        )
+        self.assertIsNone(notice.renderer_version)
+        self.assertIsNone(
+            self.db_session.query(CVE).get("CVE-2021-0002").description
+        )
+
+    def test_invalid_items_are_rejected(self):
+        from marshmallow.exceptions import ValidationError
+
+        with self.assertRaises(ValidationError):
+            self.load("notices", [make_notice("USN-1-1", [], "nonsense")])
+
+    def test_script_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for number in range(2):
+                with open(f"{directory}/cves-{number}.json", "w") as dump:
+                    json.dump(
+                        [
+                            make_cve(f"CVE-2021-{number}00{index}")
+                            for index in range(3)
+                        ],
+                        dump,
+                        default=str,
+                    )
+
+            def run():
+                return subprocess.run(
+                    [
+                        sys.executable,
+                        "scripts/bulk-load-security.py",
+                        "cves",
+                        directory,
+                        "--workers=2",
+                        "--chunk-size=2",
+                        f"--checkpoint={directory}/checkpoint",
+                    ],
+                    capture_output=True,
+                    text=True,
+                    env={**os.environ, "DATABASE_URL": str(self.engine.url)},
+                    timeout=60,
+                )
+
+            result = run()
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("Created: {'Package': 1, 'CVE': 6", result.stdout)
+            self.assertIn("Loaded 22 rows", result.stdout)
+
+            result = run()
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("Loaded 0 rows", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,280 @@
+# Standard library
+import unittest
+from unittest.mock import patch
+
+# Packages
+import flask
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+from tests.security.test_bulk_load import make_notice
+from tests.security.test_ingestion import make_cve
+
+
+class TestChanges(ScratchDatabaseTestCase):
+    scratch_database = "security_changes"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        from webapp.security.views import changes_json
+
+        cls.app = flask.Flask(__name__)
+        cls.app.add_url_rule("/security/changes.json", view_func=changes_json)
+
+    def tearDown(self):
+        self.db_session.rollback()
+
+        for table in [
+            "notice_cves",
+            "notice_releases",
+            "notice",
+            "cve_facet",
+            "status",
+            "cve",
+            "package",
+            "tombstone",
+        ]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+
+    def upsert(self, cves_data):
+        from webapp.security.ingestion import upsert_cves
+
+        upsert_cves(cves_data)
+        self.db_session.commit()
+
+    def updated_at(self, cve_id):
+        from webapp.security.models import CVE
+
+        return (
+            self.db_session.query(CVE.updated_at)
+            .filter(CVE.id == cve_id)
+            .scalar()
+        )
+
+    def get_changes(self, after=None, limit=100):
+        from webapp.security.queries import get_changes
+
+        changes, has_more = get_changes(
+            after=after, limit=limit, settle_seconds=0
+        )
+
+        return [change[1:] for change in changes], has_more
+
+    def test_updated_at_follows_changes(self):
+        self.upsert([make_cve("CVE-2021-0001")])
+        created_at = self.updated_at("CVE-2021-0001")
+
+        # Rewriting the same data isn't a change
+        self.upsert([make_cve("CVE-2021-0001")])
+
+        self.assertEqual(self.updated_at("CVE-2021-0001"), created_at)
+
+        # Nor is a change to another CVE
+        self.upsert([make_cve("CVE-2021-0002")])
+
+        self.assertEqual(self.updated_at("CVE-2021-0001"), created_at)
+
+        # A status is part of its CVE
+        self.upsert(
+            [
+                make_cve(
+                    "CVE-2021-0001",
+                    statuses=[
+                        {
+                            "release_codename": "focal",
+                            "status": "released",
+                            "description": "1.1.1-1ubuntu2.2",
+                        }
+                    ],
+                )
+            ]
+        )
+
+        self.assertGreater(self.updated_at("CVE-2021-0001"), created_at)
+
+    def test_derived_columns_are_not_changes(self):
+        from webapp.security.bulk_load import load, validate
+        from webapp.security.models import Notice
+
+        load(
+            "notices",
+            validate("notices", [make_notice("USN-1-1", [])], ["focal"]),
+        )
+        created_at = self.db_session.query(Notice.updated_at).scalar()
+
+        # As a rerender and a search reindex do
+        self.db_session.query(Notice).update(
+            {
+                "rendered": {"details": "Rerendered"},
+                "renderer_version": 1000,
+                "search_vector": None,
+            },
+            synchronize_session=False,
+        )
+        self.db_session.commit()
+
+        self.assertEqual(
+            self.db_session.query(Notice.updated_at).scalar(), created_at
+        )
+
+    def test_changes_wait_for_running_transactions(self):
+        from sqlalchemy import text
+
+        # Stamps its changes with its start, and commits after the
+        # changes made since
+        with self.engine.connect() as connection:
+            transaction = connection.begin()
+            connection.execute(text("SELECT now()"))
+
+            self.upsert([make_cve("CVE-2021-0002")])
+
+            self.assertEqual(self.get_changes(), ([], False))
+
+            connection.execute(
+                text(
+                    "INSERT INTO cve (id, published) "
+                    "VALUES ('CVE-2021-0001', now())"
+                )
+            )
+            transaction.commit()
+
+        self.db_session.commit()
+        changes, _ = self.get_changes()
+
+        self.assertEqual(
+            changes,
+            [("cve", "CVE-2021-0001", False), ("cve", "CVE-2021-0002", False)],
+        )
+
+    def test_deletes_are_tombstoned(self):
+        from webapp.security.models import CVE, Status
+
+        self.upsert([make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")])
+        self.db_session.query(Status).filter(
+            Status.cve_id == "CVE-2021-0001"
+        ).delete()
+        self.db_session.query(CVE).filter(CVE.id == "CVE-2021-0001").delete()
+        self.db_session.commit()
+
+        changes, _ = self.get_changes()
+
+        self.assertEqual(
+            changes,
+            [("cve", "CVE-2021-0002", False), ("cve", "CVE-2021-0001", True)],
+        )
+
+        # Coming back replaces the tombstone
+        self.upsert([make_cve("CVE-2021-0001")])
+        changes, _ = self.get_changes()
+
+        self.assertEqual(
+            changes,
+            [
+                ("cve", "CVE-2021-0002", False),
+                ("cve", "CVE-2021-0001", False),
+            ],
+        )
+
+    def test_changes_resume_after_cursor(self):
+        from webapp.security.queries import get_changes
+
+        self.upsert([make_cve(f"CVE-2021-000{index}") for index in range(3)])
+        self.upsert([make_cve("CVE-2021-0009")])
+
+        first, has_more = get_changes(limit=2, settle_seconds=0)
+
+        self.assertTrue(has_more)
+        self.assertEqual(
+            [change[2] for change in first], ["CVE-2021-0000", "CVE-2021-0001"]
+        )
+
+        rest, has_more = get_changes(
+            after=first[-1][:3], limit=2, settle_seconds=0
+        )
+
+        self.assertFalse(has_more)
+        self.assertEqual(
+            [change[2] for change in rest], ["CVE-2021-0002", "CVE-2021-0009"]
+        )
+
+        # Unsettled changes aren't listed yet
+        self.assertEqual(get_changes(settle_seconds=3600), ([], False))
+
+    def test_changes_json(self):
+        from webapp.security.bulk_load import load, validate
+        from webapp.security.models import Notice
+
+        self.upsert([make_cve("CVE-2021-0001")])
+        load(
+            "notices",
+            validate(
+                "notices",
+                [
+                    make_notice("USN-1-1", ["CVE-2021-0001"]),
+                    make_notice("USN-2-1", []),
+                ],
+                ["focal"],
+            ),
+        )
+        self.db_session.query(Notice).filter(Notice.id == "USN-2-1").update(
+            {"is_hidden": True}
+        )
+        self.db_session.commit()
+
+        with patch("webapp.security.queries.CHANGES_SETTLE_SECONDS", 0):
+            client = self.app.test_client()
+            response = client.get("/security/changes.json?limit=2")
+            first = response.json
+
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(first["has_more"])
+
+            response = client.get(
+                "/security/changes.json?since=" + first["next_cursor"]
+            )
+            rest = response.json
+
+            empty = client.get(
+                "/security/changes.json?since=" + rest["next_cursor"]
+            ).json
+
+        changes = first["changes"] + rest["changes"]
+
+        self.assertEqual(
+            [(change["kind"], change["id"]) for change in changes],
+            [
+                ("cve", "CVE-2021-0001"),
+                ("notice", "USN-1-1"),
+                ("notice", "USN-2-1"),
+            ],
+        )
+        self.assertEqual(
+            changes[0]["payload"]["packages"][0]["name"], "openssl"
+        )
+        self.assertEqual(changes[1]["payload"]["cves_ids"], ["CVE-2021-0001"])
+        self.assertTrue(changes[2]["deleted"])
+        self.assertIsNone(changes[2]["payload"])
+        self.assertFalse(rest["has_more"])
+
+        # The cursor stays put until something changes
+        self.assertEqual(empty["changes"], [])
+        self.assertEqual(empty["next_cursor"], rest["next_cursor"])
+
+    def test_invalid_since(self):
+        client = self.app.test_client()
+
+        self.assertEqual(
+            client.get("/security/changes.json?since=nonsense").status_code,
+            400,
+        )
+        self.assertEqual(
+            client.get("/security/changes.json?limit=0").status_code, 400
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,239 @@
+# Standard library
+import unittest
+from datetime import datetime
+
+# Packages
+import flask
+from sqlalchemy import create_engine, event
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+class TestBaseFilterQueryGet(ScratchDatabaseTestCase):
+    scratch_database = "security_database"
+
+    def setUp(self):
+        from webapp.security.models import Notice
+
+        self.db_session.add_all(
+            [
+                Notice(
+                    id="USN-1-1",
+                    published=datetime(2021, 1, 1),
+                    is_hidden=False,
+                ),
+                Notice(
+                    id="USN-2-1",
+                    published=datetime(2021, 1, 2),
+                    is_hidden=True,
+                ),
+            ]
+        )
+        self.db_session.commit()
+
+        self.queries = []
+        event.listen(self.engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+        self.db_session.rollback()
+        self.db_session.execute("DELETE FROM notice")
+        self.db_session.commit()
+        self.db_session.remove()
+
+    def record(self, conn, cursor, statement, *args):
+        self.queries.append(statement)
+
+    def test_repeated_gets_are_cached(self):
+        from webapp.security.models import Notice
+
+        notice = self.db_session.query(Notice).get("USN-1-1")
+
+        self.assertIs(self.db_session.query(Notice).get("USN-1-1"), notice)
+        self.assertIs(self.db_session.query(Notice).get(("USN-1-1",)), notice)
+        self.assertEqual(len(self.queries), 1)
+
+    def test_default_filters_are_respected(self):
+        from webapp.security.models import Notice
+
+        self.assertIsNone(self.db_session.query(Notice).get("USN-2-1"))
+        self.assertIsNotNone(
+            self.db_session.query(Notice)
+            .without_default_filters()
+            .get("USN-2-1")
+        )
+        self.assertIsNone(self.db_session.query(Notice).get("USN-2-1"))
+        self.assertEqual(len(self.queries), 2)
+
+    def test_flush_clears_the_cache(self):
+        from webapp.security.models import Notice
+
+        notice = self.db_session.query(Notice).get("USN-1-1")
+        notice.is_hidden = True
+        self.db_session.flush()
+
+        self.assertIsNone(self.db_session.query(Notice).get("USN-1-1"))
+
+
+class TestQueryInstrumentation(ScratchDatabaseTestCase):
+    scratch_database = "security_instrumentation"
+
+    def setUp(self):
+        from webapp.security.instrumentation import (
+            _after_cursor_execute,
+            _before_cursor_execute,
+            init_query_instrumentation,
+        )
+
+        self.listeners = [
+            ("before_cursor_execute", _before_cursor_execute),
+            ("after_cursor_execute", _after_cursor_execute),
+        ]
+
+        # Stands in for a read replica
+        self.replica_engine = create_engine(self.engine.url)
+
+        app = flask.Flask(__name__)
+        init_query_instrumentation(app, self.engine, self.replica_engine)
+
+        @app.route("/queries")
+        def queries():
+            for _ in range(3):
+                self.db_session.execute("SELECT 1")
+
+            return "Done"
+
+        @app.route("/replica-queries")
+        def replica_queries():
+            self.db_session.execute("SELECT 1")
+
+            with self.replica_engine.connect() as connection:
+                connection.execute("SELECT 1")
+
+            return "Done"
+
+        @app.route("/no-queries")
+        def no_queries():
+            return "Done"
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        for engine in [self.engine, self.replica_engine]:
+            for event_name, listener in self.listeners:
+                event.remove(engine, event_name, listener)
+
+        self.replica_engine.dispose()
+        self.db_session.remove()
+
+    def test_server_timing(self):
+        with self.assertLogs(
+            "webapp.security.instrumentation", level="DEBUG"
+        ) as logs:
+            response = self.client.get("/queries")
+
+        self.assertRegex(
+            response.headers["Server-Timing"],
+            r'^db;dur=\d+\.\d;desc="3 queries"$',
+        )
+        self.assertRegex(logs.output[0], r"queries: 3 queries in \d+\.\dms")
+
+    def test_read_replica_queries(self):
+        response = self.client.get("/replica-queries")
+
+        self.assertIn('desc="2 queries"', response.headers["Server-Timing"])
+
+    def test_no_queries(self):
+        response = self.client.get("/no-queries")
+
+        self.assertNotIn("Server-Timing", response.headers)
+
+
+class TestReadReplicaRouting(ScratchDatabaseTestCase):
+    """
+    A second scratch database stands in for the replica, with a
+    different value in the cache_version table, to tell which
+    database answered
+    """
+
+    scratch_database = "security_routing_primary"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.replica_engine = cls.create_database("security_routing_replica")
+
+        for engine, version in [(cls.engine, 1), (cls.replica_engine, 2)]:
+            with engine.begin() as connection:
+                connection.execute(
+                    "INSERT INTO cache_version VALUES ('database', %s)",
+                    version,
+                )
+
+        cls.app = flask.Flask(__name__)
+
+    def setUp(self):
+        from webapp.security.database import RoutingSession
+        from webapp.security.models import BaseFilterQuery
+
+        self.session = RoutingSession(
+            bind=self.engine,
+            read_binds=[self.replica_engine],
+            query_cls=BaseFilterQuery,
+        )
+
+    def tearDown(self):
+        self.session.rollback()
+        self.session.close()
+
+    def database(self):
+        from webapp.security.models import CacheVersion
+
+        version = (
+            self.session.query(CacheVersion.version)
+            .filter(CacheVersion.name == "database")
+            .scalar()
+        )
+
+        return {1: "primary", 2: "replica"}[version]
+
+    def test_reads_in_get_requests_use_the_replica(self):
+        with self.app.test_request_context(method="GET"):
+            self.assertEqual(self.database(), "replica")
+
+    def test_other_requests_use_the_primary(self):
+        with self.app.test_request_context(method="POST"):
+            self.assertEqual(self.database(), "primary")
+
+        self.session.close()
+
+        self.assertEqual(self.database(), "primary")
+
+    def test_use_primary(self):
+        with self.app.test_request_context(method="GET"):
+            self.session.use_primary()
+
+            self.assertEqual(self.database(), "primary")
+
+    def test_writes_stick_to_the_primary(self):
+        from webapp.security.models import CacheVersion
+
+        with self.app.test_request_context(method="GET"):
+            self.assertEqual(self.database(), "replica")
+
+            self.session.add(CacheVersion(name="written", version=0))
+            self.session.flush()
+
+            self.assertEqual(self.database(), "primary")
+
+    def test_without_replicas(self):
+        self.session.read_binds = []
+
+        with self.app.test_request_context(method="GET"):
+            self.assertEqual(self.database(), "primary")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,267 @@
+# Standard library
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Packages
+import flask
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+from tests.security.test_bulk_load import make_notice
+from tests.security.test_ingestion import make_cve
+
+
+class TestExports(ScratchDatabaseTestCase):
+    scratch_database = "security_exports"
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        settled = patch("webapp.security.queries.CHANGES_SETTLE_SECONDS", 0)
+        settled.start()
+        self.addCleanup(settled.stop)
+
+    def tearDown(self):
+        self.db_session.rollback()
+
+        for table in [
+            "notice_cves",
+            "notice_releases",
+            "notice",
+            "cve_facet",
+            "status",
+            "cve",
+            "package",
+            "tombstone",
+        ]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+
+    def upsert(self, cves_data):
+        from webapp.security.ingestion import upsert_cves
+
+        upsert_cves(cves_data)
+        self.db_session.commit()
+
+    def refresh(self, **kwargs):
+        from webapp.security.exports import refresh_exports
+
+        return refresh_exports(self.directory, **kwargs)
+
+    def read(self, name):
+        from webapp.security.exports import read_manifest
+
+        entry = read_manifest(self.directory)["files"][name]
+
+        with gzip.open(os.path.join(self.directory, entry["file"])) as lines:
+            return [json.loads(line) for line in lines]
+
+    def test_partitions(self):
+        from webapp.security.bulk_load import load, validate
+        from webapp.security.registry import release_registry
+
+        self.upsert(
+            [
+                make_cve("CVE-2021-0001"),
+                make_cve(
+                    "CVE-2021-0002",
+                    statuses=[
+                        {
+                            "release_codename": "focal",
+                            "status": "needed",
+                            "description": "",
+                        }
+                    ],
+                ),
+            ]
+        )
+        load(
+            "notices",
+            validate(
+                "notices",
+                [make_notice("USN-1-1", ["CVE-2021-0001", "CVE-2021-0003"])],
+                ["focal"],
+            ),
+        )
+
+        written = self.refresh()
+
+        self.assertIn("cves-focal", written)
+        self.assertIn("notices-none", written)
+
+        focal_cves = self.read("cves-focal")
+
+        self.assertEqual(
+            [cve["id"] for cve in focal_cves],
+            ["CVE-2021-0001", "CVE-2021-0002"],
+        )
+        self.assertEqual(
+            [
+                status["release_codename"]
+                for status in focal_cves[0]["packages"][0]["statuses"]
+            ],
+            ["focal"],
+        )
+        self.assertEqual(
+            [cve["id"] for cve in self.read("cves-bionic")], ["CVE-2021-0001"]
+        )
+        # The stub CVE created by the notice
+        self.assertEqual(
+            [cve["id"] for cve in self.read("cves-none")], ["CVE-2021-0003"]
+        )
+        self.assertEqual(
+            self.read("notices-focal")[0]["cves"],
+            ["CVE-2021-0001", "CVE-2021-0003"],
+        )
+
+        # Files are in the shape the APIs, and the bulk loader, accept
+        codenames = release_registry.codenames()
+        validate("cves", focal_cves, codenames)
+        validate("notices", self.read("notices-focal"), codenames)
+
+    def test_refresh_rebuilds_changed_partitions(self):
+        from webapp.security.exports import read_manifest
+
+        self.upsert([make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")])
+        self.refresh()
+        version = read_manifest(self.directory)["version"]
+
+        self.assertEqual(self.refresh(), [])
+        self.assertEqual(read_manifest(self.directory)["version"], version)
+
+        # Only in focal now, which rebuilds the bionic file it left.
+        # The focal file is rebuilt, but its content didn't change.
+        self.upsert(
+            [
+                make_cve(
+                    "CVE-2021-0002",
+                    statuses=[
+                        {
+                            "release_codename": "focal",
+                            "status": "needed",
+                            "description": "",
+                        }
+                    ],
+                )
+            ]
+        )
+
+        self.assertEqual(self.refresh(), ["cves-bionic"])
+        self.assertEqual(
+            [cve["id"] for cve in self.read("cves-bionic")], ["CVE-2021-0001"]
+        )
+        self.assertEqual(read_manifest(self.directory)["version"], version + 1)
+
+        self.upsert([make_cve("CVE-2021-0001", description="Changed")])
+
+        self.assertEqual(sorted(self.refresh()), ["cves-bionic", "cves-focal"])
+
+    def test_refresh_reads_ids_rather_than_files(self):
+        from webapp.security.exports import read_manifest
+
+        self.upsert([make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")])
+        self.refresh()
+
+        bionic_file = read_manifest(self.directory)["files"]["cves-bionic"]
+        ids_path = os.path.join(
+            self.directory, bionic_file["file"].split(".")[0] + ".ids.gz"
+        )
+
+        with gzip.open(ids_path, "rt") as ids_file:
+            self.assertEqual(
+                ids_file.read().split(), ["CVE-2021-0001", "CVE-2021-0002"]
+            )
+
+        # The bionic file held the CVE it left, by its IDs
+        focal_statuses = [
+            {
+                "release_codename": "focal",
+                "status": "needed",
+                "description": "",
+            }
+        ]
+        self.upsert([make_cve("CVE-2021-0002", statuses=focal_statuses)])
+
+        with patch("gzip.open", wraps=gzip.open) as opened:
+            self.assertEqual(self.refresh(), ["cves-bionic"])
+
+        self.assertTrue(opened.called)
+        self.assertFalse(
+            [
+                call
+                for call in opened.call_args_list
+                if call.args[0].endswith(".ndjson.gz")
+            ]
+        )
+
+        # Without its list of IDs, a file is rebuilt for any change
+        bionic_file = read_manifest(self.directory)["files"]["cves-bionic"]
+        ids_path = os.path.join(
+            self.directory, bionic_file["file"].split(".")[0] + ".ids.gz"
+        )
+        os.remove(ids_path)
+        self.upsert(
+            [
+                make_cve(
+                    "CVE-2021-0002",
+                    description="Changed",
+                    statuses=focal_statuses,
+                )
+            ]
+        )
+
+        # Its content didn't change, so it isn't replaced
+        self.assertEqual(self.refresh(), ["cves-focal"])
+        self.assertTrue(os.path.exists(ids_path))
+
+    def test_served_with_etags(self):
+        from webapp.security.exports import read_manifest
+        from webapp.security.views import export_file, exports_index
+
+        self.upsert([make_cve("CVE-2021-0001")])
+        self.refresh()
+
+        app = flask.Flask(__name__)
+        app.add_url_rule(
+            "/security/exports/index.json", view_func=exports_index
+        )
+        app.add_url_rule(
+            "/security/exports/<file_name>", view_func=export_file
+        )
+        client = app.test_client()
+
+        with patch("webapp.security.views.EXPORTS_DIR", self.directory):
+            index = client.get("/security/exports/index.json")
+            file_name = index.json["files"]["cves-focal"]["file"]
+            response = client.get(f"/security/exports/{file_name}")
+            cached = client.get(
+                f"/security/exports/{file_name}",
+                headers={"If-None-Match": response.headers["ETag"]},
+            )
+            listed = read_manifest(self.directory)
+
+            self.assertEqual(
+                client.get("/security/exports/.index.json").status_code, 404
+            )
+            self.assertEqual(
+                client.get(
+                    "/security/exports/" + file_name.split(".")[0] + ".ids.gz"
+                ).status_code,
+                404,
+            )
+
+        self.assertEqual(index.json, listed)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/gzip")
+        self.assertEqual(cached.status_code, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
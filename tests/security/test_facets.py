@@ -0,0 +1,123 @@
+# Standard library
+import unittest
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+from tests.security.test_ingestion import make_cve
+
+
+def status(codename, status, description=""):
+    return {
+        "release_codename": codename,
+        "status": status,
+        "description": description,
+    }
+
+
+class TestCVEFacets(ScratchDatabaseTestCase):
+    scratch_database = "security_facets"
+
+    def setUp(self):
+        from webapp.security.ingestion import upsert_cves
+
+        high = make_cve(
+            "CVE-2021-0001",
+            statuses=[status("focal", "needed"), status("bionic", "released")],
+        )
+        high["priority"] = "high"
+        upsert_cves(
+            [
+                high,
+                make_cve(
+                    "CVE-2021-0002",
+                    statuses=[
+                        status("focal", "released"),
+                        status("bionic", "released"),
+                    ],
+                ),
+                make_cve(
+                    "CVE-2021-0003",
+                    statuses=[status("focal", "not-affected")],
+                ),
+            ]
+        )
+
+    def tearDown(self):
+        self.db_session.rollback()
+        self.db_session.execute("DELETE FROM status")
+        self.db_session.execute("DELETE FROM cve")
+        self.db_session.execute("DELETE FROM package")
+        self.db_session.commit()
+
+    def listed(self, **filters):
+        from webapp.security.queries import get_cves_query
+
+        return sorted(cve_id for cve_id, in get_cves_query(**filters)[0])
+
+    def test_count_matches_listing(self):
+        from webapp.security.queries import count_cves
+
+        for filters in [
+            {},
+            {"priority": "high"},
+            {"package": "openssl"},
+            {"package": "curl"},
+            {
+                "clean_versions": [["focal"], ["bionic"]],
+                "clean_statuses": [["released"], ["released"]],
+            },
+        ]:
+            self.assertEqual(
+                count_cves(**filters), len(self.listed(**filters)), filters
+            )
+
+        # Without versions, only CVEs with an active status are listed
+        self.assertEqual(self.listed(), ["CVE-2021-0001", "CVE-2021-0002"])
+        self.assertEqual(
+            self.listed(
+                clean_versions=[["focal"]], clean_statuses=[["released"]]
+            ),
+            ["CVE-2021-0002"],
+        )
+
+    def test_facet_counts(self):
+        from webapp.security.queries import get_cve_facet_counts
+
+        counts = get_cve_facet_counts(["focal"], priority="high")
+
+        # The priority facet ignores the priority filter
+        self.assertEqual(counts["priority"], {"high": 1, "medium": 1})
+        self.assertEqual(counts["status"], {"needed": 1})
+
+    def test_upsert_refreshes_facets(self):
+        from webapp.security.ingestion import upsert_cves
+        from webapp.security.queries import count_cves
+
+        released = {
+            "clean_versions": [["focal"]],
+            "clean_statuses": [["released"]],
+        }
+        self.assertEqual(count_cves(**released), 1)
+
+        cve = make_cve(
+            "CVE-2021-0001",
+            statuses=[status("focal", "released", "1.1.1-1ubuntu2.2")],
+        )
+        cve["priority"] = "high"
+        upsert_cves([cve])
+
+        self.assertEqual(count_cves(**released), 2)
+        self.assertEqual(count_cves(priority="high", **released), 1)
+
+        # Deleting a CVE deletes its facets
+        self.db_session.execute(
+            "DELETE FROM status WHERE cve_id = 'CVE-2021-0002'"
+        )
+        self.db_session.execute("DELETE FROM cve WHERE id = 'CVE-2021-0002'")
+        self.db_session.commit()
+
+        self.assertEqual(count_cves(**released), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+# Standard library
+import unittest
+from datetime import datetime, timezone
+
+# Packages
+import flask
+from sqlalchemy import event
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+class TestNoticesFeed(ScratchDatabaseTestCase):
+    scratch_database = "security_feeds"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        from webapp.security.models import Notice, Release
+        from webapp.security.views import notices_feed
+
+        cls.app = flask.Flask(__name__)
+        cls.app.add_url_rule(
+            "/security/notices/<feed_type>.xml", view_func=notices_feed
+        )
+        cls.app.add_url_rule(
+            "/security/notices/<notice_id>", "notice", lambda notice_id: ""
+        )
+
+        xenial = cls.db_session.query(Release).get("xenial")
+        focal = cls.db_session.query(Release).get("focal")
+        cls.db_session.add_all(
+            [
+                Notice(
+                    id=f"USN-{day}-1",
+                    title=f"Notice {day}",
+                    published=datetime(2021, 1, day),
+                    details="Details",
+                    is_hidden=False,
+                    releases=[xenial] if day % 2 else [focal],
+                )
+                for day in range(1, 6)
+            ]
+        )
+        cls.db_session.commit()
+
+    def setUp(self):
+        from webapp.security.views import feed_cache
+
+        feed_cache.clear()
+        self.client = self.app.test_client()
+
+        self.queries = []
+        event.listen(self.engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+        self.db_session.remove()
+
+    def record(self, conn, cursor, statement, *args):
+        self.queries.append(statement)
+
+    def test_feed(self):
+        from sqlalchemy import func
+
+        from webapp.security.models import Notice
+
+        response = self.client.get("/security/notices/atom.xml?limit=2")
+        feed = response.get_data(as_text=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("USN-5-1: Notice 5", feed)
+        self.assertIn("USN-4-1: Notice 4", feed)
+        self.assertNotIn("USN-3-1", feed)
+        updated_at = (
+            self.db_session.query(func.max(Notice.updated_at))
+            .filter(Notice.id.in_(["USN-5-1", "USN-4-1"]))
+            .scalar()
+        )
+
+        self.assertEqual(
+            response.last_modified,
+            updated_at.replace(microsecond=0, tzinfo=timezone.utc),
+        )
+        self.assertTrue(response.get_etag()[0])
+
+    def test_feed_is_the_same_when_rebuilt(self):
+        from webapp.security.views import feed_cache
+
+        response = self.client.get("/security/notices/atom.xml")
+        feed_cache.clear()
+        rebuilt = self.client.get("/security/notices/atom.xml")
+
+        self.assertEqual(rebuilt.get_data(), response.get_data())
+        self.assertEqual(rebuilt.get_etag(), response.get_etag())
+
+    def test_release_feed(self):
+        feed = self.client.get(
+            "/security/notices/rss.xml?release=focal"
+        ).get_data(as_text=True)
+
+        self.assertIn("USN-4-1", feed)
+        self.assertIn("USN-2-1", feed)
+        self.assertNotIn("USN-5-1", feed)
+
+        response = self.client.get("/security/notices/rss.xml?release=nope")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_feed_is_conditional(self):
+        response = self.client.get("/security/notices/rss.xml")
+        etag = response.get_etag()[0]
+        self.queries.clear()
+
+        cached = self.client.get(
+            "/security/notices/rss.xml",
+            headers={"If-None-Match": f'"{etag}"'},
+        )
+        self.assertEqual(cached.status_code, 304)
+
+        cached = self.client.get(
+            "/security/notices/rss.xml",
+            headers={"If-Modified-Since": response.headers["Last-Modified"]},
+        )
+        self.assertEqual(cached.status_code, 304)
+
+        cached = self.client.get("/security/notices/rss.xml")
+        self.assertEqual(cached.get_data(), response.get_data())
+        self.assertEqual(self.queries, [])
+
+    def test_notice_changes_clear_the_feed(self):
+        from webapp.security.models import Notice
+        from webapp.security.views import feed_cache
+
+        etag = self.client.get("/security/notices/atom.xml").get_etag()[0]
+
+        notice = self.db_session.query(Notice).get("USN-5-1")
+        notice.title = "Renamed"
+        self.db_session.commit()
+        feed_cache.invalidate()
+        self.db_session.commit()
+
+        response = self.client.get(
+            "/security/notices/atom.xml",
+            headers={"If-None-Match": f'"{etag}"'},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("USN-5-1: Renamed", response.get_data(as_text=True))
+        self.assertGreaterEqual(
+            response.last_modified.replace(tzinfo=None),
+            notice.updated_at.replace(microsecond=0),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+# Standard library
+import importlib.util
+import subprocess
+import sys
+import unittest
+
+# Local
+from tests.security.helpers import DATABASE_URL
+
+
+@unittest.skipUnless(DATABASE_URL, "Requires a PostgreSQL DATABASE_URL")
+@unittest.skipUnless(importlib.util.find_spec("gevent"), "Requires gevent")
+class TestGeventLoad(unittest.TestCase):
+    def test_slow_queries_dont_stall_the_worker(self):
+        # In a subprocess, as it monkey patches the standard library
+        result = subprocess.run(
+            [
+                sys.executable,
+                "scripts/load-test-gevent.py",
+                "--slow-queries=5",
+                "--query-seconds=1",
+                "--page-requests=50",
+            ],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertIn("Cooperative psycopg2: True", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+# Standard library
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+def make_cve(cve_id, description="A vulnerability", statuses=None):
+    return {
+        "id": cve_id,
+        "published": datetime(2021, 1, 1, 12),
+        "description": description,
+        "status": "active",
+        "priority": "medium",
+        "notes": [{"author": "someone", "note": "A note"}],
+        "references": ["https://example.com"],
+        "bugs": [],
+        "patches": {"openssl": ["upstream: https://example.com/fix"]},
+        "tags": {},
+        "packages": [
+            {
+                "name": "openssl",
+                "source": "https://launchpad.net/ubuntu/+source/openssl",
+                "ubuntu": "https://packages.ubuntu.com/openssl",
+                "debian": "https://tracker.debian.org/pkg/openssl",
+                "statuses": statuses
+                or [
+                    {
+                        "release_codename": "focal",
+                        "status": "needed",
+                        "description": "",
+                    },
+                    {
+                        "release_codename": "bionic",
+                        "status": "released",
+                        "description": "1.1.1-1ubuntu2.1",
+                    },
+                ],
+            }
+        ],
+    }
+
+
+class TestUpsertCVEs(ScratchDatabaseTestCase):
+    scratch_database = "security_ingestion"
+
+    def tearDown(self):
+        self.db_session.rollback()
+
+    def upsert(self, cves_data):
+        from webapp.security.ingestion import upsert_cves
+
+        counters = upsert_cves(cves_data)
+
+        return {name: dict(+count) for name, count in counters.items()}
+
+    def test_create(self):
+        counters = self.upsert([make_cve("CVE-2021-0001")])
+
+        self.assertEqual(
+            counters,
+            {
+                "created": {"Package": 1, "CVE": 1, "Status": 2},
+                "updated": {},
+                "deleted": {},
+            },
+        )
+
+    def test_unchanged_cves_are_not_written(self):
+        self.upsert([make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")])
+
+        counters = self.upsert(
+            [make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")]
+        )
+
+        self.assertEqual(
+            counters, {"created": {}, "updated": {}, "deleted": {}}
+        )
+
+    def test_update_and_delete(self):
+        from webapp.security.models import CVE
+
+        self.upsert([make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")])
+
+        counters = self.upsert(
+            [
+                make_cve("CVE-2021-0001", description="Updated"),
+                make_cve(
+                    "CVE-2021-0002",
+                    statuses=[
+                        {
+                            "release_codename": "focal",
+                            "status": "released",
+                            "description": "1.1.1f-1ubuntu2.1",
+                        }
+                    ],
+                ),
+            ]
+        )
+
+        self.assertEqual(
+            counters,
+            {
+                "created": {},
+                "updated": {"CVE": 1, "Status": 1},
+                "deleted": {"Status": 1},
+            },
+        )
+        self.assertEqual(
+            self.db_session.query(CVE.description)
+            .filter(CVE.id == "CVE-2021-0001")
+            .scalar(),
+            "Updated",
+        )
+
+    def test_duplicate_cves_use_the_last_copy(self):
+        from webapp.security.models import CVE
+
+        counters = self.upsert(
+            [
+                make_cve("CVE-2021-0001"),
+                make_cve("CVE-2021-0001", description="Second"),
+            ]
+        )
+
+        self.assertEqual(counters["created"]["CVE"], 1)
+        self.assertEqual(
+            self.db_session.query(CVE.description).scalar(), "Second"
+        )
+
+    def test_delete_unknown_cve(self):
+        import flask
+
+        from webapp.security.views import delete_cve
+
+        # Skip the authorization check
+        with flask.Flask(__name__).test_request_context(method="DELETE"):
+            response, status = delete_cve.__wrapped__("CVE-2021-9999")
+
+        self.assertEqual(status, 404)
+        self.assertEqual(
+            response.json, {"message": "CVE CVE-2021-9999 doesn't exist"}
+        )
+
+
+class TestBulkUpsertCVEs(ScratchDatabaseTestCase):
+    scratch_database = "security_cve_api"
+
+    def tearDown(self):
+        self.db_session.rollback()
+
+        for table in [
+            "cache_version",
+            "sitemap_shard",
+            "cve_facet",
+            "status",
+            "cve",
+        ]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+
+    def put(self, cves_data):
+        import flask
+
+        from webapp.security.views import bulk_upsert_cve
+
+        payload = [
+            {**cve, "published": cve["published"].isoformat()}
+            for cve in cves_data
+        ]
+
+        app = flask.Flask(__name__, template_folder="../../templates")
+
+        # Skip the authorization check
+        with app.test_request_context(method="PUT", json=payload):
+            response, status = bulk_upsert_cve.__wrapped__()
+
+        self.assertEqual(status, 200)
+
+    def stats_version(self):
+        with self.engine.connect() as connection:
+            return connection.execute(
+                "SELECT version FROM cache_version "
+                "WHERE name = 'security_stats'"
+            ).scalar()
+
+    def test_stats_are_invalidated_after_changes(self):
+        from webapp.security.stats import security_stats
+
+        invalidate = security_stats.invalidate
+
+        def committed_invalidate():
+            # The changes are committed before the stats are expired
+            with self.engine.connect() as connection:
+                self.assertEqual(
+                    connection.execute("SELECT count(*) FROM cve").scalar(),
+                    2,
+                )
+
+            invalidate()
+
+        with patch.object(
+            security_stats, "invalidate", side_effect=committed_invalidate
+        ) as invalidated:
+            self.put([make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")])
+
+        self.assertEqual(invalidated.call_count, 1)
+        self.assertEqual(self.stats_version(), 1)
+
+        # A resync without changes leaves the caches
+        self.put([make_cve("CVE-2021-0001"), make_cve("CVE-2021-0002")])
+
+        self.assertEqual(self.stats_version(), 1)
+
+        self.put([make_cve("CVE-2021-0001", description="Changed")])
+
+        self.assertEqual(self.stats_version(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+# Standard library
+import unittest
+from datetime import datetime
+
+# Packages
+import flask
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+class TestJSONAPI(ScratchDatabaseTestCase):
+    scratch_database = "security_json_api"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        from webapp.security.models import (
+            CVE,
+            Notice,
+            Package,
+            Release,
+            Status,
+        )
+        from webapp.security.ingestion import refresh_cve_facets
+        from webapp.security.views import (
+            cve_package,
+            cve_package_json,
+            cves_json,
+            notices_json,
+        )
+
+        cls.app = flask.Flask(__name__)
+        cls.app.add_url_rule("/security/cves.json", view_func=cves_json)
+        cls.app.add_url_rule(
+            "/security/cves/package/<package_name>", view_func=cve_package
+        )
+        cls.app.add_url_rule(
+            "/security/cves/package/<package_name>.json",
+            view_func=cve_package_json,
+        )
+        cls.app.add_url_rule("/security/notices.json", view_func=notices_json)
+
+        focal = cls.db_session.query(Release).get("focal")
+        bionic = cls.db_session.query(Release).get("bionic")
+        cls.db_session.add_all(
+            [Package(name="openssl"), Package(name="curl")]
+            + [
+                CVE(
+                    id=f"CVE-2021-000{day}",
+                    published=datetime(2021, 1, day),
+                    description=f"Vulnerability {day}",
+                    status="active",
+                    priority="high" if day % 2 else "low",
+                    notes=[{"author": "someone", "note": "Large"}],
+                    statuses=[
+                        Status(
+                            package_name="openssl" if day < 4 else "curl",
+                            release_codename="focal",
+                            status="needed" if day % 2 else "released",
+                        )
+                    ],
+                )
+                for day in range(1, 6)
+            ]
+            + [
+                Notice(
+                    id="USN-1-1",
+                    title="OpenSSL vulnerabilities",
+                    published=datetime(2021, 1, 1),
+                    summary="Several issues",
+                    is_hidden=False,
+                    releases=[focal, bionic],
+                ),
+                Notice(
+                    id="USN-2-1",
+                    title="curl vulnerability",
+                    published=datetime(2021, 1, 2),
+                    summary="An issue",
+                    is_hidden=False,
+                    releases=[focal],
+                ),
+                Notice(
+                    id="USN-3-1",
+                    title="Hidden",
+                    published=datetime(2021, 1, 3),
+                    is_hidden=True,
+                    releases=[focal],
+                ),
+            ]
+        )
+        cls.db_session.commit()
+        cls.db_session.execute(
+            "INSERT INTO notice_cves VALUES ('USN-1-1', 'CVE-2021-0001'), "
+            "('USN-1-1', 'CVE-2021-0002')"
+        )
+        refresh_cve_facets(f"CVE-2021-000{day}" for day in range(1, 6))
+        cls.db_session.commit()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.db_session.remove()
+
+    def test_cves_pages(self):
+        first_page = self.client.get("/security/cves.json?limit=3").json
+
+        self.assertEqual(
+            [cve["id"] for cve in first_page["cves"]],
+            ["CVE-2021-0005", "CVE-2021-0004", "CVE-2021-0003"],
+        )
+        self.assertEqual(first_page["total_results"], 5)
+        self.assertIsNone(first_page["previous_cursor"])
+        self.assertEqual(
+            first_page["cves"][0],
+            {
+                "id": "CVE-2021-0005",
+                "published": "2021-01-05T00:00:00",
+                "description": "Vulnerability 5",
+                "ubuntu_description": None,
+                "priority": "high",
+                "status": "active",
+                "cvss3": None,
+                "mitigation": None,
+                "packages": [
+                    {
+                        "name": "curl",
+                        "statuses": [
+                            {
+                                "release_codename": "focal",
+                                "status": "needed",
+                                "description": None,
+                                "component": None,
+                                "pocket": None,
+                            }
+                        ],
+                    }
+                ],
+            },
+        )
+
+        second_page = self.client.get(
+            "/security/cves.json?limit=3&after=" + first_page["next_cursor"]
+        ).json
+
+        self.assertEqual(
+            [cve["id"] for cve in second_page["cves"]],
+            ["CVE-2021-0002", "CVE-2021-0001"],
+        )
+        self.assertIsNone(second_page["next_cursor"])
+
+        previous_page = self.client.get(
+            "/security/cves.json?limit=3&before="
+            + second_page["previous_cursor"]
+        ).json
+
+        self.assertEqual(previous_page["cves"], first_page["cves"])
+
+    def test_cves_filters(self):
+        response = self.client.get(
+            "/security/cves.json?package=openssl&priority=high"
+        ).json
+
+        self.assertEqual(
+            [cve["id"] for cve in response["cves"]],
+            ["CVE-2021-0003", "CVE-2021-0001"],
+        )
+
+        response = self.client.get(
+            "/security/cves.json?version=focal&status=released"
+        ).json
+
+        self.assertEqual(
+            [cve["id"] for cve in response["cves"]],
+            ["CVE-2021-0004", "CVE-2021-0002"],
+        )
+        self.assertEqual(response["total_results"], 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/security/cves.json?after=nonsense")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_package_cves(self):
+        first_page = self.client.get(
+            "/security/cves/package/openssl.json?limit=2"
+        ).json
+
+        self.assertEqual(
+            [cve["id"] for cve in first_page["cves"]],
+            ["CVE-2021-0003", "CVE-2021-0002"],
+        )
+        self.assertEqual(first_page["package"], "openssl")
+        self.assertEqual(first_page["releases"], ["focal"])
+        self.assertEqual(first_page["total_results"], 3)
+        self.assertEqual(
+            first_page["cves"][0]["statuses"],
+            {
+                "focal": {
+                    "status": "needed",
+                    "description": None,
+                    "component": None,
+                    "pocket": None,
+                }
+            },
+        )
+
+        second_page = self.client.get(
+            "/security/cves/package/openssl.json?limit=2&after="
+            + first_page["next_cursor"]
+        ).json
+
+        self.assertEqual(
+            [cve["id"] for cve in second_page["cves"]], ["CVE-2021-0001"]
+        )
+
+    def test_package_cves_filters(self):
+        response = self.client.get(
+            "/security/cves/package/openssl.json?release=focal&status=released"
+        ).json
+
+        self.assertEqual(
+            [cve["id"] for cve in response["cves"]], ["CVE-2021-0002"]
+        )
+        self.assertEqual(
+            self.client.get(
+                "/security/cves/package/openssl.json?status=nonsense"
+            ).status_code,
+            400,
+        )
+        self.assertEqual(
+            self.client.get(
+                "/security/cves/package/nonsense.json"
+            ).status_code,
+            404,
+        )
+
+    def test_notices(self):
+        response = self.client.get(
+            "/security/notices.json?release=bionic&limit=5"
+        ).json
+
+        self.assertEqual(
+            response["notices"],
+            [
+                {
+                    "id": "USN-1-1",
+                    "title": "OpenSSL vulnerabilities",
+                    "published": "2021-01-01T00:00:00",
+                    "summary": "Several issues",
+                    "instructions": None,
+                    "type": "USN",
+                    "cves_ids": ["CVE-2021-0001", "CVE-2021-0002"],
+                    "releases": ["bionic", "focal"],
+                }
+            ],
+        )
+        self.assertEqual(response["total_results"], 1)
+
+    def test_hidden_notices_are_left_out(self):
+        response = self.client.get("/security/notices.json").json
+
+        self.assertEqual(
+            [notice["id"] for notice in response["notices"]],
+            ["USN-2-1", "USN-1-1"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
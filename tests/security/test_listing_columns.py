@@ -0,0 +1,184 @@
+"""
+Check that the CVE and notice listings only load the columns they
+show. The large text and JSON columns are most of each row, so
+loading them for a listing page multiplies the bytes read from the
+database and the time spent decoding them into objects.
+"""
+
+# Standard library
+import statistics
+import unittest
+from time import perf_counter
+
+# Packages
+from sqlalchemy import event
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+from tests.security.test_bulk_load import make_notice
+from tests.security.test_ingestion import make_cve
+
+
+def make_large_cve(cve_id):
+    cve = make_cve(cve_id, description="A vulnerability " * 100)
+    cve["notes"] = [
+        {"author": "someone", "note": f"Note number {number} " * 5}
+        for number in range(200)
+    ]
+    cve["references"] = [
+        f"https://example.com/{cve_id}/{number}" for number in range(200)
+    ]
+
+    return cve
+
+
+def make_large_notice(notice_id, cve_ids):
+    notice = make_notice(notice_id, cve_ids)
+    notice["description"] = "Details " * 2000
+    notice["instructions"] = "Update " * 500
+    notice["references"] = [
+        f"https://example.com/{notice_id}/{number}" for number in range(200)
+    ]
+    notice["release_packages"]["focal"] *= 200
+
+    return notice
+
+
+class TestListingColumns(ScratchDatabaseTestCase):
+    scratch_database = "security_listing_columns"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        from webapp.security.bulk_load import load, validate
+        from webapp.security.ingestion import upsert_cves
+
+        cls.cve_ids = [f"CVE-2021-{number:04}" for number in range(20)]
+        upsert_cves([make_large_cve(cve_id) for cve_id in cls.cve_ids])
+        cls.db_session.commit()
+        load(
+            "notices",
+            validate(
+                "notices",
+                [
+                    make_large_notice(f"USN-{number}-1", cls.cve_ids[:3])
+                    for number in range(20)
+                ],
+                ["focal"],
+            ),
+        )
+
+    def measure(self, run, repeat=5):
+        """
+        Run a function, with an empty session each time. Returns the
+        statements it ran, the bytes of the rows they returned and
+        its median time, most of which is spent loading the rows
+        into objects.
+        """
+
+        statements = []
+        times = []
+
+        def record_statement(
+            conn, cursor, statement, params, context, executemany
+        ):
+            statements.append((statement, params))
+
+        event.listen(self.engine, "before_cursor_execute", record_statement)
+
+        try:
+            for _ in range(repeat):
+                statements.clear()
+                self.db_session.expunge_all()
+                start = perf_counter()
+                run()
+                times.append(perf_counter() - start)
+        finally:
+            event.remove(
+                self.engine, "before_cursor_execute", record_statement
+            )
+            self.db_session.rollback()
+
+        with self.engine.connect() as connection:
+            size = sum(
+                connection.execute(
+                    "SELECT coalesce(sum(octet_length(page::text)), 0) "
+                    f"FROM ({statement}) AS page",
+                    params,
+                ).scalar()
+                for statement, params in statements
+            )
+
+        return (
+            [statement for statement, _ in statements],
+            size,
+            statistics.median(times),
+        )
+
+    def assertSmallerAndFaster(self, listing, full):
+        _, listing_size, listing_time = listing
+        _, full_size, full_time = full
+
+        self.assertLess(listing_size * 10, full_size)
+        self.assertLess(listing_time, full_time)
+
+    def test_cve_index_page(self):
+        from sqlalchemy.orm import selectinload
+
+        from webapp.security.models import CVE
+        from webapp.security.queries import get_cves_by_ids
+
+        def listing():
+            for cve in get_cves_by_ids(self.cve_ids):
+                # What the CVE index shows
+                cve.priority
+                cve.packages
+
+        def full():
+            for cve in (
+                self.db_session.query(CVE)
+                .filter(CVE.id.in_(self.cve_ids))
+                .options(selectinload(CVE.statuses))
+            ):
+                cve.priority
+                cve.packages
+
+        statements, _, _ = listing_measure = self.measure(listing)
+
+        # The CVEs, then their statuses, without loading any of the
+        # left out columns afterwards
+        self.assertEqual(len(statements), 2)
+        self.assertNotIn("cve.notes", statements[0])
+        self.assertSmallerAndFaster(listing_measure, self.measure(full))
+
+    def test_notices_page(self):
+        from webapp.security.models import Notice
+        from webapp.security.pagination import paginate
+        from webapp.security.queries import get_notices_query
+
+        notices_query, sort_keys, _ = get_notices_query()
+
+        def listing():
+            notices, _ = paginate(notices_query, sort_keys, 10)
+
+            for notice in notices:
+                # What the notices listing shows, besides its CVEs
+                # and releases
+                notice.id, notice.title, notice.published, notice.summary
+
+        def full():
+            notices, _ = paginate(self.db_session.query(Notice), sort_keys, 10)
+
+            for notice in notices:
+                notice.id, notice.title, notice.published, notice.summary
+
+        statements, _, _ = listing_measure = self.measure(listing)
+
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn("notice.details", statements[0])
+        self.assertSmallerAndFaster(listing_measure, self.measure(full))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+from datetime import datetime
+
+from webapp.security.models import CVE, Notice, Package, Release, Status
+
+# Keys returned by the ubuntu.com/security JSON API,
+# which the notice and CVE templates were written against
+CVE_API_KEYS = {
+    "id",
+    "published",
+    "description",
+    "ubuntu_description",
+    "notes",
+    "priority",
+    "status",
+    "cvss3",
+    "mitigation",
+    "references",
+    "bugs",
+    "patches",
+    "tags",
+    "packages",
+    "notices_ids",
+}
+NOTICE_API_KEYS = {
+    "id",
+    "type",
+    "title",
+    "published",
+    "summary",
+    "description",
+    "instructions",
+    "references",
+    "release_packages",
+    "releases",
+    "cves",
+    "related_notices",
+}
+
+
+def make_release(codename="focal", version="20.04"):
+    return Release(
+        codename=codename,
+        name=codename.capitalize(),
+        version=version,
+        lts=True,
+        development=False,
+        release_date=datetime(2020, 4, 23),
+        esm_expires=datetime(2030, 4, 1),
+        support_expires=datetime(2025, 4, 1),
+    )
+
+
+class TestModels(unittest.TestCase):
+    def test_cve_as_dict_matches_api_shape(self):
+        package = Package(
+            name="openssl", source="src", ubuntu="ubuntu", debian="debian"
+        )
+        cve = CVE(
+            id="CVE-2021-3449",
+            published=datetime(2021, 3, 25),
+            priority="medium",
+            status="active",
+            patches={"openssl": []},
+            tags={},
+        )
+        cve.statuses = [
+            Status(
+                package_name="openssl",
+                package=package,
+                release_codename=codename,
+                status="released",
+                description="1.1.1f-1ubuntu2.3",
+            )
+            for codename in ["focal", "bionic"]
+        ]
+
+        cve_dict = cve.as_dict()
+
+        self.assertEqual(set(cve_dict.keys()), CVE_API_KEYS)
+        self.assertEqual(cve_dict["published"], "2021-03-25T00:00:00")
+        self.assertEqual(len(cve_dict["packages"]), 1)
+        self.assertEqual(cve_dict["packages"][0]["name"], "openssl")
+        self.assertEqual(cve_dict["packages"][0]["debian"], "debian")
+        self.assertEqual(
+            [
+                s["release_codename"]
+                for s in cve_dict["packages"][0]["statuses"]
+            ],
+            ["focal", "bionic"],
+        )
+
+    def test_notice_as_detail_dict_matches_api_shape(self):
+        related_notice = Notice(
+            id="USN-4890-1",
+            release_packages={"focal": [{"name": "openssl"}]},
+        )
+        notice = Notice(
+            id="USN-4891-1",
+            title="OpenSSL vulnerabilities",
+            published=datetime(2021, 3, 25),
+            summary="Several security issues were fixed in OpenSSL.",
+            details="Fixes CVE-2021-3449",
+            instructions="Update your system.",
+            references=[],
+            release_packages={"focal": []},
+            cves=[CVE(id="CVE-2021-3449")],
+            releases=[make_release()],
+        )
+
+        notice_dict = notice.as_detail_dict(related_notices=[related_notice])
+
+        self.assertEqual(set(notice_dict.keys()), NOTICE_API_KEYS)
+        self.assertEqual(notice_dict["type"], "USN")
+        self.assertEqual(notice_dict["description"], "Fixes CVE-2021-3449")
+        self.assertEqual(notice_dict["cves"], [{"id": "CVE-2021-3449"}])
+        self.assertEqual(notice_dict["releases"][0]["codename"], "focal")
+        self.assertEqual(notice_dict["releases"][0]["version"], "20.04")
+        self.assertEqual(
+            notice_dict["related_notices"],
+            [{"id": "USN-4890-1", "packages": "openssl"}],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
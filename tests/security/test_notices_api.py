@@ -0,0 +1,257 @@
+# Standard library
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# Packages
+import flask
+from sqlalchemy import event
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+def notice_data(number, cve_ids, codenames=("focal",)):
+    return {
+        "id": f"USN-{number}-1",
+        "title": f"Notice {number}",
+        "summary": "Summary",
+        "instructions": "Update",
+        "description": "Description",
+        "references": [],
+        "cves": cve_ids,
+        "published": "2021-01-01T00:00:00",
+        "release_packages": {
+            codename: [
+                {
+                    "name": "linux",
+                    "version": "1.0",
+                    "description": "Linux kernel",
+                    "is_source": True,
+                }
+            ]
+            for codename in codenames
+        },
+    }
+
+
+class TestBulkUpsertNotices(ScratchDatabaseTestCase):
+    scratch_database = "security_notices_api"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.app = flask.Flask(__name__, template_folder="../../templates")
+
+    def setUp(self):
+        from webapp.security.models import CVE
+
+        self.db_session.add(CVE(id="CVE-2021-0001", description="Existing"))
+        self.db_session.commit()
+
+        self.queries = []
+        event.listen(self.engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+        self.db_session.rollback()
+
+        for table in [
+            "cache_version",
+            "sitemap_shard",
+            "notice_cves",
+            "notice_releases",
+            "notice",
+            "cve",
+        ]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+
+    def record(self, conn, cursor, statement, *args):
+        self.queries.append(statement)
+
+    def upsert(self, notices):
+        from webapp.security.views import bulk_upsert_notices
+
+        # Skip the authorization check
+        with self.app.test_request_context(method="PUT", json=notices):
+            response, status = bulk_upsert_notices.__wrapped__()
+
+        return response.json, status
+
+    def test_create_and_update(self):
+        from webapp.security.models import CVE, Notice
+
+        kernel_cves = [f"CVE-2021-{number:04}" for number in range(1, 201)]
+
+        response, status = self.upsert(
+            [
+                notice_data(1, kernel_cves, codenames=["focal", "bionic"]),
+                notice_data(2, ["CVE-2021-0001"]),
+            ]
+        )
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response, {"created": 2, "updated": 0})
+
+        notice = self.db_session.query(Notice).get("USN-1-1")
+
+        self.assertEqual(len(notice.cves), 200)
+        self.assertEqual(
+            {release.codename for release in notice.releases},
+            {"focal", "bionic"},
+        )
+        self.assertEqual(
+            self.db_session.query(CVE).get("CVE-2021-0001").description,
+            "Existing",
+        )
+
+        response, status = self.upsert(
+            [notice_data(2, ["CVE-2021-0001", "CVE-2021-0500"])]
+        )
+
+        self.assertEqual(response, {"created": 0, "updated": 1})
+        self.assertEqual(
+            [
+                cve.id
+                for cve in self.db_session.query(Notice).get("USN-2-1").cves
+            ],
+            ["CVE-2021-0001", "CVE-2021-0500"],
+        )
+
+    def test_caches_are_invalidated_after_changes(self):
+        from webapp.security.views import feed_cache
+
+        def versions():
+            with self.engine.connect() as connection:
+                return dict(
+                    connection.execute(
+                        "SELECT name, version FROM cache_version "
+                        "WHERE name != 'releases'"
+                    ).fetchall()
+                )
+
+        invalidate = feed_cache.invalidate
+
+        def committed_invalidate():
+            # The changes are committed before the caches are expired
+            with self.engine.connect() as connection:
+                self.assertEqual(
+                    connection.execute("SELECT count(*) FROM notice").scalar(),
+                    1,
+                )
+
+            invalidate()
+
+        with patch.object(
+            feed_cache, "invalidate", side_effect=committed_invalidate
+        ):
+            self.upsert([notice_data(1, ["CVE-2021-0001"])])
+
+        self.assertEqual(versions(), {"security_stats": 1, "notices_feed": 1})
+
+        # Rewriting the same notice isn't a change
+        self.upsert([notice_data(1, ["CVE-2021-0001"])])
+
+        self.assertEqual(versions(), {"security_stats": 1, "notices_feed": 1})
+
+        self.upsert([notice_data(1, ["CVE-2021-0001", "CVE-2021-0002"])])
+
+        self.assertEqual(versions(), {"security_stats": 2, "notices_feed": 2})
+
+    def test_related_notices(self):
+        from webapp.security.views import _get_notice
+
+        self.upsert(
+            [
+                notice_data(1, ["CVE-2021-0001", "CVE-2021-0002"]),
+                notice_data(2, ["CVE-2021-0001", "CVE-2021-0002"]),
+                notice_data(3, ["CVE-2021-0003"]),
+            ]
+        )
+
+        notice = _get_notice("USN-1-1")
+
+        self.assertEqual(
+            [related["id"] for related in notice["related_notices"]],
+            ["USN-2-1"],
+        )
+
+    def test_references_are_loaded_together(self):
+        kernel_cves = [f"CVE-2021-{number:04}" for number in range(1, 201)]
+
+        self.upsert([notice_data(1, kernel_cves)])
+
+        cve_selects = [
+            query
+            for query in self.queries
+            if query.startswith("SELECT") and "FROM cve" in query
+        ]
+        cve_inserts = [
+            query
+            for query in self.queries
+            if query.startswith("INSERT INTO cve")
+        ]
+
+        self.assertEqual(len(cve_selects), 1)
+        self.assertEqual(len(cve_inserts), 1)
+
+    def test_concurrent_new_cves(self):
+        from webapp.security.models import Notice
+
+        results = []
+
+        # Another request inserts the same new CVE, and commits while
+        # this one waits for it
+        with self.engine.connect() as connection:
+            transaction = connection.begin()
+            connection.execute("INSERT INTO cve (id) VALUES ('CVE-2021-0002')")
+
+            upsert = threading.Thread(
+                target=lambda: results.append(
+                    self.upsert([notice_data(1, ["CVE-2021-0002"])])
+                )
+            )
+            upsert.start()
+
+            # Until it's waiting on the uncommitted row
+            for _ in range(100):
+                with self.engine.connect() as monitor:
+                    waiting = monitor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() "
+                        "AND wait_event_type = 'Lock'"
+                    ).scalar()
+
+                if waiting:
+                    break
+
+                time.sleep(0.05)
+
+            transaction.commit()
+            upsert.join()
+
+        self.assertEqual(results, [({"created": 1, "updated": 0}, 200)])
+        self.assertEqual(
+            [
+                cve.id
+                for cve in self.db_session.query(Notice).get("USN-1-1").cves
+            ],
+            ["CVE-2021-0002"],
+        )
+
+    def test_invalid_payload(self):
+        from webapp.security.models import Notice
+
+        response, status = self.upsert([notice_data(1, []), {"id": "USN-2-1"}])
+
+        self.assertEqual(status, 400)
+        self.assertIn("1", response["errors"])
+        self.assertIsNone(self.db_session.query(Notice).get("USN-1-1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
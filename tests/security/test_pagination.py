@@ -0,0 +1,143 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Integer, create_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from webapp.security.pagination import (
+    InvalidCursorError,
+    cursor_for_offset,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+    stream_page,
+)
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "item"
+
+    id = Column(Integer, primary_key=True)
+    published = Column(DateTime)
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+
+        # Pairs of items share a published date, to exercise the tie-break
+        start = datetime(2021, 1, 1)
+        self.session.add_all(
+            Item(id=i, published=start + timedelta(days=i // 2))
+            for i in range(25)
+        )
+        self.session.commit()
+
+        self.keys = [Item.published, Item.id]
+
+    def test_cursor_round_trip(self):
+        published = datetime(2021, 3, 25, 12, 30)
+        cursor = encode_cursor([published, "CVE-2021-3449"], 3)
+
+        self.assertEqual(
+            decode_cursor(cursor),
+            (["2021-03-25T12:30:00", "CVE-2021-3449"], 3),
+        )
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursorError):
+            decode_cursor("not-a-cursor")
+
+        with self.assertRaises(InvalidCursorError):
+            paginate(
+                self.session.query(Item),
+                self.keys,
+                10,
+                after=encode_cursor(["2021-01-01T00:00:00"], 2),
+            )
+
+    def test_walks_every_page_forwards_and_backwards(self):
+        query = self.session.query(Item)
+        pages = []
+        after = None
+
+        while True:
+            items, pagination = paginate(query, self.keys, 10, after=after)
+            pages.append(([item.id for item in items], pagination))
+            after = pagination["next_cursor"]
+
+            if not after:
+                break
+
+        self.assertEqual(
+            [ids for ids, _ in pages],
+            [
+                list(range(24, 14, -1)),
+                list(range(14, 4, -1)),
+                list(range(4, -1, -1)),
+            ],
+        )
+        self.assertEqual(
+            [pagination["current_page"] for _, pagination in pages],
+            [1, 2, 3],
+        )
+        self.assertIsNone(pages[0][1]["previous_cursor"])
+
+        items, pagination = paginate(
+            query, self.keys, 10, before=pages[2][1]["previous_cursor"]
+        )
+
+        self.assertEqual([item.id for item in items], pages[1][0])
+        self.assertEqual(pagination["current_page"], 2)
+        self.assertIsNotNone(pagination["previous_cursor"])
+
+    def test_ascending_order(self):
+        items, pagination = paginate(
+            self.session.query(Item), self.keys, 10, descending=False
+        )
+        items, pagination = paginate(
+            self.session.query(Item),
+            self.keys,
+            10,
+            after=pagination["next_cursor"],
+            descending=False,
+        )
+
+        self.assertEqual([item.id for item in items], list(range(10, 20)))
+
+    def test_cursor_for_offset_matches_paginated_page(self):
+        query = self.session.query(Item)
+        cursor = cursor_for_offset(query, self.keys, offset=10, page=2)
+        items, pagination = paginate(query, self.keys, 10, after=cursor)
+
+        self.assertEqual([item.id for item in items], list(range(14, 4, -1)))
+        self.assertEqual(pagination["current_page"], 2)
+        self.assertIsNone(
+            cursor_for_offset(query, self.keys, offset=30, page=4)
+        )
+
+    def test_stream_page_matches_paginate(self):
+        query = self.session.query(Item.id, Item.published)
+        after = None
+
+        for _ in range(3):
+            items, pagination = paginate(query, self.keys, 10, after=after)
+            rows, stream_pagination = stream_page(
+                query, self.keys, 10, after=after, batch_size=3
+            )
+
+            self.assertEqual(list(rows), items)
+            self.assertEqual(stream_pagination, pagination)
+
+            after = pagination["next_cursor"]
+
+        self.assertIsNone(after)
+
+
+if __name__ == "__main__":
+    unittest.main()
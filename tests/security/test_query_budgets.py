@@ -0,0 +1,140 @@
+"""
+Check that listing pages run a fixed number of queries, however many
+items, and related items, are on the page. Relationships the
+templates use have to be loaded for the whole page at once, or each
+item adds its own queries.
+"""
+
+# Standard library
+import re
+import unittest
+from unittest.mock import patch
+
+# Packages
+import flask
+from sqlalchemy import event
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+from tests.security.test_bulk_load import make_notice
+
+
+render_template = flask.render_template
+
+
+def render_notices(template, notices, **context):
+    """
+    Render only the notices of the notices listing, as the rest of the
+    page needs the whole app
+    """
+
+    return "".join(
+        render_template("security/_notice-brief.html", notice=notice)
+        for notice in notices
+    )
+
+
+class TestQueryBudgets(ScratchDatabaseTestCase):
+    scratch_database = "security_query_budgets"
+
+    # Queries for the notices listing: the page, its count, the
+    # releases and CVEs of its notices, and the cache version and
+    # releases when they aren't cached yet
+    NOTICES_BUDGET = 6
+
+    def setUp(self):
+        from webapp.security.instrumentation import (
+            _after_cursor_execute,
+            _before_cursor_execute,
+            init_query_instrumentation,
+        )
+        from webapp.security.views import notices
+
+        self.listeners = [
+            ("before_cursor_execute", _before_cursor_execute),
+            ("after_cursor_execute", _after_cursor_execute),
+        ]
+
+        app = flask.Flask(__name__, template_folder="../../templates")
+        app.add_url_rule("/security/notices", view_func=notices)
+        init_query_instrumentation(app, self.engine)
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        for event_name, listener in self.listeners:
+            event.remove(self.engine, event_name, listener)
+
+        self.db_session.rollback()
+
+        for table in [
+            "notice_cves",
+            "notice_releases",
+            "notice",
+            "cve",
+            "cache_version",
+        ]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+        self.db_session.remove()
+
+    def load_notices(self, count, cves_per_notice):
+        from webapp.security.bulk_load import load, validate
+
+        notices = []
+
+        for number in range(count):
+            cve_ids = [
+                f"CVE-2021-{number * cves_per_notice + index:04}"
+                for index in range(cves_per_notice)
+            ]
+
+            for index, codename in enumerate(["focal", "bionic"], 1):
+                notices.append(
+                    make_notice(f"USN-{number}-{index}", cve_ids, codename)
+                )
+
+        load("notices", validate("notices", notices, ["focal", "bionic"]))
+
+    def queries(self, url):
+        """
+        The number of queries run for a request, from its Server-Timing
+        header, and the response
+        """
+
+        with patch("flask.render_template", render_notices):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+        queries = re.search(
+            r'desc="(\d+) queries"', response.headers["Server-Timing"]
+        )
+
+        return int(queries.group(1)), response
+
+    def assertNoticesWithinBudget(self):
+        for url in [
+            "/security/notices",
+            "/security/notices?release=focal",
+            "/security/notices?details=CVE-2021-0000",
+        ]:
+            with self.subTest(url=url):
+                queries, response = self.queries(url)
+
+                self.assertLessEqual(queries, self.NOTICES_BUDGET)
+                self.assertIn(b"/security/CVE-2021-", response.data)
+                self.assertIn(b"?release=focal", response.data)
+
+    def test_notices_with_few_cves(self):
+        self.load_notices(2, cves_per_notice=1)
+        self.assertNoticesWithinBudget()
+
+    def test_notices_with_many_cves(self):
+        self.load_notices(20, cves_per_notice=10)
+        self.assertNoticesWithinBudget()
+
+
+if __name__ == "__main__":
+    unittest.main()
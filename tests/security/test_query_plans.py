@@ -0,0 +1,279 @@
+"""
+Query plan regression tests for the security listing queries.
+
+These load a synthetic dataset into a scratch PostgreSQL database,
+next to the one in DATABASE_URL, and check that the listing and
+sitemap queries don't fall back to sequential scans of large tables.
+"""
+
+# Standard library
+import unittest
+from datetime import datetime
+
+# Packages
+import flask
+from sqlalchemy import event, text
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+# Tables large enough that a sequential scan is a regression
+LARGE_TABLES = {
+    "cve",
+    "cve_facet",
+    "status",
+    "notice",
+    "notice_cves",
+    "notice_releases",
+}
+
+SYNTHETIC_DATA = """
+    INSERT INTO package (name, source, ubuntu, debian)
+    SELECT 'package-' || n, '', '', ''
+    FROM generate_series(0, 1999) AS n;
+
+    INSERT INTO cve (id, published, description, status, priority)
+    SELECT
+        'CVE-2000-' || lpad(n::text, 6, '0'),
+        CASE WHEN n % 100 = 0 THEN NULL
+        ELSE '2021-01-01'::timestamp - (n || ' hours')::interval END,
+        'Synthetic vulnerability number ' || n,
+        CASE WHEN n % 10 = 0 THEN 'rejected' ELSE 'active' END::cve_statuses,
+        (ARRAY['low', 'medium', 'high'])[1 + n % 3]::priorities
+    FROM generate_series(0, 49999) AS n;
+
+    INSERT INTO status (cve_id, package_name, release_codename, status)
+    SELECT
+        cve.id,
+        'package-' || ((hashtext(cve.id) & 2047) + p * 1000) % 2000,
+        release.codename,
+        (ARRAY['released', 'needed', 'DNE', 'not-affected'])[
+            1 + (hashtext(cve.id || release.codename) & 3)
+        ]::statuses
+    FROM cve
+    CROSS JOIN generate_series(0, 1) AS p
+    CROSS JOIN (
+        SELECT codename FROM release WHERE codename != 'upstream'
+        ORDER BY release_date DESC LIMIT 4
+    ) AS release
+    ON CONFLICT DO NOTHING;
+
+    INSERT INTO cve_facet
+    SELECT
+        status.cve_id,
+        status.package_name,
+        status.release_codename,
+        status.status,
+        status.component,
+        cve.priority,
+        cve.status
+    FROM status
+    JOIN cve ON cve.id = status.cve_id;
+
+    INSERT INTO notice (id, title, published, summary, details, is_hidden)
+    SELECT
+        'USN-' || n || '-1',
+        'Synthetic notice ' || n,
+        '2021-01-01'::timestamp - (n || ' hours')::interval,
+        '',
+        'Fixes several vulnerabilities',
+        n % 50 = 0
+    FROM generate_series(0, 39999) AS n;
+
+    INSERT INTO notice_cves (notice_id, cve_id)
+    SELECT 'USN-' || n || '-1', 'CVE-2000-' || lpad((n * 5 + c)::text, 6, '0')
+    FROM generate_series(0, 9999) AS n, generate_series(0, 2) AS c;
+
+    INSERT INTO notice_releases (notice_id, release_codename)
+    SELECT notice.id, release.codename
+    FROM notice
+    JOIN (
+        SELECT codename, row_number() OVER (ORDER BY codename) AS position
+        FROM release
+    ) AS release
+    ON release.position % 10 = hashtext(notice.id) & 7;
+
+    ANALYZE;
+"""
+
+
+def _seq_scans(plan):
+    """
+    Find the relations scanned sequentially in an EXPLAIN JSON plan
+    """
+
+    scans = []
+
+    if plan.get("Node Type") == "Seq Scan":
+        scans.append(plan["Relation Name"])
+
+    for subplan in plan.get("Plans", []):
+        scans.extend(_seq_scans(subplan))
+
+    return scans
+
+
+class TestQueryPlans(ScratchDatabaseTestCase):
+    scratch_database = "security_query_plans"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        with cls.engine.begin() as connection:
+            connection.execute(text(SYNTHETIC_DATA))
+
+    def assertNoLargeSeqScans(self, run):
+        """
+        Run a function, and EXPLAIN every query it executes
+        """
+
+        statements = []
+
+        def record_statement(
+            conn, cursor, statement, params, context, executemany
+        ):
+            # Batched INSERTs from a flush can't be explained
+            if not executemany:
+                statements.append((statement, params))
+
+        event.listen(self.engine, "before_cursor_execute", record_statement)
+
+        try:
+            run()
+        finally:
+            event.remove(
+                self.engine, "before_cursor_execute", record_statement
+            )
+            self.db_session.rollback()
+
+        self.assertTrue(statements)
+
+        with self.engine.connect() as connection:
+            for statement, params in statements:
+                plan = connection.execute(
+                    f"EXPLAIN (FORMAT JSON) {statement}", params
+                ).scalar()
+                seq_scans = set(_seq_scans(plan[0]["Plan"])) & LARGE_TABLES
+
+                self.assertFalse(
+                    seq_scans,
+                    f"Sequential scan on {seq_scans} for:\n{statement}",
+                )
+
+    def _cve_index_page(self, **filters):
+        from webapp.security.pagination import paginate
+        from webapp.security.queries import get_cves_by_ids, get_cves_query
+
+        cves_query, sort_keys = get_cves_query(**filters)
+        cve_ids, pagination = paginate(cves_query, sort_keys, 20)
+        cve_ids, pagination = paginate(
+            cves_query, sort_keys, 20, after=pagination["next_cursor"]
+        )
+
+        for cve in get_cves_by_ids(cve_ids):
+            cve.packages
+
+    def _notices_page(self, **filters):
+        from webapp.security.pagination import paginate
+        from webapp.security.queries import get_notices_query
+
+        notices_query, sort_keys, descending = get_notices_query(**filters)
+        notices, pagination = paginate(
+            notices_query, sort_keys, 10, descending=descending
+        )
+        paginate(
+            notices_query,
+            sort_keys,
+            10,
+            after=pagination["next_cursor"],
+            descending=descending,
+        )
+
+    def test_cve_index(self):
+        self.assertNoLargeSeqScans(lambda: self._cve_index_page())
+
+    def test_cve_index_by_package(self):
+        self.assertNoLargeSeqScans(
+            lambda: self._cve_index_page(package="package-42")
+        )
+
+    def test_cve_index_by_priority_and_component(self):
+        self.assertNoLargeSeqScans(
+            lambda: self._cve_index_page(priority="high", component="main")
+        )
+
+    def test_cve_count_by_package(self):
+        from webapp.security.queries import count_cves, get_cve_facet_counts
+
+        self.assertNoLargeSeqScans(
+            lambda: (
+                count_cves(package="package-42"),
+                get_cve_facet_counts(["focal"], package="package-42"),
+            )
+        )
+
+    def test_package_cves(self):
+        from webapp.security.pagination import paginate
+        from webapp.security.queries import (
+            get_package_cves_query,
+            get_package_release_codenames,
+            get_statuses_by_cve_ids,
+        )
+
+        def package_page():
+            cves_query, sort_keys = get_package_cves_query(
+                "package-42", release="focal", status="needed"
+            )
+            cves_query.count()
+            cve_ids, _ = paginate(cves_query, sort_keys, 20)
+            get_statuses_by_cve_ids(cve_ids, package_name="package-42")
+            get_package_release_codenames("package-42")
+
+        self.assertNoLargeSeqScans(package_page)
+
+    def test_cve_index_search(self):
+        self.assertNoLargeSeqScans(
+            lambda: self._cve_index_page(query="number 4242")
+        )
+
+    def test_notices(self):
+        self.assertNoLargeSeqScans(lambda: self._notices_page())
+
+    def test_notices_oldest_first(self):
+        self.assertNoLargeSeqScans(
+            lambda: self._notices_page(order_by="oldest")
+        )
+
+    def test_notices_by_release(self):
+        self.assertNoLargeSeqScans(lambda: self._notices_page(release="focal"))
+
+    def test_notices_by_cve_id(self):
+        self.assertNoLargeSeqScans(
+            lambda: self._notices_page(details="CVE-2000-004242")
+        )
+
+    def test_changes(self):
+        from webapp.security.queries import get_changes
+
+        self.assertNoLargeSeqScans(lambda: get_changes(settle_seconds=0))
+        self.assertNoLargeSeqScans(
+            lambda: get_changes(
+                after=(datetime(2021, 1, 1), "cve", "CVE-2000-000042"),
+                settle_seconds=0,
+            )
+        )
+
+    def test_sitemaps(self):
+        from webapp.security.sitemaps import refresh_sitemap
+
+        app = flask.Flask(__name__, template_folder="../../templates")
+
+        with app.app_context():
+            self.assertNoLargeSeqScans(lambda: refresh_sitemap("cves"))
+            self.assertNoLargeSeqScans(lambda: refresh_sitemap("notices"))
+
+
+if __name__ == "__main__":
+    unittest.main()
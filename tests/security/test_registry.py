@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from webapp.security.models import Base, CacheVersion, Release
+from webapp.security.registry import ReleaseRegistry
+
+
+def make_release(codename, version, year, support_expires=None):
+    return Release(
+        codename=codename,
+        name=codename.capitalize(),
+        version=version,
+        lts=True,
+        development=False,
+        release_date=datetime(year, 4, 1),
+        esm_expires=datetime(year + 10, 4, 1),
+        support_expires=support_expires or datetime(year + 5, 4, 1),
+    )
+
+
+class TestReleaseRegistry(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(
+            self.engine,
+            tables=[Release.__table__, CacheVersion.__table__],
+        )
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.add_all(
+            [
+                CacheVersion(name="releases", version=0),
+                make_release("trusty", "14.04", 2014),
+                make_release("focal", "20.04", 2020),
+                make_release("bionic", "18.04", 2018),
+            ]
+        )
+        self.session.commit()
+
+        self.queries = []
+        event.listen(
+            self.engine,
+            "before_cursor_execute",
+            lambda *args: self.queries.append(args[2]),
+        )
+
+    def test_releases_are_cached(self):
+        registry = ReleaseRegistry(self.session, check_interval=60)
+
+        self.assertEqual(registry.codenames(), ["trusty", "focal", "bionic"])
+        queries = len(self.queries)
+
+        self.assertEqual(
+            [release.codename for release in registry.releases()],
+            ["focal", "bionic", "trusty"],
+        )
+        self.assertEqual(registry.get("bionic").version, "18.04")
+        self.assertEqual(len(self.queries), queries)
+
+    def test_invalidate_reloads_every_registry(self):
+        registry = ReleaseRegistry(self.session, check_interval=60)
+        other_registry = ReleaseRegistry(self.session, check_interval=0)
+        registry.codenames()
+        other_registry.codenames()
+
+        self.session.add(make_release("jammy", "22.04", 2022))
+        registry.invalidate()
+        self.session.commit()
+
+        self.assertIn("jammy", registry.codenames())
+        self.assertIn("jammy", other_registry.codenames())
+        self.assertEqual(
+            self.session.query(CacheVersion.version).scalar(),
+            1,
+        )
+
+    def test_unchanged_version_does_not_reload(self):
+        registry = ReleaseRegistry(self.session, check_interval=0)
+        registry.codenames()
+        self.queries.clear()
+
+        registry.codenames()
+
+        self.assertEqual(len(self.queries), 1)
+        self.assertIn("cache_version", self.queries[0])
+
+    def test_supported_releases(self):
+        registry = ReleaseRegistry(self.session)
+
+        self.assertEqual(
+            [release.codename for release in registry.supported_releases()],
+            [
+                codename
+                for codename, year in [("bionic", 2018), ("focal", 2020)]
+                if datetime(year + 10, 4, 1) > datetime.now()
+            ],
+        )
+
+    def test_statuses(self):
+        self.assertIn("needs-triage", ReleaseRegistry.statuses())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+# Standard library
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+RELEASE_PACKAGES = {
+    "focal": [
+        {
+            "name": "openssl",
+            "version": "1.1.1f-1ubuntu2.1",
+            "description": "Secure Socket Layer toolkit",
+            "is_source": True,
+        },
+        {
+            "name": "libssl1.1",
+            "version": "1.1.1f-1ubuntu2.1",
+            "is_source": False,
+        },
+    ],
+    "bionic": [
+        {
+            "name": "openssl",
+            "version": "1.1.1-1ubuntu2.1~18.04.7",
+            "description": "Secure Socket Layer toolkit",
+            "is_source": True,
+        },
+        {
+            "name": "libssl1.1",
+            "version": "1.1.1-1ubuntu2.1~18.04.7",
+            "is_source": False,
+            "is_visible": False,
+        },
+    ],
+}
+
+
+class TestRendering(ScratchDatabaseTestCase):
+    scratch_database = "security_rendering"
+
+    def setUp(self):
+        from webapp.security.models import Notice, Release
+
+        self.db_session.add_all(
+            [
+                Notice(
+                    id=f"USN-{number}-1",
+                    title="OpenSSL vulnerability",
+                    published=datetime(2021, 1, number),
+                    summary="Summary",
+                    details="Fixes CVE-2021-3449.",
+                    instructions="Update **now**",
+                    release_packages=RELEASE_PACKAGES,
+                    is_hidden=number == 2,
+                    releases=[
+                        self.db_session.query(Release).get(codename)
+                        for codename in RELEASE_PACKAGES
+                    ],
+                )
+                for number in [1, 2]
+            ]
+        )
+        self.db_session.commit()
+
+    def tearDown(self):
+        self.db_session.rollback()
+        self.db_session.execute("DELETE FROM notice_releases")
+        self.db_session.execute("DELETE FROM notice")
+        self.db_session.commit()
+
+    def test_render_notice(self):
+        from webapp.security.models import Notice
+        from webapp.security.rendering import render_notice
+
+        notice = self.db_session.query(Notice).get("USN-1-1")
+        rendered = render_notice(notice.as_detail_dict())
+
+        self.assertEqual(rendered["published"], "1 January 2021")
+        self.assertIn(
+            '<a href="/security/CVE-2021-3449">CVE-2021-3449</a>',
+            rendered["details"],
+        )
+        self.assertIn("<strong>now</strong>", rendered["instructions"])
+        self.assertEqual(
+            rendered["package_descriptions"],
+            {"openssl": "Secure Socket Layer toolkit"},
+        )
+        self.assertEqual(
+            [
+                (version, list(packages))
+                for version, packages in rendered["release_packages"]
+            ],
+            [("18.04", []), ("20.04", ["libssl1.1"])],
+        )
+
+    def test_rerender_notices(self):
+        from webapp.security.models import Notice
+        from webapp.security.rendering import (
+            RENDERER_VERSION,
+            render_notice,
+            rerender_notices,
+        )
+
+        self.assertEqual(rerender_notices(batch_size=1), 2)
+        self.assertEqual(rerender_notices(), 0)
+
+        notice = self.db_session.query(Notice).get("USN-1-1")
+
+        self.assertEqual(notice.renderer_version, RENDERER_VERSION)
+        self.assertEqual(
+            notice.rendered["details"],
+            render_notice(notice.as_detail_dict())["details"],
+        )
+
+    def test_rerender_leaves_notices_changed_since_read(self):
+        from webapp.security import rendering
+        from webapp.security.models import Notice
+
+        render_notice = rendering.render_notice
+
+        def render_and_change(notice):
+            # Another process updates, and renders, USN-1-1 meanwhile
+            if notice["id"] == "USN-1-1":
+                with self.engine.begin() as connection:
+                    connection.execute(
+                        "UPDATE notice SET details = 'Changed', "
+                        "rendered = '{}', renderer_version = %s "
+                        "WHERE id = 'USN-1-1'",
+                        rendering.RENDERER_VERSION,
+                    )
+
+            return render_notice(notice)
+
+        with patch(
+            "webapp.security.rendering.render_notice", render_and_change
+        ):
+            self.assertEqual(rendering.rerender_notices(), 1)
+
+        self.db_session.expire_all()
+        notice = self.db_session.query(Notice).get("USN-1-1")
+
+        self.assertEqual(notice.rendered, {})
+
+    def test_rerender_runs_once_at_a_time(self):
+        from sqlalchemy import text
+
+        from webapp.security.rendering import RERENDER_LOCK, rerender_notices
+
+        with self.engine.connect() as connection:
+            connection.execute(
+                text("SELECT pg_advisory_lock(hashtext(:name))"),
+                name=RERENDER_LOCK,
+            )
+
+            self.assertIsNone(rerender_notices())
+
+            connection.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:name))"),
+                name=RERENDER_LOCK,
+            )
+
+        self.assertEqual(rerender_notices(), 2)
+
+    def test_stored_rendering_is_served(self):
+        from webapp.security.models import Notice
+        from webapp.security.rendering import store_rendered_notice
+        from webapp.security.views import _get_notice
+
+        self.assertNotIn("rendered", _get_notice("USN-1-1"))
+
+        notice = self.db_session.query(Notice).get("USN-1-1")
+        store_rendered_notice(notice)
+        notice.rendered = {**notice.rendered, "details": "Stored"}
+        self.db_session.commit()
+
+        self.assertEqual(
+            _get_notice("USN-1-1")["rendered"]["details"], "Stored"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from webapp.security.search import tsquery_text, to_tsquery
+
+
+class TestSearch(unittest.TestCase):
+    def test_tsquery_text_matches_terms_as_prefixes(self):
+        self.assertEqual(tsquery_text("heap overfl"), "'heap':* & 'overfl':*")
+
+    def test_tsquery_text_keeps_ids_and_versions(self):
+        self.assertEqual(
+            tsquery_text("CVE-2021-3449 1.1.1f"),
+            "'CVE-2021-3449':* & '1.1.1f':*",
+        )
+
+    def test_tsquery_text_strips_tsquery_syntax(self):
+        self.assertEqual(
+            tsquery_text("a' | !b & (c)"), "'a':* & 'b':* & 'c':*"
+        )
+
+    def test_to_tsquery_is_none_without_terms(self):
+        self.assertIsNone(to_tsquery("  '&|! "))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+# Standard library
+import gzip
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+# Packages
+import flask
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+@patch("webapp.security.sitemaps.SITEMAP_PAGE_SIZE", 3)
+class TestSitemaps(ScratchDatabaseTestCase):
+    scratch_database = "security_sitemaps"
+
+    def setUp(self):
+        from webapp.security.models import CVE, Notice
+
+        self.app = flask.Flask(__name__, template_folder="../../templates")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.db_session.add_all(
+            [
+                CVE(id=f"CVE-2021-000{day}", published=datetime(2021, 1, day))
+                for day in range(1, 8)
+            ]
+            + [
+                CVE(id="CVE-2021-0010", published=None),
+                Notice(
+                    id="USN-1-1",
+                    published=datetime(2021, 1, 1),
+                    is_hidden=False,
+                ),
+                Notice(
+                    id="USN-2-1",
+                    published=datetime(2021, 1, 2),
+                    is_hidden=True,
+                ),
+            ]
+        )
+        self.db_session.commit()
+
+    def tearDown(self):
+        self.app_context.pop()
+        self.db_session.rollback()
+
+        for table in ["sitemap_shard", "notice", "cve"]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+
+    def shard_urls(self, sitemap):
+        from webapp.security.sitemaps import get_shards
+
+        return [
+            [
+                line.strip()[5:-6]
+                for line in gzip.decompress(shard.content)
+                .decode("utf-8")
+                .splitlines()
+                if "<loc>" in line
+            ]
+            for shard in get_shards(sitemap)
+        ]
+
+    def test_build(self):
+        from webapp.security.sitemaps import refresh_sitemap
+
+        refresh_sitemap("cves")
+
+        self.assertEqual(
+            self.shard_urls("cves"),
+            [
+                [
+                    "https://ubuntu.com/security/CVE-2021-0010",
+                    "https://ubuntu.com/security/CVE-2021-0001",
+                    "https://ubuntu.com/security/CVE-2021-0002",
+                ],
+                [
+                    "https://ubuntu.com/security/CVE-2021-0003",
+                    "https://ubuntu.com/security/CVE-2021-0004",
+                    "https://ubuntu.com/security/CVE-2021-0005",
+                ],
+                [
+                    "https://ubuntu.com/security/CVE-2021-0006",
+                    "https://ubuntu.com/security/CVE-2021-0007",
+                ],
+            ],
+        )
+
+    def test_hidden_notices_are_left_out(self):
+        from webapp.security.sitemaps import refresh_sitemap
+
+        refresh_sitemap("notices")
+
+        self.assertEqual(
+            self.shard_urls("notices"),
+            [["https://ubuntu.com/security/notices/USN-1-1"]],
+        )
+
+    def test_refresh_writes_changed_shards(self):
+        from webapp.security.models import CVE
+        from webapp.security.sitemaps import refresh_sitemap
+
+        self.assertEqual(refresh_sitemap("cves"), [0, 1, 2])
+        self.assertEqual(refresh_sitemap("cves"), [])
+
+        self.db_session.add(
+            CVE(id="CVE-2021-0008", published=datetime(2021, 1, 8))
+        )
+        self.db_session.commit()
+
+        self.assertEqual(
+            refresh_sitemap("cves", since=datetime(2021, 1, 8)), [2]
+        )
+
+        self.db_session.query(CVE).filter(
+            CVE.id.in_(["CVE-2021-0002", "CVE-2021-0003", "CVE-2021-0004"])
+        ).delete(synchronize_session=False)
+        self.db_session.commit()
+
+        self.assertEqual(
+            refresh_sitemap("cves", since=datetime(2021, 1, 2)), [0, 1]
+        )
+        self.assertEqual(len(self.shard_urls("cves")), 2)
+
+    def test_unbuilt_sitemaps_are_not_built_by_requests(self):
+        from webapp.security.views import cves_sitemap, single_cves_sitemap
+
+        self.app.add_url_rule(
+            "/security/cve/sitemap.xml", view_func=cves_sitemap
+        )
+        self.app.add_url_rule(
+            "/security/cve/sitemap-<offset>.xml",
+            view_func=single_cves_sitemap,
+        )
+        client = self.app.test_client()
+
+        self.assertEqual(
+            client.get("/security/cve/sitemap.xml").status_code, 503
+        )
+        self.assertEqual(
+            client.get("/security/cve/sitemap-0.xml").status_code, 404
+        )
+        self.assertEqual(self.shard_urls("cves"), [])
+
+    def test_earliest_change(self):
+        from webapp.security.models import CVE
+        from webapp.security.sitemaps import earliest_change
+
+        self.assertEqual(
+            earliest_change(
+                CVE, ["CVE-2021-0005"], [datetime(2021, 1, 9, 12)]
+            ),
+            datetime(2021, 1, 5),
+        )
+        self.assertEqual(
+            earliest_change(CVE, ["CVE-2021-0100"], [datetime(2021, 1, 9)]),
+            datetime(2021, 1, 9),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
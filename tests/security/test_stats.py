@@ -0,0 +1,154 @@
+# Standard library
+import unittest
+from datetime import datetime
+
+# Packages
+from sqlalchemy import event
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+
+
+class TestSecurityStats(ScratchDatabaseTestCase):
+    scratch_database = "security_stats"
+
+    def setUp(self):
+        from webapp.security.ingestion import refresh_cve_facets
+        from webapp.security.models import (
+            CVE,
+            Notice,
+            Package,
+            Release,
+            Status,
+        )
+
+        xenial = self.db_session.query(Release).get("xenial")
+        focal = self.db_session.query(Release).get("focal")
+
+        self.db_session.add_all(
+            [
+                Package(name="openssl"),
+                CVE(
+                    id="CVE-2021-0001",
+                    status="active",
+                    statuses=[
+                        Status(
+                            package_name="openssl",
+                            release_codename="xenial",
+                            status="released",
+                        ),
+                        Status(
+                            package_name="openssl",
+                            release_codename="focal",
+                            status="released",
+                        ),
+                    ],
+                ),
+                CVE(
+                    id="CVE-2021-0002",
+                    status="active",
+                    statuses=[
+                        Status(
+                            package_name="openssl",
+                            release_codename="xenial",
+                            status="needed",
+                        )
+                    ],
+                ),
+            ]
+            + [
+                Notice(
+                    id=f"USN-{day}-1",
+                    title=f"Notice {day}",
+                    published=datetime(2021, 1, day),
+                    summary="Summary",
+                    is_hidden=day == 4,
+                    releases=[xenial] if day != 3 else [focal],
+                )
+                for day in range(1, 5)
+            ]
+        )
+        self.db_session.commit()
+        refresh_cve_facets(["CVE-2021-0001", "CVE-2021-0002"])
+        self.db_session.commit()
+
+        self.queries = []
+        event.listen(self.engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+        self.db_session.rollback()
+
+        for table in [
+            "cache_version",
+            "notice_releases",
+            "notice",
+            "status",
+            "cve",
+            "package",
+        ]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+
+    def record(self, conn, cursor, statement, *args):
+        self.queries.append(statement)
+
+    def test_release_stats(self):
+        from webapp.security.stats import SecurityStats
+
+        stats = SecurityStats().release_stats("xenial", latest=1)
+
+        self.assertEqual(stats["notices"], 2)
+        self.assertEqual(stats["released_cves"], 1)
+        self.assertEqual(
+            stats["latest_notices"],
+            [
+                {
+                    "id": "USN-2-1",
+                    "title": "Notice 2",
+                    "published": datetime(2021, 1, 2),
+                    "summary": "Summary",
+                }
+            ],
+        )
+
+    def test_stats_are_cached(self):
+        from webapp.security.stats import SecurityStats
+
+        security_stats = SecurityStats(check_interval=60)
+        stats = security_stats.release_stats("xenial")
+        self.queries.clear()
+
+        self.assertEqual(security_stats.release_stats("xenial"), stats)
+        self.assertEqual(self.queries, [])
+
+    def test_invalidate_refreshes_every_process(self):
+        from webapp.security.models import Notice, Release
+        from webapp.security.stats import SecurityStats
+
+        security_stats = SecurityStats(check_interval=60)
+        other_security_stats = SecurityStats(check_interval=0)
+        security_stats.release_stats("xenial")
+        other_security_stats.release_stats("xenial")
+
+        self.db_session.add(
+            Notice(
+                id="USN-5-1",
+                published=datetime(2021, 1, 5),
+                is_hidden=False,
+                releases=[self.db_session.query(Release).get("xenial")],
+            )
+        )
+        self.db_session.commit()
+        security_stats.invalidate()
+        self.db_session.commit()
+
+        for stats in [security_stats, other_security_stats]:
+            latest_notices = stats.release_stats("xenial")["latest_notices"]
+
+            self.assertEqual(latest_notices[0]["id"], "USN-5-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+# Standard library
+import unittest
+from datetime import datetime
+
+# Local
+from tests.security.helpers import ScratchDatabaseTestCase
+from tests.security.test_ingestion import make_cve
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+RELEASES = ["focal", "bionic", "xenial"]
+STATUSES = ["needed", "released", "not-affected", "DNE", "needs-triage"]
+
+FILTERS = [
+    {},
+    {"priority": "high"},
+    {"package": "curl"},
+    {"package": "unknown"},
+    {"component": "universe"},
+    {"clean_versions": [["focal"]], "clean_statuses": [["needed"]]},
+    {
+        "priority": "high",
+        "clean_versions": [["focal", "bionic"], ["xenial"]],
+        "clean_statuses": [STATUSES, ["released", "DNE"]],
+    },
+    {
+        "package": "openssl",
+        "component": "main",
+        "clean_versions": [["bionic"]],
+        "clean_statuses": [["released"]],
+    },
+]
+
+
+def make_cves(count, offset=0):
+    cves = []
+
+    for number in range(offset, offset + count):
+        cve = make_cve(
+            f"CVE-2021-{number:04}",
+            statuses=[
+                {
+                    "release_codename": codename,
+                    "status": STATUSES[(number + index) % len(STATUSES)],
+                    "description": "",
+                    "component": ["main", "universe"][number % 2],
+                }
+                for index, codename in enumerate(RELEASES[: number % 3 + 1])
+            ],
+        )
+        cve["priority"] = ["low", "medium", "high"][number % 3]
+        cve["status"] = "rejected" if number % 7 == 6 else "active"
+        # Some share publish dates, and some have none
+        cve["published"] = (
+            datetime(2021, 1, number % 5 + 1) if number % 4 else None
+        )
+
+        if number % 2:
+            curl = dict(cve["packages"][0], name="curl")
+            curl["statuses"] = curl["statuses"][-1:]
+            cve["packages"].append(curl)
+
+        cves.append(cve)
+
+    return cves
+
+
+@unittest.skipIf(numpy is None, "Requires NumPy")
+class TestStatusEngine(ScratchDatabaseTestCase):
+    scratch_database = "security_status_engine"
+
+    def setUp(self):
+        from webapp.security.status_engine import StatusEngine
+
+        self.upsert(make_cves(40))
+        self.engine = StatusEngine(enabled=True, check_interval=0)
+        self.engine.load()
+
+    def tearDown(self):
+        self.db_session.rollback()
+
+        for table in ["cve_facet", "status", "cve", "package", "tombstone"]:
+            self.db_session.execute(f"DELETE FROM {table}")
+
+        self.db_session.commit()
+
+    def upsert(self, cves_data):
+        from webapp.security.ingestion import upsert_cves
+
+        upsert_cves(cves_data)
+        self.db_session.commit()
+
+    def pages(self, paginate, limit=7):
+        """
+        The IDs of every page, and the first page again read
+        backwards from the second
+        """
+
+        pages = []
+        after = None
+
+        while True:
+            ids, pagination = paginate(limit, after=after)
+            pages.append(ids)
+            after = pagination["next_cursor"]
+
+            if len(pages) == 2:
+                first, _ = paginate(
+                    limit, before=pagination["previous_cursor"]
+                )
+                pages.append(first)
+
+            if not after:
+                return pages
+
+    def assertMatchesSQL(self, index, filters):
+        from webapp.security.pagination import paginate
+        from webapp.security.queries import (
+            count_cves,
+            get_cve_facet_counts,
+            get_cves_by_ids,
+            get_cves_query,
+        )
+        from webapp.security.views import _filter_packages
+
+        filters = {
+            "query": "",
+            "priority": None,
+            "package": None,
+            "component": None,
+            "clean_versions": [],
+            "clean_statuses": [],
+            **filters,
+        }
+        cves_query, sort_keys = get_cves_query(**filters)
+
+        self.assertEqual(index.count(**filters), count_cves(**filters))
+        self.assertEqual(
+            index.facet_counts(RELEASES[:2], **filters),
+            get_cve_facet_counts(RELEASES[:2], **filters),
+        )
+
+        pages = self.pages(
+            lambda limit, **cursors: index.paginate(
+                limit, **cursors, **filters
+            )
+        )
+
+        self.assertEqual(
+            pages,
+            self.pages(
+                lambda limit, **cursors: paginate(
+                    cves_query, sort_keys, limit, **cursors
+                )
+            ),
+        )
+
+        page_ids = pages[0]
+        packages = index.packages(page_ids, **filters)
+
+        for cve in get_cves_by_ids(page_ids):
+            self.assertEqual(
+                packages[cve.id], set(_filter_packages(cve.packages, filters))
+            )
+
+    def test_filters_match_sql(self):
+        for filters in FILTERS:
+            with self.subTest(filters=filters):
+                self.assertMatchesSQL(self.engine.current(), filters)
+
+    def test_refresh_splices_in_changes(self):
+        from webapp.security.models import CVE, Status
+
+        changed = make_cves(3, offset=10)
+
+        for cve in changed:
+            cve["priority"] = "high"
+            cve["packages"] = cve["packages"][:1]
+
+        self.upsert(changed + make_cves(2, offset=100))
+        self.db_session.query(Status).filter(
+            Status.cve_id == "CVE-2021-0005"
+        ).delete()
+        self.db_session.query(CVE).filter(CVE.id == "CVE-2021-0005").delete()
+        self.db_session.commit()
+
+        # Changes are re-read for the settle window, so it's at least
+        # the changed CVEs
+        self.assertGreaterEqual(self.engine.refresh(), 6)
+
+        index = self.engine.current()
+
+        self.assertNotIn("CVE-2021-0005", index.cve_ids)
+        self.assertIn("CVE-2021-0100", index.cve_ids)
+
+        for filters in FILTERS:
+            with self.subTest(filters=filters):
+                self.assertMatchesSQL(index, filters)
+
+    def test_disabled(self):
+        from webapp.security.status_engine import StatusEngine
+
+        self.assertIsNone(StatusEngine(enabled=False).current())
+
+    def test_invalid_cursor(self):
+        from webapp.security.pagination import (
+            InvalidCursorError,
+            encode_cursor,
+        )
+
+        index = self.engine.current()
+
+        for values in [["2021-01-01", "CVE-2021-0001", 1.0], ["soon", "x"]]:
+            with self.assertRaises(InvalidCursorError):
+                index.paginate(10, after=encode_cursor(values, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -121,7 +121,12 @@ from webapp.shop.advantage.views import (
 )
 
 from webapp.login import login_handler, logout, user_info, empty_session
-from webapp.security.database import db_session
+from webapp.security.database import (
+    db_engine,
+    db_read_engines,
+    db_session,
+)
+from webapp.security.instrumentation import init_query_instrumentation
 from webapp.security.views import (
     create_notice,
     delete_notice,
@@ -129,12 +134,20 @@ from webapp.security.views import (
     delete_release,
     notice,
     notices,
+    notices_json,
     notices_feed,
     update_notice,
+    bulk_upsert_notices,
     cve_index,
     cve,
     delete_cve,
     bulk_upsert_cve,
+    cves_json,
+    changes_json,
+    export_file,
+    exports_index,
+    cve_package,
+    cve_package_json,
     single_notices_sitemap,
     notices_sitemap,
     single_cves_sitemap,
@@ -556,6 +569,9 @@ app.add_url_rule("/security/notices", view_func=notices)
 app.add_url_rule(
     "/security/notices", view_func=create_notice, methods=["POST"]
 )
+app.add_url_rule(
+    "/security/notices", view_func=bulk_upsert_notices, methods=["PUT"]
+)
 
 app.add_url_rule(
     r"/security/notices/<regex('(lsn-|LSN-|usn-|USN-)\d{1,10}-\d{1,2}'):notice_id>",  # noqa: E501
@@ -572,6 +588,7 @@ app.add_url_rule(
     methods=["DELETE"],
 )
 
+app.add_url_rule("/security/notices.json", view_func=notices_json)
 app.add_url_rule("/security/notices/<feed_type>.xml", view_func=notices_feed)
 
 app.add_url_rule(
@@ -599,7 +616,17 @@ app.add_url_rule(
 
 # cve section
 app.add_url_rule("/security/cves", view_func=cve_index)
+app.add_url_rule("/security/cves.json", view_func=cves_json)
+app.add_url_rule("/security/changes.json", view_func=changes_json)
+app.add_url_rule("/security/exports/index.json", view_func=exports_index)
+app.add_url_rule("/security/exports/<file_name>", view_func=export_file)
 app.add_url_rule("/security/cves", view_func=bulk_upsert_cve, methods=["PUT"])
+app.add_url_rule(
+    "/security/cves/package/<package_name>", view_func=cve_package
+)
+app.add_url_rule(
+    "/security/cves/package/<package_name>.json", view_func=cve_package_json
+)
 
 app.add_url_rule(
     r"/security/<regex('(cve-|CVE-)\d{4}-\d{4,7}'):cve_id>", view_func=cve
@@ -1064,6 +1091,9 @@ def cache_headers(response):
     return response
 
 
+init_query_instrumentation(app, db_engine, *db_read_engines)
+
+
 @app.teardown_appcontext
 def remove_db_session(response):
     db_session.remove()
@@ -27,6 +27,19 @@ def run_migrations():
 
     """
 
+    connection = config.attributes.get("connection")
+
+    if connection is not None:
+        # Migrating a connection passed in programmatically, e.g. by tests
+        context.configure(
+            connection=connection, target_metadata=target_metadata
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+        return
+
     with db_engine.connect() as connection:
         context.configure(
             connection=connection, target_metadata=target_metadata
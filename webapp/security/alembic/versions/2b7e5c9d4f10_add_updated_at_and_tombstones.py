@@ -0,0 +1,195 @@
+"""add_updated_at_and_tombstones
+
+Revision ID: 2b7e5c9d4f10
+Revises: 6d1f3a9b8e27
+Create Date: 2026-10-19 14:02:55.718342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "2b7e5c9d4f10"
+down_revision = "6d1f3a9b8e27"
+branch_labels = None
+depends_on = None
+
+
+NOW = "timezone('utc', now())"
+
+# Columns whose changes aren't changes of the row: updated_at itself,
+# and the columns derived from the others
+IGNORED_COLUMNS = (
+    "ARRAY['updated_at', 'rendered', 'renderer_version', 'search_vector']"
+)
+
+# Child tables, and the parent rows they bump when they change
+PARENTS = {
+    "status": ("cve", "cve_id"),
+    "notice_cves": ("notice", "notice_id"),
+    "notice_releases": ("notice", "notice_id"),
+}
+
+
+def upgrade():
+    for table in ["cve", "status", "notice"]:
+        op.add_column(
+            table,
+            sa.Column(
+                "updated_at",
+                sa.DateTime(),
+                server_default=sa.text(NOW),
+                nullable=False,
+            ),
+        )
+
+    op.create_table(
+        "tombstone",
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column(
+            "deleted_at",
+            sa.DateTime(),
+            server_default=sa.text(NOW),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("kind", "id"),
+    )
+
+    # Only bumped when a row really changes, as the API and the
+    # ingestion rewrite rows which are unchanged, and not when only
+    # the columns derived from the others are, e.g. by a rerender or
+    # a search reindex. An explicit new updated_at, from a child
+    # table, is kept.
+    op.execute(
+        f"""
+        CREATE FUNCTION set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at
+            AND (to_jsonb(NEW) - {IGNORED_COLUMNS})
+                IS DISTINCT FROM (to_jsonb(OLD) - {IGNORED_COLUMNS})
+            THEN
+                NEW.updated_at := {NOW};
+            END IF;
+
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    # Bumps the parent rows, named by TG_ARGV, of the changed rows.
+    # Rows already bumped in the transaction, e.g. parents inserted
+    # along with their children, aren't rewritten.
+    op.execute(
+        """
+        CREATE FUNCTION touch_parents() RETURNS trigger AS $$
+        BEGIN
+            EXECUTE format(
+                'UPDATE %I SET updated_at = timezone(''utc'', now()) '
+                'WHERE id IN (SELECT %I FROM changed_rows) '
+                'AND updated_at != timezone(''utc'', now())',
+                TG_ARGV[0],
+                TG_ARGV[1]
+            );
+
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    # Records deleted rows, and forgets them when they come back
+    op.execute(
+        f"""
+        CREATE FUNCTION record_tombstones() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO tombstone (kind, id, deleted_at)
+                SELECT TG_TABLE_NAME, id, {NOW} FROM changed_rows
+                ON CONFLICT (kind, id) DO UPDATE
+                SET deleted_at = EXCLUDED.deleted_at;
+            ELSE
+                DELETE FROM tombstone
+                WHERE kind = TG_TABLE_NAME
+                AND id IN (SELECT id FROM changed_rows);
+            END IF;
+
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    for table in ["cve", "status", "notice"]:
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_updated_at_trigger
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE set_updated_at();
+            """
+        )
+
+    # Transition tables need a trigger for each event
+    for table in ["cve", "notice"]:
+        for event, transition in [("INSERT", "NEW"), ("DELETE", "OLD")]:
+            op.execute(
+                f"""
+                CREATE TRIGGER {table}_{event.lower()}_tombstone_trigger
+                AFTER {event} ON {table}
+                REFERENCING {transition} TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE PROCEDURE record_tombstones();
+                """
+            )
+
+    for table, (parent, column) in PARENTS.items():
+        for event, transition in [
+            ("INSERT", "NEW"),
+            ("UPDATE", "NEW"),
+            ("DELETE", "OLD"),
+        ]:
+            op.execute(
+                f"""
+                CREATE TRIGGER {table}_{event.lower()}_touch_trigger
+                AFTER {event} ON {table}
+                REFERENCING {transition} TABLE AS changed_rows
+                FOR EACH STATEMENT
+                EXECUTE PROCEDURE touch_parents('{parent}', '{column}');
+                """
+            )
+
+    op.create_index("ix_cve_updated_at", "cve", ["updated_at", "id"])
+    op.create_index("ix_notice_updated_at", "notice", ["updated_at", "id"])
+    op.create_index(
+        "ix_tombstone_deleted_at", "tombstone", ["deleted_at", "kind", "id"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_tombstone_deleted_at", table_name="tombstone")
+    op.drop_index("ix_notice_updated_at", table_name="notice")
+    op.drop_index("ix_cve_updated_at", table_name="cve")
+
+    for table in PARENTS:
+        for event in ["insert", "update", "delete"]:
+            op.execute(
+                f"DROP TRIGGER {table}_{event}_touch_trigger ON {table}"
+            )
+
+    for table in ["cve", "notice"]:
+        for event in ["insert", "delete"]:
+            op.execute(
+                f"DROP TRIGGER {table}_{event}_tombstone_trigger ON {table}"
+            )
+
+    for table in ["cve", "status", "notice"]:
+        op.execute(f"DROP TRIGGER {table}_updated_at_trigger ON {table}")
+
+    op.execute("DROP FUNCTION record_tombstones()")
+    op.execute("DROP FUNCTION touch_parents()")
+    op.execute("DROP FUNCTION set_updated_at()")
+    op.drop_table("tombstone")
+
+    for table in ["cve", "status", "notice"]:
+        op.drop_column(table, "updated_at")
@@ -0,0 +1,48 @@
+"""add_sitemap_shard_table
+
+Revision ID: 3c8d5f1e9a72
+Revises: 5a9e2b7c1f04
+Create Date: 2026-10-18 19:02:44.120937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3c8d5f1e9a72"
+down_revision = "5a9e2b7c1f04"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "sitemap_shard",
+        sa.Column("sitemap", sa.String(), nullable=False),
+        sa.Column("number", sa.Integer(), nullable=False),
+        sa.Column("last_published", sa.DateTime(), nullable=False),
+        sa.Column("last_id", sa.String(), nullable=False),
+        sa.Column("content", sa.LargeBinary(), nullable=False),
+        sa.Column("etag", sa.String(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("sitemap", "number"),
+    )
+
+    # Sitemaps now sort CVEs without a published date first, see
+    # webapp.security.sitemaps
+    op.drop_index("ix_cve_published_id", table_name="cve")
+    op.create_index(
+        "ix_cve_coalesce_published_id",
+        "cve",
+        [
+            sa.text("coalesce(published, '0001-01-01 00:00:00'::timestamp)"),
+            "id",
+        ],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_cve_coalesce_published_id", table_name="cve")
+    op.create_index("ix_cve_published_id", "cve", ["published", "id"])
+    op.drop_table("sitemap_shard")
@@ -0,0 +1,31 @@
+"""add_cache_version_table
+
+Revision ID: 5a9e2b7c1f04
+Revises: d41c6e0f8a23
+Create Date: 2026-10-18 13:25:09.771845
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5a9e2b7c1f04"
+down_revision = "d41c6e0f8a23"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_version = op.create_table(
+        "cache_version",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False, default=0),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+    op.bulk_insert(cache_version, [{"name": "releases", "version": 0}])
+
+
+def downgrade():
+    op.drop_table("cache_version")
@@ -0,0 +1,79 @@
+"""add_cve_facet_table
+
+Revision ID: 6d1f3a9b8e27
+Revises: 9e4b2c7d1a35
+Create Date: 2026-10-19 09:41:27.305514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "6d1f3a9b8e27"
+down_revision = "9e4b2c7d1a35"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "cve_facet",
+        sa.Column("cve_id", sa.String(), nullable=False),
+        sa.Column("package_name", sa.String(), nullable=False),
+        sa.Column("release_codename", sa.String(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="statuses", create_type=False),
+            nullable=True,
+        ),
+        sa.Column(
+            "component",
+            postgresql.ENUM(name="components", create_type=False),
+            nullable=True,
+        ),
+        sa.Column(
+            "priority",
+            postgresql.ENUM(name="priorities", create_type=False),
+            nullable=True,
+        ),
+        sa.Column(
+            "cve_status",
+            postgresql.ENUM(name="cve_statuses", create_type=False),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(["cve_id"], ["cve.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("cve_id", "package_name", "release_codename"),
+    )
+    op.create_index(
+        "ix_cve_facet_package_name", "cve_facet", ["package_name", "cve_id"]
+    )
+    op.create_index(
+        "ix_cve_facet_release_codename_status",
+        "cve_facet",
+        ["release_codename", "status", "cve_id"],
+    )
+    op.execute(
+        """
+        INSERT INTO cve_facet
+        SELECT
+            status.cve_id,
+            status.package_name,
+            status.release_codename,
+            status.status,
+            status.component,
+            cve.priority,
+            cve.status
+        FROM status
+        JOIN cve ON cve.id = status.cve_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_cve_facet_release_codename_status", table_name="cve_facet"
+    )
+    op.drop_index("ix_cve_facet_package_name", table_name="cve_facet")
+    op.drop_table("cve_facet")
@@ -0,0 +1,29 @@
+"""add_notice_rendered_columns
+
+Revision ID: 9e4b2c7d1a35
+Revises: 3c8d5f1e9a72
+Create Date: 2026-10-18 21:14:05.518390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9e4b2c7d1a35"
+down_revision = "3c8d5f1e9a72"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled in by scripts/rerender-notices.py
+    op.add_column("notice", sa.Column("rendered", sa.JSON(), nullable=True))
+    op.add_column(
+        "notice", sa.Column("renderer_version", sa.Integer(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("notice", "renderer_version")
+    op.drop_column("notice", "rendered")
@@ -0,0 +1,102 @@
+"""add_search_vector_columns
+
+Revision ID: b7f3a1d2c9e4
+Revises: 8008e46e6ea8
+Create Date: 2026-10-18 09:12:41.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+# revision identifiers, used by Alembic.
+revision = "b7f3a1d2c9e4"
+down_revision = "8008e46e6ea8"
+branch_labels = None
+depends_on = None
+
+
+CVE_SEARCH_VECTOR = """
+    setweight(to_tsvector('english', coalesce({row}.id, '')), 'A')
+    || setweight(
+        to_tsvector('english', coalesce({row}.ubuntu_description, '')), 'B'
+    )
+    || setweight(
+        to_tsvector('english', coalesce({row}.description, '')), 'C'
+    )
+"""
+
+NOTICE_SEARCH_VECTOR = """
+    setweight(to_tsvector('english', coalesce({row}.id, '')), 'A')
+    || setweight(to_tsvector('english', coalesce({row}.title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce({row}.details, '')), 'B')
+"""
+
+
+def upgrade():
+    op.add_column("cve", sa.Column("search_vector", TSVECTOR()))
+    op.add_column("notice", sa.Column("search_vector", TSVECTOR()))
+
+    # Keep the vectors up to date on insert and update
+    op.execute(
+        f"""
+        CREATE FUNCTION cve_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {CVE_SEARCH_VECTOR.format(row="NEW")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER cve_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF id, description, ubuntu_description
+        ON cve FOR EACH ROW EXECUTE PROCEDURE cve_search_vector_update();
+        """
+    )
+    op.execute(
+        f"""
+        CREATE FUNCTION notice_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {NOTICE_SEARCH_VECTOR.format(row="NEW")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER notice_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF id, title, details
+        ON notice FOR EACH ROW EXECUTE PROCEDURE notice_search_vector_update();
+        """
+    )
+
+    # Backfill existing rows
+    op.execute(
+        f"UPDATE cve SET search_vector = {CVE_SEARCH_VECTOR.format(row='cve')}"
+    )
+    op.execute(
+        "UPDATE notice SET search_vector = "
+        f"{NOTICE_SEARCH_VECTOR.format(row='notice')}"
+    )
+
+    op.create_index(
+        "ix_cve_search_vector",
+        "cve",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_notice_search_vector",
+        "notice",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade():
+    op.drop_index("ix_notice_search_vector", table_name="notice")
+    op.drop_index("ix_cve_search_vector", table_name="cve")
+    op.execute("DROP TRIGGER notice_search_vector_trigger ON notice")
+    op.execute("DROP TRIGGER cve_search_vector_trigger ON cve")
+    op.execute("DROP FUNCTION notice_search_vector_update()")
+    op.execute("DROP FUNCTION cve_search_vector_update()")
+    op.drop_column("notice", "search_vector")
+    op.drop_column("cve", "search_vector")
@@ -0,0 +1,102 @@
+"""add_security_indexes
+
+Revision ID: d41c6e0f8a23
+Revises: b7f3a1d2c9e4
+Create Date: 2026-10-18 11:03:27.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d41c6e0f8a23"
+down_revision = "b7f3a1d2c9e4"
+branch_labels = None
+depends_on = None
+
+
+ACTIVE_STATUSES = (
+    "('released', 'needed', 'deferred', 'needs-triage', 'pending')"
+)
+
+
+def upgrade():
+    # CVE listing sort key, see webapp.security.queries.get_cves_query
+    op.create_index(
+        "ix_cve_active_published_id",
+        "cve",
+        [
+            sa.text("coalesce(published, '0001-01-01 00:00:00'::timestamp)"),
+            "id",
+        ],
+        postgresql_where=sa.text("status = 'active'"),
+    )
+    # Sitemaps
+    op.create_index("ix_cve_published_id", "cve", ["published", "id"])
+
+    # Status filters
+    op.create_index(
+        "ix_status_package_name_release_codename_status",
+        "status",
+        ["package_name", "release_codename", "status"],
+    )
+    op.create_index(
+        "ix_status_release_codename_status_component",
+        "status",
+        ["release_codename", "status", "component"],
+    )
+    op.create_index(
+        "ix_status_active_cve_id",
+        "status",
+        ["cve_id", "package_name"],
+        postgresql_where=sa.text(f"status IN {ACTIVE_STATUSES}"),
+    )
+
+    # Notice listing, sitemaps and feed
+    op.create_index("ix_notice_published_id", "notice", ["published", "id"])
+
+    # Association table foreign keys
+    op.create_index(
+        "ix_notice_cves_notice_id_cve_id",
+        "notice_cves",
+        ["notice_id", "cve_id"],
+    )
+    op.create_index(
+        "ix_notice_cves_cve_id_notice_id",
+        "notice_cves",
+        ["cve_id", "notice_id"],
+    )
+    op.create_index(
+        "ix_notice_releases_notice_id_release_codename",
+        "notice_releases",
+        ["notice_id", "release_codename"],
+    )
+    op.create_index(
+        "ix_notice_releases_release_codename_notice_id",
+        "notice_releases",
+        ["release_codename", "notice_id"],
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_notice_releases_release_codename_notice_id",
+        table_name="notice_releases",
+    )
+    op.drop_index(
+        "ix_notice_releases_notice_id_release_codename",
+        table_name="notice_releases",
+    )
+    op.drop_index("ix_notice_cves_cve_id_notice_id", table_name="notice_cves")
+    op.drop_index("ix_notice_cves_notice_id_cve_id", table_name="notice_cves")
+    op.drop_index("ix_notice_published_id", table_name="notice")
+    op.drop_index("ix_status_active_cve_id", table_name="status")
+    op.drop_index(
+        "ix_status_release_codename_status_component", table_name="status"
+    )
+    op.drop_index(
+        "ix_status_package_name_release_codename_status", table_name="status"
+    )
+    op.drop_index("ix_cve_published_id", table_name="cve")
+    op.drop_index("ix_cve_active_published_id", table_name="cve")
@@ -1,12 +1,17 @@
 # Standard library
 from datetime import datetime, timedelta
+from threading import Lock
 
 # Packages
 import flask
+import talisker.metrics
 from launchpadlib.launchpad import Launchpad
 from macaroonbakery import bakery, checkers, httpbakery
 from functools import wraps
 
+# Local
+from webapp.security.cache import TTLCache
+
 AUTHORIZED_TEAMS = [
     "canonical-security-web",
     "canonical-security",
@@ -24,6 +29,26 @@ IDENTITY_CAVEATS = [
 ]
 
 
+# Launchpad requests made for each uncached membership lookup:
+# the person, and their team memberships
+LOOKUP_CALLS = 2
+
+# Users who were just added to a team shouldn't wait too long
+authorized_users = TTLCache(ttl=600)
+unauthorized_users = TTLCache(ttl=60)
+
+launchpad_calls_saved = talisker.metrics.Counter(
+    name="security_auth_launchpad_calls_saved",
+    documentation="Launchpad requests avoided by the team membership cache",
+    statsd="{name}",
+)
+
+_lock = Lock()
+_launchpad_lock = Lock()
+_macaroon_bakery = None
+_launchpad = None
+
+
 class Identity(bakery.Identity):
     """Identity information for a Candid third party caveat."""
 
@@ -53,6 +78,81 @@ class IdentityClient(bakery.IdentityClient):
         return Identity(username)
 
 
+def get_bakery():
+    """
+    The bakery is kept for the life of the process, rather than
+    generating a new key for every request
+    """
+
+    global _macaroon_bakery
+
+    with _lock:
+        if _macaroon_bakery is None:
+            _macaroon_bakery = bakery.Bakery(
+                location="ubuntu.com/security",
+                locator=httpbakery.ThirdPartyLocator(),
+                identity_client=IdentityClient(),
+                key=bakery.generate_key(),
+                root_key_store=bakery.MemoryKeyStore(
+                    flask.current_app.config["SECRET_KEY"]
+                ),
+            )
+
+    return _macaroon_bakery
+
+
+def get_launchpad():
+    global _launchpad
+
+    with _lock:
+        if _launchpad is None:
+            _launchpad = Launchpad.login_anonymously(
+                "ubuntu.com/security", "production", version="devel"
+            )
+
+    return _launchpad
+
+
+def is_authorized_user(username):
+    """
+    Whether the Launchpad user is a member of any of the authorized
+    teams. Both answers are cached, so that scripts making thousands
+    of API calls don't query Launchpad for each of them.
+    """
+
+    for cache in (authorized_users, unauthorized_users):
+        authorized = cache.get(username)
+
+        if authorized is not None:
+            launchpad_calls_saved.inc(LOOKUP_CALLS)
+            return authorized
+
+    launchpad = get_launchpad()
+
+    # The Launchpad client isn't safe to share between threads
+    with _launchpad_lock:
+        try:
+            lp_user = launchpad.people[username]
+        except KeyError:
+            teams = set()
+        else:
+            # Team links look like https://api.launchpad.net/devel/~team
+            teams = {
+                membership.team_link.rsplit("~", 1)[-1]
+                for membership in lp_user.memberships_details
+                if membership.status in ("Approved", "Administrator")
+            }
+
+    authorized = bool(teams.intersection(AUTHORIZED_TEAMS))
+
+    if authorized:
+        authorized_users.set(username, True)
+    else:
+        unauthorized_users.set(username, False)
+
+    return authorized
+
+
 def authorization_required(func):
     """
     Decorator that checks if a user is logged in, and redirects
@@ -61,20 +161,9 @@ def authorization_required(func):
 
     @wraps(func)
     def is_authorized(*args, **kwargs):
-        macaroon_bakery = bakery.Bakery(
-            location="ubuntu.com/security",
-            locator=httpbakery.ThirdPartyLocator(),
-            identity_client=IdentityClient(),
-            key=bakery.generate_key(),
-            root_key_store=bakery.MemoryKeyStore(
-                flask.current_app.config["SECRET_KEY"]
-            ),
-        )
+        macaroon_bakery = get_bakery()
         macaroons = httpbakery.extract_macaroons(flask.request.headers)
         auth_checker = macaroon_bakery.checker.auth(macaroons)
-        launchpad = Launchpad.login_anonymously(
-            "ubuntu.com/security", "production", version="devel"
-        )
 
         try:
             auth_info = auth_checker.allow(
@@ -94,21 +183,20 @@ def authorization_required(func):
             return content, 401, headers
 
         username = auth_info.identity.username()
-        lp_user = launchpad.people(username)
-        authorized = False
-
-        for team in AUTHORIZED_TEAMS:
-            if lp_user in launchpad.people(team).members:
-                authorized = True
-                break
 
-        if not authorized:
+        if not is_authorized_user(username):
             return (
                 f"{username} is not in any of the authorized teams: "
                 f"{str(AUTHORIZED_TEAMS)}",
                 401,
             )
 
+        # Imported lazily, as the database module needs DATABASE_URL
+        from webapp.security.database import db_session
+
+        # Writes, and the reads they depend on, go to the primary
+        db_session().use_primary()
+
         # Validate authentication token
         return func(*args, **kwargs)
 
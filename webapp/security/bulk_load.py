@@ -0,0 +1,426 @@
+"""
+Bulk loading of CVE tracker and notice exports.
+
+Each batch is validated with the API schemas, written to temporary
+staging tables with COPY and merged into the real tables with a few
+set-based statements, in one transaction on its own connection. This
+is much faster than the API for bootstrapping an environment, and
+batches can be loaded in parallel from separate processes.
+
+Merges follow the API: CVE statuses which aren't in the data are
+deleted, notices referencing unknown CVEs get stub CVEs, and only the
+last copy of a CVE or notice in a batch counts.
+"""
+
+# Standard library
+import io
+import json
+from datetime import datetime
+
+# Packages
+from marshmallow import EXCLUDE
+from psycopg2 import errors
+from sqlalchemy.types import JSON
+
+# Local
+from webapp.security.database import db_session
+from webapp.security.ingestion import CVE_COLUMNS, STATUS_COLUMNS
+from webapp.security.models import CVE, Notice, Status
+from webapp.security.schemas import CVESchema, NoticeSchema
+
+
+NOTICE_COLUMNS = [
+    "title",
+    "published",
+    "summary",
+    "details",
+    "instructions",
+    "release_packages",
+    "references",
+    "is_hidden",
+]
+
+# Merges of overlapping batches can deadlock on package or stub CVE
+# rows, in which case the whole batch is retried
+MERGE_ATTEMPTS = 3
+
+
+def _copy_value(value):
+    """
+    A value in the COPY text format
+    """
+
+    if value is None:
+        return "\\N"
+
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy(cursor, table, columns, rows):
+    """
+    Write rows, as tuples of values for the columns, to a table
+    with COPY
+    """
+
+    data = io.StringIO()
+
+    for row in rows:
+        data.write("\t".join(_copy_value(value) for value in row) + "\n")
+
+    data.seek(0)
+    names = ", ".join(f'"{column}"' for column in columns)
+    cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN", data)
+
+
+def _changed(table, columns):
+    """
+    A condition for an upsert into a table, true when the excluded row
+    differs from the stored one the way the API compares them: JSON by
+    value and the published timestamp by day
+    """
+
+    def comparable(alias, column):
+        expression = f'{alias}."{column}"'
+
+        if isinstance(table.c[column].type, JSON):
+            return f"{expression}::jsonb"
+
+        if column == "published":
+            return f"date_trunc('day', {expression})"
+
+        return expression
+
+    stored = ", ".join(comparable(table.name, column) for column in columns)
+    excluded = ", ".join(comparable("excluded", column) for column in columns)
+
+    return f"({stored}) IS DISTINCT FROM ({excluded})"
+
+
+def _upsert_counts(cursor, statement):
+    """
+    Run an INSERT ... RETURNING (xmax = 0) statement, returning the
+    number of rows it created and updated
+    """
+
+    cursor.execute(
+        f"""
+        WITH written AS ({statement})
+        SELECT
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted)
+        FROM written
+        """
+    )
+
+    return cursor.fetchone()
+
+
+def _stage(cursor, table, like):
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {table} (LIKE {like} INCLUDING DEFAULTS) "
+        "ON COMMIT DROP"
+    )
+
+
+def _merge_cves(cursor, cves_data):
+    cve_rows = []
+    package_rows = {}
+    status_rows = {}
+
+    for data in cves_data:
+        cve_rows.append(
+            [data["id"]] + [data.get(column) for column in CVE_COLUMNS]
+        )
+
+        for package_data in data.get("packages", []):
+            package_rows.setdefault(
+                package_data["name"],
+                [
+                    package_data["name"],
+                    package_data["source"],
+                    package_data["ubuntu"],
+                    package_data["debian"],
+                ],
+            )
+
+            for status_data in package_data["statuses"]:
+                key = (
+                    data["id"],
+                    package_data["name"],
+                    status_data["release_codename"],
+                )
+                status_rows[key] = list(key) + [
+                    status_data.get(column) for column in STATUS_COLUMNS
+                ]
+
+    _stage(cursor, "staging_cve", "cve")
+    _stage(cursor, "staging_package", "package")
+    _stage(cursor, "staging_status", "status")
+    _copy(cursor, "staging_cve", ["id"] + CVE_COLUMNS, cve_rows)
+    _copy(
+        cursor,
+        "staging_package",
+        ["name", "source", "ubuntu", "debian"],
+        package_rows.values(),
+    )
+    _copy(
+        cursor,
+        "staging_status",
+        ["cve_id", "package_name", "release_codename"] + STATUS_COLUMNS,
+        status_rows.values(),
+    )
+
+    counts = {"created": {}, "updated": {}, "deleted": {}}
+
+    # Existing packages are left as they are. Inserting in order
+    # keeps parallel merges from deadlocking on each other's rows.
+    cursor.execute(
+        """
+        INSERT INTO package (name, source, ubuntu, debian)
+        SELECT name, source, ubuntu, debian FROM staging_package
+        ORDER BY name
+        ON CONFLICT (name) DO NOTHING
+        """
+    )
+    counts["created"]["Package"] = cursor.rowcount
+
+    names = ", ".join(f'"{column}"' for column in ["id"] + CVE_COLUMNS)
+    updates = ", ".join(
+        f'"{column}" = excluded."{column}"' for column in CVE_COLUMNS
+    )
+    counts["created"]["CVE"], counts["updated"]["CVE"] = _upsert_counts(
+        cursor,
+        f"""
+        INSERT INTO cve ({names})
+        SELECT {names} FROM staging_cve ORDER BY id
+        ON CONFLICT (id) DO UPDATE SET {updates}
+        WHERE {_changed(CVE.__table__, CVE_COLUMNS)}
+        RETURNING xmax = 0 AS inserted
+        """,
+    )
+
+    cursor.execute(
+        """
+        DELETE FROM status
+        USING staging_cve
+        WHERE status.cve_id = staging_cve.id
+        AND NOT EXISTS (
+            SELECT 1 FROM staging_status
+            WHERE staging_status.cve_id = status.cve_id
+            AND staging_status.package_name = status.package_name
+            AND staging_status.release_codename = status.release_codename
+        )
+        """
+    )
+    counts["deleted"]["Status"] = cursor.rowcount
+
+    key = '"cve_id", "package_name", "release_codename"'
+    names = ", ".join([key] + [f'"{column}"' for column in STATUS_COLUMNS])
+    updates = ", ".join(
+        f'"{column}" = excluded."{column}"' for column in STATUS_COLUMNS
+    )
+    counts["created"]["Status"], counts["updated"]["Status"] = _upsert_counts(
+        cursor,
+        f"""
+        INSERT INTO status ({names})
+        SELECT {names} FROM staging_status ORDER BY {key}
+        ON CONFLICT ({key}) DO UPDATE SET {updates}
+        WHERE {_changed(Status.__table__, STATUS_COLUMNS)}
+        RETURNING xmax = 0 AS inserted
+        """,
+    )
+
+    # Rebuilt for every staged CVE, which is cheaper in bulk than
+    # finding the ones which changed
+    cursor.execute(
+        """
+        DELETE FROM cve_facet
+        WHERE cve_id IN (SELECT id FROM staging_cve)
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO cve_facet
+        SELECT
+            status.cve_id,
+            status.package_name,
+            status.release_codename,
+            status.status,
+            status.component,
+            cve.priority,
+            cve.status
+        FROM status
+        JOIN cve ON cve.id = status.cve_id
+        WHERE status.cve_id IN (SELECT id FROM staging_cve)
+        """
+    )
+
+    return counts, len(cve_rows) + len(package_rows) + len(status_rows)
+
+
+def _merge_notices(cursor, notices_data):
+    notice_rows = []
+    cve_rows = set()
+    release_rows = set()
+
+    for data in notices_data:
+        notice_rows.append(
+            [
+                data["id"],
+                data["title"],
+                data["published"],
+                data["summary"],
+                data.get("description"),
+                data["instructions"],
+                data["release_packages"],
+                data.get("references"),
+                data.get("is_hidden", False),
+            ]
+        )
+        cve_rows.update((data["id"], cve_id) for cve_id in data["cves"])
+        release_rows.update(
+            (data["id"], codename)
+            for codename in data["release_packages"].keys()
+        )
+
+    _stage(cursor, "staging_notice", "notice")
+    _stage(cursor, "staging_notice_cves", "notice_cves")
+    _stage(cursor, "staging_notice_releases", "notice_releases")
+    _copy(cursor, "staging_notice", ["id"] + NOTICE_COLUMNS, notice_rows)
+    _copy(cursor, "staging_notice_cves", ["notice_id", "cve_id"], cve_rows)
+    _copy(
+        cursor,
+        "staging_notice_releases",
+        ["notice_id", "release_codename"],
+        release_rows,
+    )
+
+    counts = {"created": {}, "updated": {}, "deleted": {}}
+
+    cursor.execute(
+        """
+        INSERT INTO cve (id)
+        SELECT DISTINCT cve_id FROM staging_notice_cves ORDER BY cve_id
+        ON CONFLICT (id) DO NOTHING
+        """
+    )
+    counts["created"]["CVE"] = cursor.rowcount
+
+    names = ", ".join(f'"{column}"' for column in ["id"] + NOTICE_COLUMNS)
+    updates = ", ".join(
+        f'"{column}" = excluded."{column}"' for column in NOTICE_COLUMNS
+    )
+
+    # Changed notices are left for rerender_notices to render
+    counts["created"]["Notice"], counts["updated"]["Notice"] = _upsert_counts(
+        cursor,
+        f"""
+        INSERT INTO notice ({names})
+        SELECT {names} FROM staging_notice ORDER BY id
+        ON CONFLICT (id) DO UPDATE
+        SET {updates}, renderer_version = NULL
+        WHERE {_changed(Notice.__table__, NOTICE_COLUMNS)}
+        RETURNING xmax = 0 AS inserted
+        """,
+    )
+
+    for table, column in [
+        ("notice_cves", "cve_id"),
+        ("notice_releases", "release_codename"),
+    ]:
+        # Only the associations which changed are written, so that
+        # unchanged notices keep their updated_at
+        cursor.execute(
+            f"""
+            DELETE FROM {table}
+            WHERE notice_id IN (SELECT id FROM staging_notice)
+            AND (notice_id, {column}) NOT IN (
+                SELECT notice_id, {column} FROM staging_{table}
+            )
+            """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (notice_id, {column})
+            SELECT notice_id, {column} FROM staging_{table} AS staged
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table}
+                WHERE {table}.notice_id = staged.notice_id
+                AND {table}.{column} = staged.{column}
+            )
+            """
+        )
+
+    return (
+        counts,
+        len(notice_rows) + len(cve_rows) + len(release_rows),
+    )
+
+
+LOADERS = {
+    "cves": (CVESchema, _merge_cves),
+    "notices": (NoticeSchema, _merge_notices),
+}
+
+
+def validate(kind, items, release_codenames):
+    """
+    Deserialize a list of CVEs or notices with the API schema,
+    raising a marshmallow ValidationError if any are invalid.
+    Only the last copy of each CVE or notice is kept.
+    """
+
+    schema_class, _ = LOADERS[kind]
+    schema = schema_class(many=True)
+    schema.context["release_codenames"] = release_codenames
+
+    return list(
+        {
+            data["id"]: data for data in schema.load(items, unknown=EXCLUDE)
+        }.values()
+    )
+
+
+def load(kind, items_data):
+    """
+    Stage and merge a batch of validated CVEs or notices, and commit.
+
+    Returns the counts of created, updated and deleted rows by model,
+    and the number of rows staged
+    """
+
+    _, merge = LOADERS[kind]
+
+    for attempt in range(1, MERGE_ATTEMPTS + 1):
+        connection = db_session.get_bind().raw_connection()
+
+        try:
+            with connection.cursor() as cursor:
+                counts, rows = merge(cursor, items_data)
+
+            connection.commit()
+
+            return counts, rows
+        except errors.DeadlockDetected:
+            connection.rollback()
+
+            if attempt == MERGE_ATTEMPTS:
+                raise
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
@@ -0,0 +1,146 @@
+from threading import Lock
+from time import monotonic
+
+from webapp.security.models import CacheVersion
+
+
+class TTLCache:
+    """
+    A small in-process cache where every entry expires
+    a fixed number of seconds after it was set
+    """
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+
+        if entry is None or entry[0] < monotonic():
+            return default
+
+        return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                self._evict()
+
+            self._entries[key] = (monotonic() + self.ttl, value)
+
+    def get_or_set(self, key, function):
+        """
+        Return the cached value for key, or call function
+        to compute and store it
+        """
+
+        missing = object()
+        value = self.get(key, missing)
+
+        if value is missing:
+            value = function()
+            self.set(key, value)
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        # Drop expired entries, or the oldest half if none have expired
+        now = monotonic()
+        expired = [k for k, (t, _) in self._entries.items() if t < now]
+
+        if not expired:
+            by_expiry = sorted(
+                self._entries, key=lambda k: self._entries[k][0]
+            )
+            expired = by_expiry[: len(by_expiry) // 2 or 1]
+
+        for key in expired:
+            del self._entries[key]
+
+
+class VersionedCache(TTLCache):
+    """
+    A TTLCache which is also cleared whenever a CacheVersion stamp
+    changes, so that a write in any process expires it in all of them.
+    The stamp is read at most once every `check_interval` seconds.
+    """
+
+    def __init__(
+        self, version_name, ttl, maxsize=1024, check_interval=10, session=None
+    ):
+        super().__init__(ttl, maxsize=maxsize)
+        self.version_name = version_name
+        self.check_interval = check_interval
+        self._session = session
+        self._version = None
+        self._checked_at = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            # Imported lazily, as the database module needs DATABASE_URL
+            from webapp.security.database import db_session
+
+            self._session = db_session
+
+        return self._session
+
+    def _stored_version(self):
+        return (
+            self.session.query(CacheVersion.version)
+            .filter(CacheVersion.name == self.version_name)
+            .scalar()
+        ) or 0
+
+    def _check_version(self):
+        now = monotonic()
+
+        if (
+            self._checked_at is not None
+            and now - self._checked_at < self.check_interval
+        ):
+            return
+
+        version = self._stored_version()
+
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+        self._checked_at = now
+
+    def get(self, key, default=None):
+        self._check_version()
+
+        return super().get(key, default)
+
+    def invalidate(self):
+        """
+        Bump the version stamp in the current transaction, so every
+        process clears the cache once it's committed. Commit it after
+        the changes, on its own, or a process can refill the cache
+        from the data before them under the new version.
+        """
+
+        updated = (
+            self.session.query(CacheVersion)
+            .filter(CacheVersion.name == self.version_name)
+            .update(
+                {CacheVersion.version: CacheVersion.version + 1},
+                synchronize_session=False,
+            )
+        )
+
+        if not updated:
+            self.session.add(CacheVersion(name=self.version_name, version=1))
+
+        self.clear()
+        self._version = None
+        self._checked_at = None
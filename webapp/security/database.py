@@ -1,17 +1,145 @@
 import os
+import random
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+import flask
+from psycopg2 import extensions, OperationalError
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
 
-from webapp.security.models import BaseFilterQuery
+from webapp.security.models import BaseFilterQuery, clear_get_cache
 
 
-db_engine = create_engine(os.environ["DATABASE_URL"])
-db_session = scoped_session(
-    sessionmaker(
-        autocommit=False,
-        autoflush=False,
-        bind=db_engine,
-        query_cls=BaseFilterQuery,
+# Request methods which can be served by a read replica
+READ_METHODS = ["GET", "HEAD", "OPTIONS"]
+
+
+def _gevent_wait_callback(connection, timeout=None):
+    """
+    Wait for psycopg2 by yielding to the other greenlets, rather than
+    blocking the whole worker, as described in the psycopg2 docs
+    """
+
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = connection.poll()
+
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f"Bad result from poll: {state}")
+
+
+def make_psycopg2_cooperative():
+    """
+    In gevent workers, which have patched the socket module before
+    loading the app, make psycopg2 yield while it waits on the database.
+    Must be called before any connection is made.
+
+    Returns whether psycopg2 is now cooperative
+    """
+
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+
+    if not monkey.is_module_patched("socket"):
+        return False
+
+    extensions.set_wait_callback(_gevent_wait_callback)
+
+    return True
+
+
+def _create_engine(url, prefix):
+    """
+    Create an engine with a pool configured by environment variables,
+    e.g. DATABASE_POOL_SIZE.
+
+    A blocking worker only runs one query at a time, but a gevent
+    worker runs one per greenlet waiting on the database, so its
+    default pool is larger. Greenlets beyond that wait for a
+    connection, for at most the pool timeout.
+    """
+
+    pool_size, max_overflow = (20, 30) if cooperative_psycopg2 else (5, 10)
+
+    return create_engine(
+        url,
+        pool_size=int(os.getenv(f"{prefix}_POOL_SIZE", pool_size)),
+        max_overflow=int(os.getenv(f"{prefix}_MAX_OVERFLOW", max_overflow)),
+        pool_timeout=int(os.getenv(f"{prefix}_POOL_TIMEOUT", 10)),
     )
+
+
+class RoutingSession(Session):
+    """
+    A session which reads from one of the `read_binds` while handling
+    a request which can't write, like a GET, and uses the primary bind
+    for everything else.
+
+    Once a session writes, or after use_primary(), it sticks to the
+    primary, so that it reads its own writes.
+    """
+
+    def __init__(self, read_binds=(), **kwargs):
+        super().__init__(**kwargs)
+        self.read_binds = list(read_binds)
+
+    def use_primary(self):
+        self.info["use_primary"] = True
+
+    def _read_bind(self):
+        if "read_bind" not in self.info:
+            self.info["read_bind"] = random.choice(self.read_binds)
+
+        return self.info["read_bind"]
+
+    def get_bind(self, mapper=None, clause=None):
+        primary = super().get_bind(mapper=mapper, clause=clause)
+
+        if not self.read_binds or self.info.get("use_primary"):
+            return primary
+
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.use_primary()
+
+            return primary
+
+        if (
+            flask.has_request_context()
+            and flask.request.method in READ_METHODS
+        ):
+            return self._read_bind()
+
+        return primary
+
+
+cooperative_psycopg2 = make_psycopg2_cooperative()
+db_engine = _create_engine(os.environ["DATABASE_URL"], "DATABASE")
+
+# Comma separated URLs of read replicas of DATABASE_URL
+db_read_engines = [
+    _create_engine(url.strip(), "DATABASE_READ")
+    for url in os.getenv("DATABASE_READ_URL", "").split(",")
+    if url.strip()
+]
+
+session_factory = sessionmaker(
+    class_=RoutingSession,
+    autocommit=False,
+    autoflush=False,
+    bind=db_engine,
+    read_binds=db_read_engines,
+    query_cls=BaseFilterQuery,
 )
+db_session = scoped_session(session_factory)
+
+for event_name in ["after_flush", "after_commit", "after_soft_rollback"]:
+    event.listen(session_factory, event_name, clear_get_cache)
@@ -0,0 +1,503 @@
+"""
+Full exports of the CVE and notice data, as static files.
+
+The data is split into partitions, one per kind and release: the CVEs
+with statuses in the release, with those statuses, and the notices
+for the release, with its packages. The CVEs and notices without a
+release go in the NO_RELEASE partitions. Each partition is written
+with a server-side cursor, so memory use doesn't grow with the data,
+to a gzipped file whose name holds its ETag, and index.json lists the
+current files. Each file has a gzipped list of its IDs next to it,
+which isn't served.
+
+index.json also has a cursor for the changes feed. The next refresh
+reads the changes after it, and only rebuilds the partitions which
+held, by their lists of IDs, or now hold, by the database, a changed
+CVE or notice. Clients can load the files and then follow the changes
+feed from the same cursor.
+"""
+
+# Standard library
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+# Packages
+import dateutil.parser
+from sqlalchemy import exists
+
+# Local
+from webapp.security.database import db_session
+from webapp.security.ingestion import CVE_COLUMNS, STATUS_COLUMNS, batches
+from webapp.security.models import (
+    CVE,
+    Notice,
+    Package,
+    Status,
+    notice_releases,
+)
+from webapp.security.pagination import decode_cursor, encode_cursor
+from webapp.security.queries import get_changes, get_notices_associations
+from webapp.security.registry import release_registry
+
+
+EXPORTS_DIR = os.getenv(
+    "SECURITY_EXPORTS_DIR", os.path.join(os.getcwd(), "security-exports")
+)
+MANIFEST = "index.json"
+
+# Rows fetched from the server-side cursors at a time
+EXPORT_BATCH_SIZE = 1000
+
+# Files which are no longer listed are kept this long, for clients
+# which are still downloading them
+EXPORT_RETENTION_SECONDS = 24 * 3600
+
+# Partition of the CVEs and notices without a release
+NO_RELEASE = "none"
+
+PACKAGE_COLUMNS = ["name", "source", "ubuntu", "debian"]
+
+NOTICE_COLUMNS = [
+    Notice.id,
+    Notice.title,
+    Notice.summary,
+    Notice.instructions,
+    Notice.references,
+    Notice.published,
+    Notice.details.label("description"),
+    Notice.release_packages,
+]
+
+
+def _in_partition(kind, codename):
+    """
+    The condition for the CVEs or notices in the partition of a release
+    """
+
+    if kind == "cves":
+        condition = exists().where(Status.cve_id == CVE.id)
+
+        if codename != NO_RELEASE:
+            condition = condition.where(Status.release_codename == codename)
+    else:
+        condition = exists().where(notice_releases.c.notice_id == Notice.id)
+
+        if codename != NO_RELEASE:
+            condition = condition.where(
+                notice_releases.c.release_codename == codename
+            )
+
+    return ~condition if codename == NO_RELEASE else condition
+
+
+def _cve_items(codename):
+    """
+    The CVEs with statuses in a release, in the shape the CVE API
+    accepts, with only the statuses in the release
+    """
+
+    if codename == NO_RELEASE:
+        rows = (
+            db_session.query(
+                CVE.id, *[CVE.__table__.c[column] for column in CVE_COLUMNS]
+            )
+            .filter(_in_partition("cves", NO_RELEASE))
+            .order_by(CVE.id)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+
+        for row in rows:
+            yield {**dict(zip(["id"] + CVE_COLUMNS, row)), "packages": []}
+
+        return
+
+    rows = (
+        db_session.query(
+            CVE.id,
+            *[CVE.__table__.c[column] for column in CVE_COLUMNS],
+            *[
+                Package.__table__.c[column].label(f"package_{column}")
+                for column in PACKAGE_COLUMNS
+            ],
+            *[
+                Status.__table__.c[column].label(f"status_{column}")
+                for column in STATUS_COLUMNS
+            ],
+        )
+        .join(Status, Status.cve_id == CVE.id)
+        .join(Package, Package.name == Status.package_name)
+        .filter(Status.release_codename == codename)
+        .order_by(CVE.id, Package.name)
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+
+    cve = None
+
+    # One row for each of the CVE's packages
+    for row in rows:
+        values = row._asdict()
+
+        if cve is None or cve["id"] != values["id"]:
+            if cve:
+                yield cve
+
+            cve = {column: values[column] for column in ["id"] + CVE_COLUMNS}
+            cve["packages"] = []
+
+        package = {
+            column: values[f"package_{column}"] for column in PACKAGE_COLUMNS
+        }
+        status = {"release_codename": codename}
+
+        for column in STATUS_COLUMNS:
+            # The API leaves out a status' unknown component or pocket
+            if values[f"status_{column}"] is not None:
+                status[column] = values[f"status_{column}"]
+
+        package["statuses"] = [status]
+        cve["packages"].append(package)
+
+    if cve:
+        yield cve
+
+
+def _notice_items(codename):
+    """
+    The visible notices for a release, in the shape the notices API
+    accepts, with only the packages of the release
+    """
+
+    rows = (
+        db_session.query(*NOTICE_COLUMNS)
+        .filter(_in_partition("notices", codename))
+        .order_by(Notice.id)
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+
+    for rows_batch in batches(rows, size=EXPORT_BATCH_SIZE):
+        cve_ids, _ = get_notices_associations([row.id for row in rows_batch])
+
+        for row in rows_batch:
+            notice = row._asdict()
+            notice["cves"] = cve_ids[notice["id"]]
+
+            if codename != NO_RELEASE:
+                notice["release_packages"] = {
+                    codename: (notice["release_packages"] or {}).get(
+                        codename, []
+                    )
+                }
+
+            yield notice
+
+
+KINDS = {
+    "cves": {"model": CVE, "change": "cve", "items": _cve_items},
+    "notices": {"model": Notice, "change": "notice", "items": _notice_items},
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    raise TypeError(f"Can't export {value!r}")
+
+
+def _write_ndjson(items, export_file):
+    """
+    Write items as lines of JSON, returning the number written
+    """
+
+    rows = 0
+
+    for item in items:
+        line = json.dumps(item, default=_json_default, sort_keys=True)
+        export_file.write(line.encode("utf-8") + b"\n")
+        rows += 1
+
+    return rows
+
+
+# The file formats an export can be written in, by name
+EXPORT_FORMATS = {
+    "ndjson": {"extension": "ndjson.gz", "write": _write_ndjson},
+}
+
+
+class _HashingWriter:
+    """
+    A file-like object which hashes what's written to it, before it's
+    compressed, so that ETags don't depend on the compression
+    """
+
+    def __init__(self, export_file):
+        self.export_file = export_file
+        self.digest = hashlib.sha1()
+
+    def write(self, data):
+        self.digest.update(data)
+        self.export_file.write(data)
+
+
+def _recording_ids(items, ids_file):
+    """
+    Pass items through, writing their IDs to a file, one per line
+    """
+
+    for item in items:
+        ids_file.write(item["id"].encode("utf-8") + b"\n")
+        yield item
+
+
+def _ids_file_name(file_name):
+    """
+    The name of the list of IDs of an export file
+    """
+
+    return file_name.split(".", 1)[0] + ".ids.gz"
+
+
+def _lists_any(ids_path, ids):
+    """
+    Whether a list of IDs has any of the IDs, read a line at a time.
+    A missing list could have any.
+    """
+
+    if not os.path.exists(ids_path):
+        return True
+
+    with gzip.open(ids_path, "rt", encoding="utf-8") as ids_file:
+        return any(line.rstrip("\n") in ids for line in ids_file)
+
+
+def _changed_ids(change_cursor):
+    """
+    The IDs of the CVEs and notices which changed after a changes feed
+    cursor, by kind, and the cursor for the changes after them
+    """
+
+    values, page = decode_cursor(change_cursor)
+    after = (dateutil.parser.isoparse(values[0]), values[1], values[2])
+    ids = {"cve": set(), "notice": set()}
+
+    while True:
+        changes, has_more = get_changes(after=after, limit=EXPORT_BATCH_SIZE)
+
+        for _, kind, change_id, _ in changes:
+            ids[kind].add(change_id)
+
+        if changes:
+            after = changes[-1][:3]
+            page += 1
+
+        if not has_more:
+            return ids, encode_cursor(after, page)
+
+
+def _latest_change_cursor():
+    """
+    A changes feed cursor for the changes after the latest one
+    """
+
+    cursor = encode_cursor([datetime.min, "", ""], 1)
+    _, cursor = _changed_ids(cursor)
+
+    return cursor
+
+
+def _is_affected(kind, codename, changed_ids, previous_ids_path):
+    """
+    Whether the partition of a release held, or holds, changed items
+    """
+
+    if not changed_ids:
+        return False
+
+    model = KINDS[kind]["model"]
+
+    for ids_batch in batches(sorted(changed_ids), size=EXPORT_BATCH_SIZE):
+        if (
+            db_session.query(model.id)
+            .filter(model.id.in_(ids_batch), _in_partition(kind, codename))
+            .first()
+        ):
+            return True
+
+    return _lists_any(previous_ids_path, changed_ids)
+
+
+def _write_partition(directory, export_format, kind, codename):
+    """
+    Write the partition of a release, and the list of its IDs, to
+    temporary files in the directory, returning their paths, its ETag
+    and number of rows
+    """
+
+    write = EXPORT_FORMATS[export_format]["write"]
+
+    with tempfile.NamedTemporaryFile(
+        dir=directory, prefix=".", delete=False
+    ) as temporary_file, tempfile.NamedTemporaryFile(
+        dir=directory, prefix=".", delete=False
+    ) as ids_temporary_file:
+        with gzip.GzipFile(
+            fileobj=temporary_file, mode="wb", mtime=0
+        ) as gzip_file, gzip.GzipFile(
+            fileobj=ids_temporary_file, mode="wb", mtime=0
+        ) as ids_file:
+            writer = _HashingWriter(gzip_file)
+            rows = write(
+                _recording_ids(KINDS[kind]["items"](codename), ids_file),
+                writer,
+            )
+
+    return (
+        temporary_file.name,
+        ids_temporary_file.name,
+        writer.digest.hexdigest(),
+        rows,
+    )
+
+
+def read_manifest(directory=None):
+    """
+    The index of the current export files, or None before the first
+    export
+    """
+
+    path = os.path.join(directory or EXPORTS_DIR, MANIFEST)
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def _remove_unlisted(directory, manifest):
+    listed = {MANIFEST}
+
+    for entry in manifest["files"].values():
+        listed.update([entry["file"], _ids_file_name(entry["file"])])
+
+    expired = time.time() - EXPORT_RETENTION_SECONDS
+
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+
+        if name not in listed and os.path.getmtime(path) < expired:
+            os.remove(path)
+
+
+def refresh_exports(directory=None, export_format="ndjson", rebuild=False):
+    """
+    Bring the export files in a directory up to date with the
+    database, in one consistent snapshot of it.
+
+    Only the partitions which held, or now hold, a CVE or notice that
+    changed since the last export are rebuilt, unless `rebuild` is set.
+    A rebuilt partition's file is only replaced if its content changed.
+
+    Returns the names of the partitions written
+    """
+
+    directory = directory or EXPORTS_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    previous = read_manifest(directory)
+
+    if previous and previous["format"] != export_format:
+        previous = None
+
+    db_session.connection(
+        execution_options={"isolation_level": "REPEATABLE READ"}
+    )
+
+    if previous and not rebuild:
+        changed_ids, change_cursor = _changed_ids(previous["change_cursor"])
+        previous_files = previous["files"]
+    else:
+        changed_ids = None
+        change_cursor = _latest_change_cursor()
+        previous_files = {}
+
+    extension = EXPORT_FORMATS[export_format]["extension"]
+    files = {}
+    written = []
+
+    try:
+        for kind, kind_options in KINDS.items():
+            for codename in release_registry.codenames() + [NO_RELEASE]:
+                name = f"{kind}-{codename}"
+                entry = previous_files.get(name)
+
+                if (
+                    entry
+                    and changed_ids is not None
+                    and not _is_affected(
+                        kind,
+                        codename,
+                        changed_ids[kind_options["change"]],
+                        os.path.join(directory, _ids_file_name(entry["file"])),
+                    )
+                ):
+                    files[name] = entry
+                    continue
+
+                path, ids_path, etag, rows = _write_partition(
+                    directory, export_format, kind, codename
+                )
+
+                if entry and entry["etag"] == etag:
+                    os.remove(path)
+                    os.replace(
+                        ids_path,
+                        os.path.join(directory, _ids_file_name(entry["file"])),
+                    )
+                    files[name] = entry
+                    continue
+
+                file_name = f"{name}-{etag[:12]}.{extension}"
+                os.replace(
+                    ids_path,
+                    os.path.join(directory, _ids_file_name(file_name)),
+                )
+                os.replace(path, os.path.join(directory, file_name))
+                files[name] = {
+                    "file": file_name,
+                    "etag": etag,
+                    "rows": rows,
+                    "bytes": os.path.getsize(
+                        os.path.join(directory, file_name)
+                    ),
+                    "updated_at": datetime.utcnow().isoformat(),
+                }
+                written.append(name)
+    finally:
+        db_session.rollback()
+
+    manifest = {
+        "format": export_format,
+        "version": (previous or {}).get("version", 0) + bool(written),
+        "generated_at": datetime.utcnow().isoformat(),
+        "change_cursor": change_cursor,
+        "files": files,
+    }
+
+    # Replaced atomically, so that it always lists complete files
+    with open(os.path.join(directory, f".{MANIFEST}"), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+    os.replace(
+        os.path.join(directory, f".{MANIFEST}"),
+        os.path.join(directory, MANIFEST),
+    )
+    _remove_unlisted(directory, manifest)
+
+    return written
@@ -0,0 +1,309 @@
+"""
+Set-based CVE ingestion.
+
+Rather than loading and comparing each CVE in Python, every batch of
+CVEs is written with a few INSERT ... ON CONFLICT DO UPDATE statements
+which only touch the rows that actually changed, so that a full resync
+of the CVE tracker is mostly reads.
+"""
+
+# Standard library
+import json
+from collections import Counter
+
+# Packages
+from sqlalchemy import cast, func, literal_column, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert, JSONB
+from sqlalchemy.types import JSON
+
+# Local
+from webapp.security.database import db_session
+from webapp.security.models import CVE, CVEFacet, Package, Status
+
+
+BATCH_SIZE = 1000
+
+CVE_COLUMNS = [
+    "status",
+    "published",
+    "priority",
+    "cvss3",
+    "description",
+    "ubuntu_description",
+    "notes",
+    "references",
+    "bugs",
+    "patches",
+    "tags",
+    "mitigation",
+]
+
+STATUS_COLUMNS = ["status", "description", "component", "pocket"]
+
+# Rows inserted, rather than updated, by an upsert have no xmax
+INSERTED = literal_column("xmax = 0")
+
+
+def new_counters():
+    """
+    Counts of created, updated and deleted rows, by model name
+    """
+
+    return {
+        "created": Counter(),
+        "updated": Counter(),
+        "deleted": Counter(),
+    }
+
+
+def batches(items, size=BATCH_SIZE):
+    """
+    Split an iterable into lists of at most `size` items
+    """
+
+    batch = []
+
+    for item in items:
+        batch.append(item)
+
+        if len(batch) >= size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def _comparable(column):
+    """
+    An expression that compares the way the CVE API always has:
+    JSON by value and the published timestamp by day
+    """
+
+    if isinstance(column.type, JSON):
+        return cast(column, JSONB)
+
+    if column.key == "published":
+        return func.date_trunc("day", column)
+
+    return column
+
+
+def _recordset(table, rows):
+    """
+    Select rows of a table from a single JSON parameter, which is much
+    cheaper to compile and send than a parameter for every value
+    """
+
+    names = list(rows[0])
+    definitions = ", ".join(
+        f'"{name}" {table.c[name].type.compile(dialect=postgresql.dialect())}'
+        for name in names
+    )
+    recordset = text(
+        f"jsonb_to_recordset(CAST(:rows AS JSONB)) AS rows({definitions})"
+    ).bindparams(rows=json.dumps(rows, default=str))
+
+    return names, select(
+        [literal_column(f'rows."{name}"') for name in names]
+    ).select_from(recordset)
+
+
+def _upsert(table, rows, key_columns, columns):
+    """
+    Insert rows, or update the existing rows whose columns differ.
+
+    Returns the number of rows created and updated, and the values of
+    the first key column of the rows written
+    """
+
+    statement = insert(table).from_select(*_recordset(table, rows))
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={column: excluded[column] for column in columns},
+        where=tuple_(*[_comparable(table.c[column]) for column in columns]).op(
+            "IS DISTINCT FROM"
+        )(tuple_(*[_comparable(excluded[column]) for column in columns])),
+    ).returning(INSERTED, table.c[key_columns[0]])
+
+    created = updated = 0
+    written = set()
+
+    for inserted, key in db_session.execute(statement):
+        written.add(key)
+
+        if inserted:
+            created += 1
+        else:
+            updated += 1
+
+    return created, updated, written
+
+
+def _create_packages(cves_data):
+    rows = {}
+
+    for data in cves_data:
+        for package_data in data.get("packages", []):
+            rows.setdefault(
+                package_data["name"],
+                {
+                    "name": package_data["name"],
+                    "source": package_data["source"],
+                    "ubuntu": package_data["ubuntu"],
+                    "debian": package_data["debian"],
+                },
+            )
+
+    if not rows:
+        return 0
+
+    # Existing packages are left as they are
+    statement = (
+        insert(Package.__table__)
+        .from_select(*_recordset(Package.__table__, list(rows.values())))
+        .on_conflict_do_nothing(index_elements=["name"])
+        .returning(Package.__table__.c.name)
+    )
+
+    return len(db_session.execute(statement).fetchall())
+
+
+def upsert_cves(cves_data, counters=None):
+    """
+    Create or update a batch of CVEs, deserialized with CVESchema,
+    along with their packages and statuses. Statuses of these CVEs
+    which aren't in the data are deleted, and the facets of the CVEs
+    which changed are rebuilt.
+
+    Adds the number of created, updated and deleted rows per model
+    to `counters` and returns them. Doesn't commit.
+    """
+
+    if counters is None:
+        counters = new_counters()
+
+    # Only the last copy of a CVE counts, like sequential updates
+    cves_data = list({data["id"]: data for data in cves_data}.values())
+
+    if not cves_data:
+        return counters
+
+    counters["created"]["Package"] += _create_packages(cves_data)
+
+    created, updated, changed_cve_ids = _upsert(
+        CVE.__table__,
+        [
+            {
+                "id": data["id"],
+                **{column: data.get(column) for column in CVE_COLUMNS},
+            }
+            for data in cves_data
+        ],
+        ["id"],
+        CVE_COLUMNS,
+    )
+    counters["created"]["CVE"] += created
+    counters["updated"]["CVE"] += updated
+
+    status_rows = {}
+
+    for data in cves_data:
+        for package_data in data.get("packages", []):
+            for status_data in package_data["statuses"]:
+                key = (
+                    data["id"],
+                    package_data["name"],
+                    status_data["release_codename"],
+                )
+                status_rows[key] = {
+                    "cve_id": key[0],
+                    "package_name": key[1],
+                    "release_codename": key[2],
+                    "status": status_data["status"],
+                    "description": status_data.get("description"),
+                    "component": status_data.get("component"),
+                    "pocket": status_data.get("pocket"),
+                }
+
+    status_table = Status.__table__
+    status_key = tuple_(
+        status_table.c.cve_id,
+        status_table.c.package_name,
+        status_table.c.release_codename,
+    )
+
+    # Diffing the keys here is much cheaper than a NOT IN of every
+    # status in the batch, and most resyncs delete nothing
+    existing_keys = db_session.execute(
+        select(status_key.clauses).where(
+            status_table.c.cve_id.in_([data["id"] for data in cves_data])
+        )
+    )
+    keys_to_delete = [
+        key for key in map(tuple, existing_keys) if key not in status_rows
+    ]
+
+    if keys_to_delete:
+        deleted = db_session.execute(
+            status_table.delete().where(status_key.in_(keys_to_delete))
+        )
+        counters["deleted"]["Status"] += deleted.rowcount
+        changed_cve_ids.update(key[0] for key in keys_to_delete)
+
+    if status_rows:
+        created, updated, written_cve_ids = _upsert(
+            status_table,
+            list(status_rows.values()),
+            ["cve_id", "package_name", "release_codename"],
+            STATUS_COLUMNS,
+        )
+        counters["created"]["Status"] += created
+        counters["updated"]["Status"] += updated
+        changed_cve_ids.update(written_cve_ids)
+
+    refresh_cve_facets(changed_cve_ids)
+
+    return counters
+
+
+def refresh_cve_facets(cve_ids):
+    """
+    Rebuild the CVEFacet rows of some CVEs from their statuses
+    """
+
+    if not cve_ids:
+        return
+
+    cve_ids = list(cve_ids)
+    facet_table = CVEFacet.__table__
+    status_table = Status.__table__
+    cve_table = CVE.__table__
+
+    db_session.execute(
+        facet_table.delete().where(facet_table.c.cve_id.in_(cve_ids))
+    )
+    db_session.execute(
+        facet_table.insert().from_select(
+            [column.name for column in facet_table.columns],
+            select(
+                [
+                    status_table.c.cve_id,
+                    status_table.c.package_name,
+                    status_table.c.release_codename,
+                    status_table.c.status,
+                    status_table.c.component,
+                    cve_table.c.priority,
+                    cve_table.c.status,
+                ]
+            )
+            .select_from(
+                status_table.join(
+                    cve_table, cve_table.c.id == status_table.c.cve_id
+                )
+            )
+            .where(status_table.c.cve_id.in_(cve_ids)),
+        )
+    )
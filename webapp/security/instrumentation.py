@@ -0,0 +1,92 @@
+"""
+Per-request database instrumentation.
+
+Every query run while handling a request is counted and timed. The
+totals are sent back in a Server-Timing header, logged at debug level
+and recorded as metrics by endpoint, so that N+1 query regressions
+show up on the first request that has them.
+
+Queries run while a streamed response is being sent happen after the
+headers are written, so they aren't counted.
+"""
+
+# Standard library
+import logging
+from time import perf_counter
+
+# Packages
+import flask
+import talisker.metrics
+from sqlalchemy import event
+
+
+logger = logging.getLogger(__name__)
+
+request_queries = talisker.metrics.Histogram(
+    name="security_request_db_queries",
+    documentation="Database queries run per request, by endpoint",
+    labelnames=["endpoint"],
+    buckets=[1, 2, 5, 10, 20, 50, 100, 200, 500],
+    statsd="{name}.{endpoint}",
+)
+
+request_db_time = talisker.metrics.Histogram(
+    name="security_request_db_time_ms",
+    documentation="Time spent in database queries per request, by endpoint",
+    labelnames=["endpoint"],
+    buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500],
+    statsd="{name}.{endpoint}",
+)
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    context._query_started_at = perf_counter()
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    if not flask.has_app_context() or "db_queries" not in flask.g:
+        return
+
+    flask.g.db_queries += 1
+    flask.g.db_time += perf_counter() - context._query_started_at
+
+
+def _start_counting():
+    flask.g.db_queries = 0
+    flask.g.db_time = 0.0
+
+
+def _report(response):
+    queries = flask.g.pop("db_queries", 0)
+    duration = flask.g.pop("db_time", 0.0) * 1000
+
+    if not queries:
+        return response
+
+    endpoint = flask.request.endpoint or "unknown"
+
+    response.headers.add(
+        "Server-Timing", f'db;dur={duration:.1f};desc="{queries} queries"'
+    )
+    logger.debug("%s: %d queries in %.1fms", endpoint, queries, duration)
+    request_queries.observe(queries, endpoint=endpoint)
+    request_db_time.observe(duration, endpoint=endpoint)
+
+    return response
+
+
+def init_query_instrumentation(app, *engines):
+    """
+    Count and time the queries run on the engines, e.g. the primary
+    and its read replicas, during each request to a Flask app
+    """
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    app.before_request(_start_counting)
+    app.after_request(_report)
@@ -7,18 +7,51 @@ from sqlalchemy import (
     Column,
     DateTime,
     Enum,
+    FetchedValue,
     Float,
     ForeignKey,
+    Integer,
     JSON,
+    LargeBinary,
     String,
     Table,
+    text,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import relationship, Query
+from sqlalchemy.orm import deferred, relationship, Query
 
 Base = declarative_base()
 
+
+def updated_at_column():
+    """
+    When a row last changed, in UTC, which is maintained by database
+    triggers: on update, and when the rows of its child tables change
+    """
+
+    return Column(
+        DateTime,
+        nullable=False,
+        server_default=text("timezone('utc', now())"),
+        server_onupdate=FetchedValue(),
+    )
+
+
+def notice_type(notice_id):
+    """
+    The type of a notice, "USN" or "LSN", from its ID
+    """
+
+    if "USN-" in notice_id.upper():
+        return "USN"
+    if "LSN-" in notice_id.upper():
+        return "LSN"
+
+    return ""
+
+
 notice_cves = Table(
     "notice_cves",
     Base.metadata,
@@ -62,6 +95,9 @@ class CVE(Base):
     status = Column(
         Enum("not-in-ubuntu", "active", "rejected", name="cve_statuses")
     )
+    # Maintained by the cve_search_vector_trigger database trigger
+    search_vector = deferred(Column(TSVECTOR))
+    updated_at = updated_at_column()
     statuses = relationship("Status", cascade="all, delete-orphan")
     notices = relationship(
         "Notice", secondary=notice_cves, back_populates="cves"
@@ -133,6 +169,47 @@ class CVE(Base):
 
         return new_url if is_url else ""
 
+    def as_dict(self):
+        """
+        Serialize the CVE in the same shape as the
+        /security/cves/<id>.json API response
+        """
+
+        packages = defaultdict(list)
+        package_info = {}
+        for status in self.statuses:
+            packages[status.package_name].append(status.as_dict())
+            package_info[status.package_name] = status.package
+
+        return {
+            "id": self.id,
+            "published": (
+                self.published.isoformat() if self.published else None
+            ),
+            "description": self.description,
+            "ubuntu_description": self.ubuntu_description,
+            "notes": self.notes,
+            "priority": self.priority,
+            "status": self.status,
+            "cvss3": self.cvss3,
+            "mitigation": self.mitigation,
+            "references": self.references,
+            "bugs": self.bugs,
+            "patches": self.patches,
+            "tags": self.tags,
+            "packages": [
+                {
+                    "name": name,
+                    "source": getattr(package_info[name], "source", None),
+                    "ubuntu": getattr(package_info[name], "ubuntu", None),
+                    "debian": getattr(package_info[name], "debian", None),
+                    "statuses": statuses,
+                }
+                for name, statuses in packages.items()
+            ],
+            "notices_ids": [notice.id for notice in self.notices],
+        }
+
 
 class Notice(Base):
     __tablename__ = "notice"
@@ -147,6 +224,12 @@ class Notice(Base):
     cves = relationship("CVE", secondary=notice_cves, back_populates="notices")
     references = Column(JSON)
     is_hidden = Column(Boolean)
+    # Maintained by the notice_search_vector_trigger database trigger
+    search_vector = deferred(Column(TSVECTOR))
+    # Page fragments, see webapp.security.rendering
+    rendered = deferred(Column(JSON))
+    renderer_version = Column(Integer)
+    updated_at = updated_at_column()
     releases = relationship(
         "Release",
         secondary=notice_releases,
@@ -156,12 +239,7 @@ class Notice(Base):
 
     @hybrid_property
     def get_type(self):
-        if "USN-" in self.id.upper():
-            return "USN"
-        if "LSN-" in self.id.upper():
-            return "LSN"
-
-        return ""
+        return notice_type(self.id)
 
     @hybrid_property
     def get_processed_details(self):
@@ -196,6 +274,37 @@ class Notice(Base):
             "cves": [c.id for c in self.cves],
         }
 
+    def as_detail_dict(self, related_notices=None):
+        """
+        Serialize the notice in the same shape as the
+        /security/notices/<id>.json API response
+        """
+
+        related_notices = related_notices or []
+
+        return {
+            "id": self.id,
+            "type": self.get_type,
+            "title": self.title,
+            "published": (
+                self.published.isoformat() if self.published else None
+            ),
+            "summary": self.summary,
+            "description": self.details,
+            "instructions": self.instructions,
+            "references": self.references,
+            "release_packages": self.release_packages,
+            "releases": [release.as_dict() for release in self.releases],
+            "cves": [{"id": cve.id} for cve in self.cves],
+            "related_notices": [
+                {
+                    "id": notice.id,
+                    "packages": ", ".join(sorted(notice.package_list)),
+                }
+                for notice in related_notices
+            ],
+        }
+
     @classmethod
     def _base_filters(self):
         return self.is_hidden == "False"
@@ -228,6 +337,16 @@ class Release(Base):
 
         return ""
 
+    def as_dict(self):
+        return {
+            "codename": self.codename,
+            "name": self.name,
+            "version": self.version,
+            "lts": self.lts,
+            "development": self.development,
+            "support_tag": self.support_tag,
+        }
+
 
 class Status(Base):
     __tablename__ = "status"
@@ -263,11 +382,21 @@ class Status(Base):
     pocket = Column(
         Enum("security", "updates", "esm-infra", "esm-apps", name="pockets")
     )
+    updated_at = updated_at_column()
 
     cve = relationship("CVE", back_populates="statuses")
     package = relationship("Package", back_populates="statuses")
     release = relationship("Release", back_populates="statuses")
 
+    def as_dict(self):
+        return {
+            "release_codename": self.release_codename,
+            "status": self.status,
+            "description": self.description,
+            "component": self.component,
+            "pocket": self.pocket,
+        }
+
 
 class Package(Base):
     __tablename__ = "package"
@@ -280,6 +409,86 @@ class Package(Base):
     statuses = relationship("Status", cascade="all, delete-orphan")
 
 
+class CVEFacet(Base):
+    """
+    A status of a CVE, with the CVE columns the CVE listing filters on,
+    so that the listing can be filtered, counted and faceted from this
+    one table. Rebuilt from the statuses by webapp.security.ingestion.
+    """
+
+    __tablename__ = "cve_facet"
+
+    cve_id = Column(
+        String, ForeignKey("cve.id", ondelete="CASCADE"), primary_key=True
+    )
+    package_name = Column(String, primary_key=True)
+    release_codename = Column(String, primary_key=True)
+    status = Column(Status.__table__.c.status.type)
+    component = Column(Status.__table__.c.component.type)
+    priority = Column(CVE.__table__.c.priority.type)
+    cve_status = Column(CVE.__table__.c.status.type)
+
+
+class Tombstone(Base):
+    """
+    A deleted CVE or notice, recorded by database triggers so that
+    the changes feed can list deletions
+    """
+
+    __tablename__ = "tombstone"
+
+    kind = Column(String, primary_key=True)
+    id = Column(String, primary_key=True)
+    deleted_at = Column(
+        DateTime,
+        nullable=False,
+        server_default=text("timezone('utc', now())"),
+    )
+
+
+class CacheVersion(Base):
+    """
+    Version stamps for data cached in each process, bumped on
+    every change so that all workers know to reload it
+    """
+
+    __tablename__ = "cache_version"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class SitemapShard(Base):
+    """
+    A pre-rendered, gzipped page of the CVEs or notices sitemap,
+    see webapp.security.sitemaps
+    """
+
+    __tablename__ = "sitemap_shard"
+
+    sitemap = Column(String, primary_key=True)
+    number = Column(Integer, primary_key=True)
+    # The sort key of the last row in the page
+    last_published = Column(DateTime, nullable=False)
+    last_id = Column(String, nullable=False)
+    content = deferred(Column(LargeBinary, nullable=False))
+    etag = Column(String, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+
+# Key of the BaseFilterQuery.get() results in Session.info
+GET_CACHE = "base_filter_query_get_cache"
+
+
+def clear_get_cache(session, *args):
+    """
+    Session event listener which forgets the results of
+    BaseFilterQuery.get(), as they may have changed
+    """
+
+    session.info.pop(GET_CACHE, None)
+
+
 class BaseFilterQuery(Query):
     __set_default_filters = True
 
@@ -291,8 +500,20 @@ class BaseFilterQuery(Query):
 
     def get(self, ident):
         # Override get() so that the flag is always checked in the
-        # DB as opposed to pulling from the identity map. - this is optional.
-        return Query.get(self.populate_existing(), ident)
+        # DB as opposed to pulling from the identity map. The result is
+        # then kept in the session, until it's flushed or the
+        # transaction ends, so repeated lookups don't reload the row.
+        cache = self.session.info.setdefault(GET_CACHE, {})
+        key = (
+            self._mapper_zero().class_,
+            ident if isinstance(ident, tuple) else (ident,),
+            self.__set_default_filters,
+        )
+
+        if key not in cache:
+            cache[key] = Query.get(self.populate_existing(), ident)
+
+        return cache[key]
 
     def __iter__(self):
         return Query.__iter__(self.private())
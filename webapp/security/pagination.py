@@ -0,0 +1,217 @@
+import base64
+import binascii
+import json
+
+import dateutil.parser
+from sqlalchemy import DateTime, asc, desc, literal, tuple_
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(values, page):
+    """
+    Encode the sort key values of a boundary row, along with the
+    number of the page it leads to, into an opaque URL-safe token
+    """
+
+    payload = json.dumps(
+        {"values": list(values), "page": page},
+        default=lambda value: value.isoformat(),
+        separators=(",", ":"),
+    )
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padding = "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(token + padding))
+
+        return payload["values"], int(payload["page"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursorError(f"Invalid cursor: {token}")
+
+
+def _parse_values(keys, values):
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursorError("Cursor doesn't match the sort keys")
+
+    parsed_values = []
+    for key, value in zip(keys, values):
+        if isinstance(key.type, DateTime) and isinstance(value, str):
+            try:
+                value = dateutil.parser.isoparse(value)
+            except ValueError:
+                raise InvalidCursorError(f"Invalid cursor value: {value}")
+
+        parsed_values.append(literal(value, type_=key.type))
+
+    return parsed_values
+
+
+def _order(keys, descending):
+    sort = desc if descending else asc
+
+    return [sort(key) for key in keys]
+
+
+def cursor_for_offset(query, keys, offset, page, descending=True):
+    """
+    Find the cursor equivalent to an offset into the query results,
+    to redirect legacy offset links to keyset pagination.
+    Returns None if the offset is beyond the last result.
+    """
+
+    boundary = (
+        query.with_entities(*keys)
+        .order_by(*_order(keys, descending))
+        .offset(offset - 1)
+        .limit(1)
+        .first()
+    )
+
+    if boundary is None:
+        return None
+
+    return encode_cursor(boundary, page)
+
+
+def _page_query(query, keys, limit, token, forwards, descending):
+    current_page = 1
+    values = None
+
+    if token:
+        values, current_page = decode_cursor(token)
+        values = _parse_values(keys, values)
+
+    query = query.add_columns(*keys).order_by(
+        *_order(keys, descending == forwards)
+    )
+
+    if values:
+        if descending == forwards:
+            query = query.filter(tuple_(*keys) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*keys) > tuple_(*values))
+
+    return query.limit(limit + 1), current_page
+
+
+def _item(row, key_count):
+    if len(row) == key_count + 1:
+        return row[0]
+
+    return tuple(row[:-key_count])
+
+
+def paginate(query, keys, limit, after=None, before=None, descending=True):
+    """
+    Fetch one page of results with keyset pagination, ordering
+    by the list of sort keys (the last of which must be unique).
+
+    Pages are selected with the opaque cursor tokens in `after` or
+    `before`, so that every page costs the same as the first one.
+
+    Returns the list of rows for the page and a pagination dict
+    with the page number and the cursors of the surrounding pages.
+    """
+
+    forwards = not before
+    token = before or after
+    query, current_page = _page_query(
+        query, keys, limit, token, forwards, descending
+    )
+
+    rows = query.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if not forwards:
+        rows.reverse()
+
+    has_next = has_more if forwards else True
+    has_previous = bool(token) if forwards else has_more
+
+    key_count = len(keys)
+    items = [_item(row, key_count) for row in rows]
+
+    pagination = {
+        "current_page": current_page,
+        "previous_cursor": None,
+        "next_cursor": None,
+    }
+
+    if rows and has_previous:
+        pagination["previous_cursor"] = encode_cursor(
+            rows[0][-key_count:], current_page - 1
+        )
+
+    if rows and has_next:
+        pagination["next_cursor"] = encode_cursor(
+            rows[-1][-key_count:], current_page + 1
+        )
+
+    return items, pagination
+
+
+def stream_page(
+    query,
+    keys,
+    limit,
+    after=None,
+    before=None,
+    descending=True,
+    batch_size=500,
+):
+    """
+    Like paginate, but returns an iterator over the rows of the page,
+    which fetches them from a server-side cursor in batches so that
+    large pages aren't held in memory. Pages before a cursor have to
+    be read in reverse, so they are fetched in full.
+
+    The pagination dict is filled in once the iterator is exhausted.
+    """
+
+    if before:
+        items, pagination = paginate(
+            query, keys, limit, before=before, descending=descending
+        )
+
+        return iter(items), pagination
+
+    query, current_page = _page_query(
+        query, keys, limit, after, True, descending
+    )
+    key_count = len(keys)
+    pagination = {
+        "current_page": current_page,
+        "previous_cursor": None,
+        "next_cursor": None,
+    }
+
+    def rows():
+        first = last = None
+
+        for count, row in enumerate(query.yield_per(batch_size), start=1):
+            if count > limit:
+                pagination["next_cursor"] = encode_cursor(
+                    last[-key_count:], current_page + 1
+                )
+                break
+
+            if first is None:
+                first = row
+
+            last = row
+
+            yield _item(row, key_count)
+
+        if first and after:
+            pagination["previous_cursor"] = encode_cursor(
+                first[-key_count:], current_page - 1
+            )
+
+    return rows(), pagination
@@ -0,0 +1,489 @@
+import heapq
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import (
+    DateTime,
+    and_,
+    distinct,
+    func,
+    literal,
+    text,
+    tuple_,
+)
+from sqlalchemy.orm import load_only, selectinload
+
+from webapp.security.database import db_session
+from webapp.security.models import (
+    CVE,
+    CVEFacet,
+    Notice,
+    Release,
+    Status,
+    Tombstone,
+    notice_cves,
+    notice_releases,
+)
+from webapp.security.search import search_filter, search_rank, to_tsquery
+
+
+# CVEs without a published date are sorted after all the others
+NULL_PUBLISHED = datetime(1, 1, 1)
+
+SITEMAP_PAGE_SIZE = 10000
+
+# Longer than read replicas lag behind, see get_settled_time
+CHANGES_SETTLE_SECONDS = 60
+
+CVE_ID_PATTERN = r"^CVE-\d{4}-\d{4,7}$"
+
+# The columns the CVE and notice listings show. Loading only these
+# leaves out the text and JSON columns, which are most of each row
+CVE_LISTING_COLUMNS = [CVE.id, CVE.published, CVE.priority, CVE.status]
+NOTICE_LISTING_COLUMNS = [
+    Notice.id,
+    Notice.title,
+    Notice.published,
+    Notice.summary,
+]
+
+
+def get_cve_packages_query(
+    query="",
+    priority=None,
+    package=None,
+    component=None,
+    clean_versions=[],
+    clean_statuses=[],
+):
+    """
+    Build the query for the (cve_id, package_name, priority) of the
+    packages of active CVEs matching the CVE index filters, from the
+    CVEFacet table. clean_versions and clean_statuses are matching
+    lists of release codenames and statuses that a package must all
+    be in. Without them, a package must have an active status.
+
+    These are the packages the CVE index shows, see _filter_packages
+    """
+
+    packages_query = db_session.query(
+        CVEFacet.cve_id, CVEFacet.package_name, CVEFacet.priority
+    ).filter(CVEFacet.cve_status == "active")
+
+    if priority:
+        packages_query = packages_query.filter(CVEFacet.priority == priority)
+
+    if package:
+        packages_query = packages_query.filter(
+            CVEFacet.package_name == package
+        )
+
+    if query:
+        packages_query = packages_query.filter(
+            CVEFacet.cve_id.in_(
+                db_session.query(CVE.id).filter(
+                    search_filter(CVE.search_vector, to_tsquery(query))
+                )
+            )
+        )
+
+    conditions = []
+
+    if component:
+        conditions.append(func.bool_or(CVEFacet.component == component))
+
+    if clean_versions:
+        for versions, statuses in zip(clean_versions, clean_statuses):
+            conditions.append(
+                func.bool_or(
+                    and_(
+                        CVEFacet.release_codename.in_(versions),
+                        CVEFacet.status.in_(statuses),
+                    )
+                )
+            )
+    else:
+        conditions.append(
+            func.bool_or(CVEFacet.status.in_(Status.active_statuses))
+        )
+
+    return packages_query.group_by(
+        CVEFacet.cve_id, CVEFacet.package_name, CVEFacet.priority
+    ).having(and_(*conditions))
+
+
+def get_cves_query(
+    query="",
+    priority=None,
+    package=None,
+    component=None,
+    clean_versions=[],
+    clean_statuses=[],
+):
+    """
+    Build the query for the IDs of active CVEs matching the CVE index
+    filters, which have a package matching get_cve_packages_query
+
+    Returns the query and the keys to sort and paginate it by
+    """
+
+    cves_query = db_session.query(CVE.id).filter(CVE.status == "active")
+
+    if priority:
+        cves_query = cves_query.filter(CVE.priority == priority)
+
+    query_tsquery = to_tsquery(query) if query else None
+    sort_keys = [func.coalesce(CVE.published, NULL_PUBLISHED), CVE.id]
+
+    if query_tsquery is not None:
+        cves_query = cves_query.filter(
+            search_filter(CVE.search_vector, query_tsquery)
+        )
+        sort_keys.insert(0, search_rank(CVE.search_vector, query_tsquery))
+
+    # Checked for each CVE, through the facets' primary key
+    packages_query = get_cve_packages_query(
+        package=package,
+        component=component,
+        clean_versions=clean_versions,
+        clean_statuses=clean_statuses,
+    ).filter(CVEFacet.cve_id == CVE.id)
+    cves_query = cves_query.filter(packages_query.exists())
+
+    return cves_query, sort_keys
+
+
+def count_cves(**filters):
+    """
+    Count the CVEs matching the CVE index filters
+    """
+
+    packages = get_cve_packages_query(**filters).subquery()
+
+    return db_session.query(func.count(distinct(packages.c.cve_id))).scalar()
+
+
+def get_cve_facet_counts(codenames, **filters):
+    """
+    Count the CVEs matching the CVE index filters by priority, ignoring
+    the priority filter, and by the statuses their matching packages
+    have in the releases with these codenames
+
+    Returns a {"priority": {}, "status": {}} dict of counts
+    """
+
+    packages = get_cve_packages_query(**filters).subquery()
+    priority_packages = get_cve_packages_query(
+        **{**filters, "priority": None}
+    ).subquery()
+    priority_cves = (
+        db_session.query(
+            priority_packages.c.cve_id, priority_packages.c.priority
+        )
+        .distinct()
+        .subquery()
+    )
+
+    priority_counts = db_session.query(
+        priority_cves.c.priority, func.count(priority_cves.c.cve_id)
+    ).group_by(priority_cves.c.priority)
+    status_counts = (
+        db_session.query(
+            CVEFacet.status, func.count(distinct(CVEFacet.cve_id))
+        )
+        .join(
+            packages,
+            and_(
+                packages.c.cve_id == CVEFacet.cve_id,
+                packages.c.package_name == CVEFacet.package_name,
+            ),
+        )
+        .filter(CVEFacet.release_codename.in_(codenames))
+        .group_by(CVEFacet.status)
+    )
+
+    return {
+        "priority": dict(priority_counts.all()),
+        "status": dict(status_counts.all()),
+    }
+
+
+def get_package_cves_query(package_name, release=None, status=None):
+    """
+    Build the query for the IDs of active CVEs affecting a package,
+    optionally only those with a status in a release. The CVEs are
+    found from the package's statuses, through the
+    (package_name, release_codename, status) index, so the query
+    costs as much as the package has statuses.
+
+    Returns the query and the keys to sort and paginate it by
+    """
+
+    statuses_query = db_session.query(Status.cve_id).filter(
+        Status.package_name == package_name
+    )
+
+    if release:
+        statuses_query = statuses_query.filter(
+            Status.release_codename == release
+        )
+
+    if status:
+        statuses_query = statuses_query.filter(Status.status == status)
+
+    cves_query = db_session.query(CVE.id).filter(
+        CVE.status == "active", CVE.id.in_(statuses_query)
+    )
+
+    return cves_query, [func.coalesce(CVE.published, NULL_PUBLISHED), CVE.id]
+
+
+def get_package_release_codenames(package_name):
+    """
+    The codenames of the releases a package has statuses in
+    """
+
+    return {
+        codename
+        for codename, in db_session.query(Status.release_codename)
+        .filter(Status.package_name == package_name)
+        .distinct()
+    }
+
+
+def get_cves_by_ids(cve_ids):
+    """
+    Load the CVEs with their statuses, in the order of cve_ids.
+    Only the listing columns are loaded, the others are loaded
+    one CVE at a time if they are used.
+    """
+
+    cves = {
+        cve.id: cve
+        for cve in db_session.query(CVE)
+        .filter(CVE.id.in_(cve_ids))
+        .options(load_only(*CVE_LISTING_COLUMNS), selectinload(CVE.statuses))
+    }
+
+    return [cves[cve_id] for cve_id in cve_ids if cve_id in cves]
+
+
+def get_notices_query(details=None, release=None, order_by=None):
+    """
+    Build the query for the notices listing filters.
+
+    Returns the query, the keys to sort and paginate it by
+    and whether the keys are in descending order. The notices it
+    loads only have the listing columns.
+    """
+
+    notices_query = db_session.query(Notice).options(
+        load_only(*NOTICE_LISTING_COLUMNS)
+    )
+
+    if release:
+        notices_query = notices_query.join(Release, Notice.releases).filter(
+            Release.codename == release
+        )
+
+    details_tsquery = None
+
+    if details and re.match(CVE_ID_PATTERN, details.strip().upper()):
+        # Searching for a CVE ID lists the notices that fix it
+        notices_query = notices_query.filter(
+            Notice.cves.any(CVE.id == details.strip().upper())
+        )
+    elif details:
+        details_tsquery = to_tsquery(details)
+
+    if details_tsquery is not None:
+        notices_query = notices_query.filter(
+            search_filter(Notice.search_vector, details_tsquery)
+        )
+
+    descending = order_by != "oldest"
+    sort_keys = [Notice.published, Notice.id]
+
+    # Without an explicit order, rank search results by relevance
+    if details_tsquery is not None and not order_by:
+        sort_keys.insert(0, search_rank(Notice.search_vector, details_tsquery))
+
+    return notices_query, sort_keys, descending
+
+
+def get_statuses_by_cve_ids(cve_ids, package_name=None):
+    """
+    The statuses of the CVEs as plain rows rather than Status objects,
+    grouped into a {cve_id: {package_name: {codename: status}}} dict,
+    optionally only for one package
+    """
+
+    rows = db_session.query(
+        Status.cve_id,
+        Status.package_name,
+        Status.release_codename,
+        Status.status,
+        Status.description,
+        Status.component,
+        Status.pocket,
+    ).filter(Status.cve_id.in_(cve_ids))
+
+    if package_name:
+        rows = rows.filter(Status.package_name == package_name)
+
+    statuses = defaultdict(lambda: defaultdict(dict))
+    for row in rows:
+        statuses[row.cve_id][row.package_name][row.release_codename] = row
+
+    return statuses
+
+
+def get_notices_associations(notice_ids):
+    """
+    The IDs of the CVEs and the codenames of the releases of each notice
+    """
+
+    cve_ids = defaultdict(list)
+    for notice_id, cve_id in (
+        db_session.query(notice_cves.c.notice_id, notice_cves.c.cve_id)
+        .filter(notice_cves.c.notice_id.in_(notice_ids))
+        .order_by(notice_cves.c.cve_id)
+    ):
+        cve_ids[notice_id].append(cve_id)
+
+    codenames = defaultdict(list)
+    for notice_id, codename in (
+        db_session.query(
+            notice_releases.c.notice_id, notice_releases.c.release_codename
+        )
+        .filter(notice_releases.c.notice_id.in_(notice_ids))
+        .order_by(notice_releases.c.release_codename)
+    ):
+        codenames[notice_id].append(codename)
+
+    return cve_ids, codenames
+
+
+def _after_change(time_column, id_column, kind, after):
+    """
+    The condition for the changes of one kind which come after the
+    (changed_at, kind, id) of `after`, for the (time, id) index
+    """
+
+    changed_at, after_kind, after_id = after
+
+    if kind > after_kind:
+        return time_column >= changed_at
+
+    if kind < after_kind:
+        return time_column > changed_at
+
+    return tuple_(time_column, id_column) > tuple_(
+        literal(changed_at, DateTime), literal(after_id)
+    )
+
+
+def get_settled_time(settle_seconds=None):
+    """
+    The database time before which changes have settled, so that no
+    transaction can still commit a change stamped before it.
+
+    Rows are stamped with the start time of the transaction which
+    changed them, so this is the start of the oldest transaction still
+    running on the database, however long it runs. Transactions of
+    other roles can be hidden from pg_stat_activity, and replicas lag
+    behind, so it's also at least `settle_seconds` ago, by default
+    CHANGES_SETTLE_SECONDS. Transactions on the primary can't be seen
+    from a replica, so this must be run on the primary.
+    """
+
+    if settle_seconds is None:
+        settle_seconds = CHANGES_SETTLE_SECONDS
+
+    oldest_transaction = text(
+        "(SELECT min(timezone('utc', xact_start)) FROM pg_stat_activity "
+        "WHERE datname = current_database() "
+        "AND pid != pg_backend_pid())"
+    )
+
+    return db_session.query(
+        func.least(
+            func.timezone("utc", func.now())
+            - timedelta(seconds=settle_seconds),
+            oldest_transaction,
+        )
+    ).scalar()
+
+
+def get_changes(after=None, limit=100, settle_seconds=None):
+    """
+    The CVEs and notices which changed or were deleted after the
+    (changed_at, kind, id) of `after`, in that order, as a list of
+    (changed_at, kind, id, deleted) tuples. Hidden notices count as
+    deleted.
+
+    Changes are only listed once they have settled, see
+    get_settled_time, so that a transaction which commits late can't
+    change rows behind a consumer's cursor.
+
+    Returns the changes and whether there are more
+    """
+
+    until = get_settled_time(settle_seconds)
+    sources = [
+        db_session.query(
+            CVE.updated_at, literal("cve"), CVE.id, literal(False)
+        ),
+        db_session.query(
+            Notice.updated_at, literal("notice"), Notice.id, Notice.is_hidden
+        ).without_default_filters(),
+    ]
+    branches = []
+
+    for query, kind, (time_column, id_column) in zip(
+        sources,
+        ["cve", "notice"],
+        [(CVE.updated_at, CVE.id), (Notice.updated_at, Notice.id)],
+    ):
+        if after:
+            query = query.filter(
+                _after_change(time_column, id_column, kind, after)
+            )
+
+        branches.append(
+            query.filter(time_column < until)
+            .order_by(time_column, id_column)
+            .limit(limit + 1)
+        )
+
+    tombstones = db_session.query(
+        Tombstone.deleted_at, Tombstone.kind, Tombstone.id, literal(True)
+    ).filter(Tombstone.deleted_at < until)
+
+    if after:
+        changed_at, after_kind, after_id = after
+        tombstones = tombstones.filter(
+            tuple_(Tombstone.deleted_at, Tombstone.kind, Tombstone.id)
+            > tuple_(
+                literal(changed_at, DateTime),
+                literal(after_kind),
+                literal(after_id),
+            )
+        )
+
+    branches.append(
+        tombstones.order_by(
+            Tombstone.deleted_at, Tombstone.kind, Tombstone.id
+        ).limit(limit + 1)
+    )
+
+    changes = list(
+        islice(
+            heapq.merge(*[map(tuple, branch) for branch in branches]),
+            limit + 1,
+        )
+    )
+
+    return changes[:limit], len(changes) > limit
@@ -0,0 +1,145 @@
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+
+from webapp.security.models import CacheVersion, CVE, Release, Status
+
+
+class ReleaseRegistry:
+    """
+    Process-wide cache of the Release table and the status enums.
+
+    Releases change a few times a year, so rather than querying them
+    on every request, each process keeps a copy and reloads it when
+    the "releases" CacheVersion stamp changes. The stamp is checked
+    at most once every `check_interval` seconds.
+    """
+
+    version_name = "releases"
+
+    def __init__(self, session=None, check_interval=10):
+        self._session = session
+        self.check_interval = check_interval
+        self._releases = None
+        self._version = None
+        self._checked_at = None
+        self._lock = Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            # Imported lazily, as the database module needs DATABASE_URL
+            from webapp.security.database import db_session
+
+            self._session = db_session
+
+        return self._session
+
+    def _stored_version(self):
+        return (
+            self.session.query(CacheVersion.version)
+            .filter(CacheVersion.name == self.version_name)
+            .scalar()
+        ) or 0
+
+    def _load(self):
+        columns = Release.__table__.columns
+        rows = self.session.query(*columns).all()
+
+        # Transient copies, which are safe to share between sessions
+        return [
+            Release(**{column.key: row[i] for i, column in enumerate(columns)})
+            for row in rows
+        ]
+
+    def _current(self):
+        releases = self._releases
+        now = monotonic()
+
+        if (
+            releases is not None
+            and now - self._checked_at < self.check_interval
+        ):
+            return releases
+
+        with self._lock:
+            version = self._stored_version()
+
+            if self._releases is None or version != self._version:
+                self._releases = self._load()
+                self._version = version
+
+            self._checked_at = now
+
+            return self._releases
+
+    def releases(self):
+        """
+        All releases, newest first
+        """
+
+        return sorted(
+            self._current(),
+            key=lambda release: release.release_date or datetime.min,
+            reverse=True,
+        )
+
+    def get(self, codename):
+        for release in self._current():
+            if release.codename == codename:
+                return release
+
+        return None
+
+    def codenames(self):
+        return [release.codename for release in self._current()]
+
+    def supported_releases(self):
+        """
+        Releases in standard or ESM support, oldest first
+        """
+
+        now = datetime.now()
+
+        return [
+            release
+            for release in reversed(self.releases())
+            if release.codename != "upstream"
+            and (
+                (release.support_expires and release.support_expires > now)
+                or (release.esm_expires and release.esm_expires > now)
+            )
+        ]
+
+    def invalidate(self):
+        """
+        Bump the version stamp in the current transaction, so every
+        process reloads the releases once it's committed
+        """
+
+        updated = (
+            self.session.query(CacheVersion)
+            .filter(CacheVersion.name == self.version_name)
+            .update(
+                {CacheVersion.version: CacheVersion.version + 1},
+                synchronize_session=False,
+            )
+        )
+
+        if not updated:
+            self.session.add(CacheVersion(name=self.version_name, version=1))
+
+        self._releases = None
+
+    # The enums never change without a deploy, so they are read
+    # from the models rather than the database
+    @staticmethod
+    def statuses():
+        return list(Status.__table__.c.status.type.enums)
+
+    @staticmethod
+    def priorities():
+        return list(CVE.__table__.c.priority.type.enums)
+
+
+release_registry = ReleaseRegistry()
@@ -0,0 +1,204 @@
+"""
+Rendering of notices into the fragments shown on their pages.
+
+Rendering is a pure function of the stored notice, so it's done when a
+notice is written and the result is stored in Notice.rendered. Bump
+RENDERER_VERSION whenever the output of render_notice changes, and run
+scripts/rerender-notices.py once, as a release job, to update the
+stored notices. Until then, notices rendered by an older version are
+rendered on every request.
+"""
+
+# Standard library
+import re
+
+# Packages
+import dateutil.parser
+from mistune import Markdown
+from sortedcontainers import SortedDict
+from sqlalchemy import or_, text
+from sqlalchemy.orm import selectinload
+
+# Local
+from webapp.security.database import db_session
+from webapp.security.models import Notice
+
+
+RENDERER_VERSION = 1
+
+# Held by the process rerendering the notices
+RERENDER_LOCK = "notice:rerender"
+
+CVE_ID_IN_TEXT = re.compile(r"(cve|CVE-)\d{4}-\d{4,7}", re.MULTILINE)
+
+markdown_parser = Markdown(
+    hard_wrap=True, parse_block_html=True, parse_inline_html=True
+)
+
+
+def get_processed_details(notice):
+    return re.sub(
+        CVE_ID_IN_TEXT,
+        r'<a href="/security/\g<0>">\g<0></a>',
+        notice["description"],
+    )
+
+
+def _package_tables(notice):
+    """
+    The descriptions of the source packages, by name, and the binary
+    packages of each release, by release version
+    """
+
+    package_descriptions = {}
+    package_versions = {}
+    release_packages = SortedDict()
+
+    releases = {
+        release["codename"]: release["version"]
+        for release in notice["releases"]
+    }
+
+    if not notice["release_packages"]:
+        return package_descriptions, release_packages
+
+    for codename, pkgs in notice["release_packages"].items():
+        release_version = releases[codename]
+        release_packages[release_version] = {}
+        for package in pkgs:
+            if not package.get("is_visible", True):
+                continue
+
+            name = package["name"]
+            if not package["is_source"]:
+                release_packages[release_version][name] = package
+                continue
+
+            if notice["type"] == "LSN":
+                if name not in package_descriptions:
+                    package_versions[name] = []
+
+                package_versions[name].append(package["version"])
+                versions = ", >= ".join(package_versions[name])
+                description = f"{package['description']} - " f"(>= {versions})"
+                package_descriptions[name] = description
+
+                continue
+
+            if name not in package_descriptions:
+                package_descriptions[name] = package["description"]
+
+    package_descriptions = {
+        key: package_descriptions[key]
+        for key in sorted(package_descriptions.keys())
+    }
+
+    return package_descriptions, release_packages
+
+
+def render_notice(notice):
+    """
+    Render the parts of a notice, in the API response shape, which
+    don't depend on other notices
+    """
+
+    package_descriptions, release_packages = _package_tables(notice)
+    published = notice.get("published")
+
+    if published:
+        published = dateutil.parser.parse(published).strftime("%-d %B %Y")
+
+    return {
+        "published": published,
+        "details": markdown_parser(get_processed_details(notice)),
+        "instructions": markdown_parser(notice["instructions"]),
+        "package_descriptions": package_descriptions,
+        # As a list, to keep the releases in order
+        "release_packages": list(release_packages.items()),
+    }
+
+
+def store_rendered_notice(notice):
+    """
+    Render a Notice model object and store the result on it
+    """
+
+    notice.rendered = render_notice(notice.as_detail_dict())
+    notice.renderer_version = RENDERER_VERSION
+
+
+def _rerender_batches(batch_size):
+    rendered = 0
+    after = ""
+
+    while True:
+        notices = (
+            db_session.query(Notice)
+            .without_default_filters()
+            .options(selectinload(Notice.releases), selectinload(Notice.cves))
+            .filter(
+                Notice.id > after,
+                or_(
+                    Notice.renderer_version.is_(None),
+                    Notice.renderer_version != RENDERER_VERSION,
+                ),
+            )
+            .order_by(Notice.id)
+            .limit(batch_size)
+            .all()
+        )
+
+        if not notices:
+            return rendered
+
+        for notice in notices:
+            # Only if the notice is as it was read. One written since
+            # has its own rendering, or is rendered on the fly until
+            # the next run.
+            rendered += (
+                db_session.query(Notice)
+                .without_default_filters()
+                .filter(
+                    Notice.id == notice.id,
+                    Notice.updated_at == notice.updated_at,
+                    Notice.renderer_version.is_distinct_from(RENDERER_VERSION),
+                )
+                .update(
+                    {
+                        "rendered": render_notice(notice.as_detail_dict()),
+                        "renderer_version": RENDERER_VERSION,
+                    },
+                    synchronize_session=False,
+                )
+            )
+
+        after = notices[-1].id
+        db_session.commit()
+
+
+def rerender_notices(batch_size=100):
+    """
+    Render and store the notices rendered by an older renderer,
+    including hidden ones, committing every batch. Only one process
+    rerenders at a time.
+
+    Returns the number of notices rendered, or None if another
+    process is rerendering them
+    """
+
+    with db_session.get_bind().connect() as lock_connection:
+        locked = lock_connection.execute(
+            text("SELECT pg_try_advisory_lock(hashtext(:name))"),
+            name=RERENDER_LOCK,
+        ).scalar()
+
+        if not locked:
+            return None
+
+        try:
+            return _rerender_batches(batch_size)
+        finally:
+            lock_connection.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:name))"),
+                name=RERENDER_LOCK,
+            )
@@ -0,0 +1,40 @@
+import re
+
+from sqlalchemy import func
+
+
+# Text search configuration used by the search_vector triggers
+SEARCH_CONFIG = "english"
+
+
+def tsquery_text(query):
+    """
+    Convert a free-text search string into the to_tsquery syntax,
+    matching every term as a prefix so partial words still match
+    """
+
+    terms = re.findall(r"[\w.\-]+", query)
+
+    return " & ".join(f"'{term}':*" for term in terms)
+
+
+def to_tsquery(query):
+    """
+    Returns a tsquery expression for a search string,
+    or None if the string contains nothing to search for
+    """
+
+    text = tsquery_text(query)
+
+    if not text:
+        return None
+
+    return func.to_tsquery(SEARCH_CONFIG, text)
+
+
+def search_filter(search_vector, tsquery):
+    return search_vector.op("@@")(tsquery)
+
+
+def search_rank(search_vector, tsquery):
+    return func.ts_rank_cd(search_vector, tsquery)
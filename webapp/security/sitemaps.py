@@ -0,0 +1,215 @@
+"""
+Pre-rendered sitemaps for CVEs and notices.
+
+Each sitemap is split into shards of SITEMAP_PAGE_SIZE rows, sorted by
+publish date, which are stored gzipped in the sitemap_shard table. A
+shard is only re-rendered when the (id, published) rows in it change,
+so requests from crawlers never touch the CVE and notice tables.
+
+Shards are written ahead of time, by the views and scripts which
+write CVEs and notices and by scripts/refresh-sitemaps.py, never
+while serving a sitemap.
+"""
+
+# Standard library
+import gzip
+import hashlib
+from datetime import datetime, timezone
+
+# Packages
+import flask
+from sqlalchemy import func, literal, text, tuple_
+from sqlalchemy.orm import undefer
+
+# Local
+from webapp.security.database import db_session
+from webapp.security.models import CVE, Notice, SitemapShard
+from webapp.security.queries import NULL_PUBLISHED, SITEMAP_PAGE_SIZE
+
+
+SITEMAPS = {
+    "cves": {
+        "keys": [func.coalesce(CVE.published, NULL_PUBLISHED), CVE.id],
+        "url": "https://ubuntu.com/security/{}",
+    },
+    "notices": {
+        "keys": [Notice.published, Notice.id],
+        "url": "https://ubuntu.com/security/notices/{}",
+    },
+}
+
+
+def _naive(published):
+    if published is None:
+        return NULL_PUBLISHED
+
+    if published.tzinfo:
+        return published.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return published
+
+
+def earliest_change(model, ids, published_values=[]):
+    """
+    The earliest publish date in a sitemap that changing the rows with
+    these ids, to these new publish dates, could affect
+    """
+
+    stored = (
+        db_session.query(
+            func.min(func.coalesce(model.published, NULL_PUBLISHED))
+        )
+        .filter(model.id.in_(ids))
+        .without_default_filters()
+        .scalar()
+    )
+    dates = [_naive(published) for published in published_values]
+
+    if stored:
+        dates.append(stored)
+
+    return min(dates, default=None)
+
+
+def _render(sitemap, rows):
+    url = SITEMAPS[sitemap]["url"]
+
+    xml_sitemap = flask.render_template(
+        "sitemap.xml",
+        links=[
+            {
+                "url": url.format(row_id),
+                "last_updated": (
+                    published.strftime("%Y-%m-%d")
+                    if published and published != NULL_PUBLISHED
+                    else ""
+                ),
+            }
+            for published, row_id in rows
+        ],
+    )
+
+    return gzip.compress(xml_sitemap.encode("utf-8"), mtime=0)
+
+
+def refresh_sitemap(sitemap, since=None):
+    """
+    Bring the stored shards of a sitemap up to date with the database.
+
+    With `since`, the shards before the first one which could hold
+    rows published on or after that date are assumed to be current.
+    Only shards whose rows changed are rendered and written.
+    Commits, and returns the numbers of the shards written.
+    """
+
+    # Refreshes of the same sitemap, e.g. from concurrent ingestion
+    # requests, take turns rather than writing the same shards
+    db_session.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+        {"name": f"sitemap_shard:{sitemap}"},
+    )
+
+    keys = SITEMAPS[sitemap]["keys"]
+    shards = (
+        db_session.query(SitemapShard)
+        .filter(SitemapShard.sitemap == sitemap)
+        .order_by(SitemapShard.number)
+        .all()
+    )
+
+    number = 0
+    if since is not None and shards:
+        number = next(
+            (
+                shard.number
+                for shard in shards
+                if shard.last_published >= _naive(since)
+            ),
+            shards[-1].number,
+        )
+
+    stored = {shard.number: shard for shard in shards}
+
+    after = None
+    if number > 0:
+        previous = stored[number - 1]
+        after = (previous.last_published, previous.last_id)
+
+    written = []
+
+    while True:
+        rows_query = db_session.query(*keys)
+
+        if after:
+            after_values = [
+                literal(value, key.type) for key, value in zip(keys, after)
+            ]
+            rows_query = rows_query.filter(
+                tuple_(*keys) > tuple_(*after_values)
+            )
+
+        rows = rows_query.order_by(*keys).limit(SITEMAP_PAGE_SIZE).all()
+
+        if not rows:
+            break
+
+        digest = hashlib.sha1()
+        for published, row_id in rows:
+            digest.update(f"{row_id} {published:%Y-%m-%d}\n".encode("utf-8"))
+        etag = digest.hexdigest()
+
+        shard = stored.get(number)
+
+        if shard is None:
+            shard = SitemapShard(sitemap=sitemap, number=number)
+            db_session.add(shard)
+
+        shard.last_published, shard.last_id = rows[-1]
+
+        if shard.etag != etag:
+            shard.content = _render(sitemap, rows)
+            shard.etag = etag
+            shard.updated_at = datetime.utcnow()
+            written.append(number)
+
+        after = rows[-1]
+        number += 1
+
+        if len(rows) < SITEMAP_PAGE_SIZE:
+            break
+
+    # Rows were removed from the end of the sitemap
+    db_session.query(SitemapShard).filter(
+        SitemapShard.sitemap == sitemap, SitemapShard.number >= number
+    ).delete(synchronize_session=False)
+
+    db_session.commit()
+
+    return written
+
+
+def get_shards(sitemap):
+    """
+    The shards of a sitemap, without their content. There are none
+    until the sitemap is built with refresh_sitemap.
+    """
+
+    return (
+        db_session.query(SitemapShard)
+        .filter(SitemapShard.sitemap == sitemap)
+        .order_by(SitemapShard.number)
+        .all()
+    )
+
+
+def get_shard(sitemap, number):
+    """
+    A shard of a sitemap, with its gzipped content
+    """
+
+    return (
+        db_session.query(SitemapShard)
+        .options(undefer(SitemapShard.content))
+        .filter(SitemapShard.sitemap == sitemap, SitemapShard.number == number)
+        .first()
+    )
@@ -0,0 +1,76 @@
+from sqlalchemy import desc
+
+from webapp.security.cache import VersionedCache
+from webapp.security.models import Notice
+from webapp.security.queries import count_cves, get_notices_query
+
+
+class SecurityStats:
+    """
+    Process-wide cache of the security counters for a release, for
+    landing pages like /16-04 which would otherwise query the notices
+    and CVEs on every request.
+
+    Each release's counters are kept for `ttl` seconds, and dropped
+    early when the "security_stats" CacheVersion stamp changes, which
+    happens whenever notices or CVEs are written. The stamp is checked
+    at most once every `check_interval` seconds.
+    """
+
+    def __init__(self, session=None, ttl=3600, check_interval=10):
+        self._cache = VersionedCache(
+            "security_stats",
+            ttl=ttl,
+            maxsize=64,
+            check_interval=check_interval,
+            session=session,
+        )
+
+    def _compute(self, codename, latest):
+        notices_query, sort_keys, _ = get_notices_query(release=codename)
+        latest_notices = (
+            notices_query.with_entities(
+                Notice.id, Notice.title, Notice.published, Notice.summary
+            )
+            .order_by(*[desc(key) for key in sort_keys])
+            .limit(latest)
+            .all()
+        )
+
+        return {
+            "notices": notices_query.count(),
+            "released_cves": count_cves(
+                clean_versions=[[codename]], clean_statuses=[["released"]]
+            ),
+            "latest_notices": [
+                {
+                    "id": notice_id,
+                    "title": title,
+                    "published": published,
+                    "summary": summary,
+                }
+                for notice_id, title, published, summary in latest_notices
+            ],
+        }
+
+    def release_stats(self, codename, latest=5):
+        """
+        The number of notices and of CVEs released for a release,
+        and its `latest` most recent notices
+        """
+
+        return self._cache.get_or_set(
+            (codename, latest), lambda: self._compute(codename, latest)
+        )
+
+    def invalidate(self):
+        """
+        Bump the version stamp in the current transaction, so every
+        process recomputes the stats once it's committed, see
+        VersionedCache.invalidate
+        """
+
+        self._cache.invalidate()
+
+
+security_stats = SecurityStats()
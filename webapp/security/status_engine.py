@@ -0,0 +1,655 @@
+"""
+An optional in-process engine for the CVE index filters.
+
+Each combination of the CVE index filters - release, status, package,
+component and priority - is a different SQL query. This engine keeps
+the cve_facet table in memory instead, as NumPy arrays with the
+strings dictionary encoded, and answers the filters with vectorised
+boolean masks: a page of the matching CVEs, their counts by priority
+and status, and the packages the CVE index shows for each of them.
+
+It's enabled with SECURITY_STATUS_ENGINE=true when NumPy is installed,
+and is only used for listings without a text search. The first use
+loads it in full. After that, at most every `check_interval` seconds,
+the CVEs changed since the last check are found by their updated_at
+and tombstones and spliced in, so ingestion doesn't need a reload.
+"""
+
+# Standard library
+import os
+from datetime import timezone
+from threading import Lock
+from time import monotonic
+
+# Packages
+import dateutil.parser
+from sqlalchemy import func
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Local
+from webapp.security.database import db_session
+from webapp.security.ingestion import batches
+from webapp.security.models import CVE, CVEFacet, Status, Tombstone
+from webapp.security.pagination import (
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+)
+from webapp.security.queries import NULL_PUBLISHED, get_settled_time
+
+
+STATUS_ENGINE_ENABLED = os.getenv("SECURITY_STATUS_ENGINE", "").lower() in [
+    "true",
+    "1",
+    "yes",
+]
+
+FACET_COLUMNS = [
+    CVEFacet.cve_id,
+    CVEFacet.package_name,
+    CVEFacet.release_codename,
+    CVEFacet.status,
+    CVEFacet.component,
+]
+CVE_COLUMNS = [
+    CVE.id,
+    func.coalesce(CVE.published, NULL_PUBLISHED),
+    CVE.priority,
+    CVE.status,
+]
+
+# Rows fetched at a time
+LOAD_BATCH_SIZE = 10000
+
+
+class _Dictionary:
+    """
+    Integer codes for strings. Codes are only ever added, so that
+    they stay valid for the indexes built before
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+
+        return code
+
+    def table(self, values):
+        """
+        A lookup table of whether each code is one of the values, to
+        index with an array of codes
+        """
+
+        table = numpy.zeros(len(self.values), dtype=bool)
+        table[
+            [self.codes[value] for value in values if value in self.codes]
+        ] = True
+
+        return table
+
+
+def _datetime(published):
+    return published.astype("datetime64[us]").item()
+
+
+class StatusIndex:
+    """
+    An immutable snapshot of the CVE statuses, as columns.
+
+    The CVEs are sorted by ID. The status rows are sorted by CVE and
+    package, and the rows of a CVE's package are a group, which is
+    what the filters select, like get_cve_packages_query. The groups
+    of the CVE at index i are group_indptr[i]:group_indptr[i + 1].
+    """
+
+    def __init__(self, dictionaries, cves, rows):
+        self.dictionaries = dictionaries
+
+        # CVEs, by ID
+        order = numpy.argsort(cves["id"], kind="stable")
+        position = numpy.empty_like(order)
+        position[order] = numpy.arange(len(order))
+        self.cve_ids = cves["id"][order]
+        self.published = cves["published"][order]
+        self.priority = cves["priority"][order]
+        self.active = cves["active"][order]
+
+        # Rows, by CVE and package
+        row_cve = position[rows["cve"]]
+        order = numpy.lexsort((rows["package"], row_cve))
+        self.row_cve = row_cve[order]
+        self.row_package = rows["package"][order]
+        self.row_codename = rows["codename"][order]
+        self.row_status = rows["status"][order]
+        self.row_component = rows["component"][order]
+
+        new_group = numpy.ones(len(order), dtype=bool)
+        new_group[1:] = (self.row_cve[1:] != self.row_cve[:-1]) | (
+            self.row_package[1:] != self.row_package[:-1]
+        )
+        self.row_group = numpy.cumsum(new_group) - 1
+        starts = numpy.flatnonzero(new_group)
+        self.group_cve = self.row_cve[starts]
+        self.group_package = self.row_package[starts]
+        self.group_indptr = numpy.searchsorted(
+            self.group_cve, numpy.arange(len(self.cve_ids) + 1)
+        )
+
+        # The listing order, by publish date and ID
+        order = numpy.lexsort(
+            (numpy.arange(len(self.cve_ids)), self.published)
+        )
+        self.order = order
+        self.sorted_published = self.published[order]
+        self.sorted_ids = self.cve_ids[order]
+
+    def _columns(self):
+        """
+        The CVEs and rows, in the form the constructor takes
+        """
+
+        return (
+            {
+                "id": self.cve_ids,
+                "published": self.published,
+                "priority": self.priority,
+                "active": self.active,
+            },
+            {
+                "cve": self.row_cve,
+                "package": self.row_package,
+                "codename": self.row_codename,
+                "status": self.row_status,
+                "component": self.row_component,
+            },
+        )
+
+    def replace(self, cve_ids, cves, rows):
+        """
+        A new index, with the CVEs with these IDs, and their rows,
+        replaced by the given ones. CVEs which aren't given are
+        removed.
+        """
+
+        old_cves, old_rows = self._columns()
+        changed = numpy.array(sorted(cve_ids), dtype=object)
+        positions = numpy.searchsorted(self.cve_ids, changed)
+        found = positions < len(self.cve_ids)
+        found[found] = self.cve_ids[positions[found]] == changed[found]
+
+        keep = numpy.ones(len(self.cve_ids), dtype=bool)
+        keep[positions[found]] = False
+        keep_rows = keep[self.row_cve]
+
+        # The kept CVEs come first, followed by the given ones
+        kept_rows = {
+            name: column[keep_rows] for name, column in old_rows.items()
+        }
+        kept_rows["cve"] = (numpy.cumsum(keep) - 1)[kept_rows["cve"]]
+        rows = {**rows, "cve": rows["cve"] + int(keep.sum())}
+
+        return StatusIndex(
+            self.dictionaries,
+            {
+                name: numpy.concatenate([column[keep], cves[name]])
+                for name, column in old_cves.items()
+            },
+            {
+                name: numpy.concatenate([column, rows[name]])
+                for name, column in kept_rows.items()
+            },
+        )
+
+    def _in(self, name, values, codes):
+        """
+        Whether each of the codes is one of the values
+        """
+
+        return self.dictionaries[name].table(values)[codes]
+
+    def _any(self, row_mask):
+        """
+        Whether any row of each group is in the mask
+        """
+
+        return (
+            numpy.bincount(
+                self.row_group[row_mask], minlength=len(self.group_cve)
+            )
+            > 0
+        )
+
+    def _group_mask(
+        self,
+        priority=None,
+        package=None,
+        component=None,
+        clean_versions=[],
+        clean_statuses=[],
+        require_active=True,
+        **_,
+    ):
+        """
+        The groups matching the CVE index filters. Without
+        `require_active`, the groups without an active status match
+        too, as in _filter_packages.
+        """
+
+        mask = self.active[self.group_cve]
+
+        if priority:
+            mask &= self._in(
+                "priority", [priority], self.priority[self.group_cve]
+            )
+
+        if package:
+            mask &= self._in("package", [package], self.group_package)
+
+        if component:
+            mask &= self._any(
+                self._in("component", [component], self.row_component)
+            )
+
+        if clean_versions:
+            for versions, statuses in zip(clean_versions, clean_statuses):
+                mask &= self._any(
+                    self._in("codename", versions, self.row_codename)
+                    & self._in("status", statuses, self.row_status)
+                )
+        elif require_active:
+            mask &= self._any(
+                self._in("status", Status.active_statuses, self.row_status)
+            )
+
+        return mask
+
+    def _cve_mask(self, group_mask):
+        """
+        Whether each CVE has a group in the mask
+        """
+
+        mask = numpy.zeros(len(self.cve_ids), dtype=bool)
+        mask[self.group_cve[group_mask]] = True
+
+        return mask
+
+    def _ranks(self, **filters):
+        """
+        The positions of the matching CVEs in the listing order,
+        ascending
+        """
+
+        return numpy.flatnonzero(
+            self._cve_mask(self._group_mask(**filters))[self.order]
+        )
+
+    def count(self, **filters):
+        """
+        Count the CVEs matching the filters, like count_cves
+        """
+
+        return int(
+            numpy.count_nonzero(self._cve_mask(self._group_mask(**filters)))
+        )
+
+    def _counts(self, name, counts):
+        return {
+            value: int(count)
+            for value, count in zip(self.dictionaries[name].values, counts)
+            if count
+        }
+
+    def facet_counts(self, codenames, **filters):
+        """
+        Count the matching CVEs by priority and status, like
+        get_cve_facet_counts
+        """
+
+        # Priority counts ignore the priority filter
+        groups = self._group_mask(**{**filters, "priority": None})
+        priority_counts = numpy.bincount(
+            self.priority[self._cve_mask(groups)],
+            minlength=len(self.dictionaries["priority"].values),
+        )
+
+        if filters.get("priority"):
+            groups &= self._in(
+                "priority",
+                [filters["priority"]],
+                self.priority[self.group_cve],
+            )
+
+        rows = groups[self.row_group] & self._in(
+            "codename", codenames, self.row_codename
+        )
+
+        # Each CVE is counted once for each status
+        seen = numpy.zeros(
+            (len(self.dictionaries["status"].values), len(self.cve_ids)),
+            dtype=bool,
+        )
+        seen[self.row_status[rows], self.row_cve[rows]] = True
+
+        return {
+            "priority": self._counts("priority", priority_counts),
+            "status": self._counts("status", seen.sum(axis=1)),
+        }
+
+    def _position(self, values):
+        """
+        The numbers of CVEs before, and up to, the sort key values
+        of a cursor
+        """
+
+        if (
+            not isinstance(values, list)
+            or len(values) != 2
+            or not isinstance(values[1], str)
+        ):
+            raise InvalidCursorError("Cursor doesn't match the sort keys")
+
+        try:
+            published = dateutil.parser.isoparse(values[0])
+        except (TypeError, ValueError):
+            raise InvalidCursorError(f"Invalid cursor value: {values[0]}")
+
+        if published.tzinfo:
+            published = published.astimezone(timezone.utc).replace(tzinfo=None)
+
+        published = numpy.datetime64(published, "us")
+        start = numpy.searchsorted(self.sorted_published, published, "left")
+        end = numpy.searchsorted(self.sorted_published, published, "right")
+        ids = self.sorted_ids[start:end]
+
+        return (
+            start + numpy.searchsorted(ids, values[1], "left"),
+            start + numpy.searchsorted(ids, values[1], "right"),
+        )
+
+    def _cursor(self, rank, page):
+        return encode_cursor(
+            [_datetime(self.sorted_published[rank]), self.sorted_ids[rank]],
+            page,
+        )
+
+    def paginate(self, limit, after=None, before=None, **filters):
+        """
+        A page of the IDs of the CVEs matching the filters, newest
+        first, and its pagination, like paginate() on get_cves_query.
+        The cursors work with both.
+        """
+
+        ranks = self._ranks(**filters)
+        forwards = not before
+        token = before or after
+        current_page = 1
+
+        if token:
+            values, current_page = decode_cursor(token)
+            before_cursor, through_cursor = self._position(values)
+
+            if forwards:
+                ranks = ranks[ranks < before_cursor]
+            else:
+                ranks = ranks[ranks >= through_cursor]
+
+        # Pages before a cursor are read upwards from it
+        selected = ranks[::-1][: limit + 1] if forwards else ranks[: limit + 1]
+        has_more = len(selected) > limit
+        selected = selected[:limit]
+
+        if not forwards:
+            selected = selected[::-1]
+
+        has_next = has_more if forwards else True
+        has_previous = bool(token) if forwards else has_more
+        pagination = {
+            "current_page": current_page,
+            "previous_cursor": None,
+            "next_cursor": None,
+        }
+
+        if len(selected) and has_previous:
+            pagination["previous_cursor"] = self._cursor(
+                selected[0], current_page - 1
+            )
+
+        if len(selected) and has_next:
+            pagination["next_cursor"] = self._cursor(
+                selected[-1], current_page + 1
+            )
+
+        return [self.sorted_ids[rank] for rank in selected], pagination
+
+    def cursor_for_offset(self, offset, page, **filters):
+        """
+        The cursor equivalent to an offset, like cursor_for_offset()
+        """
+
+        ranks = self._ranks(**filters)
+
+        if offset > len(ranks):
+            return None
+
+        return self._cursor(ranks[len(ranks) - offset], page)
+
+    def packages(self, cve_ids, **filters):
+        """
+        The names of the packages of each CVE which match the filters,
+        which are the ones the CVE index shows
+        """
+
+        mask = self._group_mask(
+            **{**filters, "priority": None}, require_active=False
+        )
+        package_names = self.dictionaries["package"].values
+        packages = {}
+
+        for cve_id in cve_ids:
+            index = numpy.searchsorted(self.cve_ids, cve_id)
+
+            if index == len(self.cve_ids) or self.cve_ids[index] != cve_id:
+                continue
+
+            groups = numpy.arange(
+                self.group_indptr[index], self.group_indptr[index + 1]
+            )
+            packages[cve_id] = {
+                package_names[code]
+                for code in self.group_package[groups[mask[groups]]]
+            }
+
+        return packages
+
+
+class StatusEngine:
+    """
+    Process-wide holder of the current StatusIndex, which keeps it up
+    to date with the database
+    """
+
+    def __init__(self, enabled=None, check_interval=10):
+        self.enabled = (
+            STATUS_ENGINE_ENABLED if enabled is None else enabled
+        ) and numpy is not None
+        self.check_interval = check_interval
+        self.dictionaries = {
+            name: _Dictionary()
+            for name in [
+                "package",
+                "codename",
+                "status",
+                "component",
+                "priority",
+            ]
+        }
+        self._index = None
+        self._watermark = None
+        self._checked_at = None
+        self._lock = Lock()
+
+    def _encode(self, cve_rows, facet_rows):
+        """
+        Columns of CVE and cve_facet rows, with their strings encoded
+        """
+
+        cve_position = {}
+        ids = []
+        published = []
+        priority = []
+        active = []
+
+        for cve_id, cve_published, cve_priority, cve_status in cve_rows:
+            cve_position[cve_id] = len(ids)
+            ids.append(cve_id)
+            published.append(cve_published)
+            priority.append(self.dictionaries["priority"].encode(cve_priority))
+            active.append(cve_status == "active")
+
+        columns = {
+            name: [] for name in ["cve", "package", "codename", "status"]
+        }
+        columns["component"] = []
+
+        for cve_id, package, codename, status, component in facet_rows:
+            # Facets of CVEs which were written after the CVEs were read
+            if cve_id not in cve_position:
+                continue
+
+            columns["cve"].append(cve_position[cve_id])
+            columns["package"].append(
+                self.dictionaries["package"].encode(package)
+            )
+            columns["codename"].append(
+                self.dictionaries["codename"].encode(codename)
+            )
+            columns["status"].append(
+                self.dictionaries["status"].encode(status)
+            )
+            columns["component"].append(
+                self.dictionaries["component"].encode(component)
+            )
+
+        return (
+            {
+                "id": numpy.array(ids, dtype=object),
+                "published": numpy.array(published, dtype="datetime64[us]"),
+                "priority": numpy.array(priority, dtype=numpy.int16),
+                "active": numpy.array(active, dtype=bool),
+            },
+            {
+                "cve": numpy.array(columns["cve"], dtype=numpy.int64),
+                "package": numpy.array(columns["package"], dtype=numpy.int32),
+                "codename": numpy.array(
+                    columns["codename"], dtype=numpy.int16
+                ),
+                "status": numpy.array(columns["status"], dtype=numpy.int16),
+                "component": numpy.array(
+                    columns["component"], dtype=numpy.int16
+                ),
+            },
+        )
+
+    def load(self):
+        """
+        Load the whole index. Returns the number of CVEs loaded.
+        """
+
+        watermark = get_settled_time()
+        cve_rows = db_session.query(*CVE_COLUMNS).yield_per(LOAD_BATCH_SIZE)
+        facet_rows = db_session.query(*FACET_COLUMNS).yield_per(
+            LOAD_BATCH_SIZE
+        )
+
+        self._index = StatusIndex(
+            self.dictionaries, *self._encode(cve_rows, facet_rows)
+        )
+        self._watermark = watermark
+        self._checked_at = monotonic()
+
+        return len(self._index.cve_ids)
+
+    def refresh(self):
+        """
+        Splice in the CVEs which changed, or were deleted, since the
+        last load or refresh. Returns the number of CVEs replaced.
+        """
+
+        watermark = get_settled_time()
+        changed_ids = {
+            cve_id
+            for cve_id, in db_session.query(CVE.id).filter(
+                CVE.updated_at >= self._watermark
+            )
+        }
+        changed_ids.update(
+            cve_id
+            for cve_id, in db_session.query(Tombstone.id).filter(
+                Tombstone.kind == "cve",
+                Tombstone.deleted_at >= self._watermark,
+            )
+        )
+
+        if changed_ids:
+            cve_rows = []
+            facet_rows = []
+
+            for ids_batch in batches(sorted(changed_ids)):
+                cve_rows += db_session.query(*CVE_COLUMNS).filter(
+                    CVE.id.in_(ids_batch)
+                )
+                facet_rows += db_session.query(*FACET_COLUMNS).filter(
+                    CVEFacet.cve_id.in_(ids_batch)
+                )
+
+            self._index = self._index.replace(
+                changed_ids, *self._encode(cve_rows, facet_rows)
+            )
+
+        self._watermark = watermark
+        self._checked_at = monotonic()
+
+        return len(changed_ids)
+
+    def current(self):
+        """
+        The current StatusIndex, loading or refreshing it as needed,
+        or None if the engine isn't enabled
+        """
+
+        if not self.enabled:
+            return None
+
+        index = self._index
+
+        if (
+            index is not None
+            and monotonic() - self._checked_at < self.check_interval
+        ):
+            return index
+
+        with self._lock:
+            # Transactions still running on the primary, which settle
+            # the changes, can't be seen from a replica
+            db_session().use_primary()
+
+            if self._index is None:
+                self.load()
+            elif monotonic() - self._checked_at >= self.check_interval:
+                self.refresh()
+
+            return self._index
+
+
+status_engine = StatusEngine()
@@ -1,7 +1,10 @@
 # Standard library
+import gzip
+import hashlib
+import json
+import os
 import re
-from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timezone
 from math import ceil
 
 # Packages
@@ -12,107 +15,259 @@ from feedgen.entry import FeedEntry
 from feedgen.feed import FeedGenerator
 from marshmallow import EXCLUDE
 from marshmallow.exceptions import ValidationError
-from mistune import Markdown
-from sortedcontainers import SortedDict
-from sqlalchemy import asc, desc, or_, and_, func, case
+from sqlalchemy import desc, func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError, DataError
-from sqlalchemy.orm import contains_eager
+from sqlalchemy.orm import load_only, selectinload, undefer
 
 # Local
+from webapp.context import modify_query
 from webapp.security.database import db_session
-from webapp.security.models import CVE, Notice, Package, Status, Release
+from webapp.security.models import (
+    CVE,
+    Notice,
+    Package,
+    Status,
+    Release,
+    notice_type,
+)
 from webapp.security.schemas import CVESchema, NoticeSchema, ReleaseSchema
 from webapp.security.auth import authorization_required
 from webapp.security.api import SecurityAPI
-
-markdown_parser = Markdown(
-    hard_wrap=True, parse_block_html=True, parse_inline_html=True
+from webapp.security.cache import TTLCache, VersionedCache
+from webapp.security.exports import (
+    EXPORT_FORMATS,
+    EXPORT_RETENTION_SECONDS,
+    EXPORTS_DIR,
+    MANIFEST,
+)
+from webapp.security.ingestion import batches, new_counters, upsert_cves
+from webapp.security.registry import release_registry
+from webapp.security.rendering import (
+    RENDERER_VERSION,
+    render_notice,
+    store_rendered_notice,
+)
+from webapp.security.stats import security_stats
+from webapp.security.status_engine import status_engine
+from webapp.security.sitemaps import (
+    earliest_change,
+    get_shard,
+    get_shards,
+    refresh_sitemap,
 )
+from webapp.security.pagination import (
+    InvalidCursorError,
+    cursor_for_offset,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+    stream_page,
+)
+from webapp.security.queries import (
+    count_cves,
+    get_cve_facet_counts,
+    get_cves_by_ids,
+    get_changes,
+    get_cves_query,
+    get_notices_associations,
+    get_notices_query,
+    get_package_cves_query,
+    get_package_release_codenames,
+    get_statuses_by_cve_ids,
+    NULL_PUBLISHED,
+    SITEMAP_PAGE_SIZE,
+)
+
 session = talisker.requests.get_session()
 
+# The HTTP API is only used as a fallback for
+# notices and CVEs missing from the local database
+security_api_fallback = os.getenv("SECURITY_API_FALLBACK", "").lower() in [
+    "true",
+    "1",
+]
 security_api = SecurityAPI(
     session=session,
     base_url="https://ubuntu.com/security/",
 )
 
+# Total result counts for the listing pages, which are
+# too expensive to recompute for every page of results
+results_count_cache = TTLCache(ttl=300)
+
+# Generated USN feeds, by URL, release and limit, which are
+# cleared in every process whenever a notice is written
+feed_cache = VersionedCache("notices_feed", ttl=3600, maxsize=256)
+FEED_MAX_LIMIT = 100
+
+CHANGES_MAX_LIMIT = 1000
+FEED_COLUMNS = [
+    Notice.id,
+    Notice.title,
+    Notice.details,
+    Notice.published,
+    Notice.updated_at,
+]
+
+# Columns of the JSON listings, which leave out the larger JSON columns
+CVE_JSON_COLUMNS = [
+    CVE.id,
+    CVE.published,
+    CVE.description,
+    CVE.ubuntu_description,
+    CVE.priority,
+    CVE.status,
+    CVE.cvss3,
+    CVE.mitigation,
+]
+CVE_JSON_FIELDS = [column.key for column in CVE_JSON_COLUMNS]
+STATUS_JSON_FIELDS = [
+    "release_codename",
+    "status",
+    "description",
+    "component",
+    "pocket",
+]
+NOTICE_JSON_COLUMNS = [
+    Notice.id,
+    Notice.title,
+    Notice.published,
+    Notice.summary,
+    Notice.instructions,
+]
+NOTICE_JSON_FIELDS = [column.key for column in NOTICE_JSON_COLUMNS]
+
+
+def _redirect_to_cursor(cursor, legacy_param):
+    query_string = modify_query(
+        {legacy_param: [], "after": cursor, "before": []}
+    )
+
+    return flask.redirect(f"{flask.request.path}?{query_string}")
+
+
+def _json_listing_response(name, items, pagination, **fields):
+    """
+    Stream a JSON listing, serializing each item as it's fetched.
+    The pagination cursors are only known once all the items have
+    been read, so they come after the list.
+    """
+
+    def generate():
+        yield f"{{{json.dumps(name)}: ["
+
+        for index, item in enumerate(items):
+            yield ("," if index else "") + json.dumps(
+                item, default=lambda value: value.isoformat()
+            )
 
-def get_processed_details(notice):
-    pattern = re.compile(r"(cve|CVE-)\d{4}-\d{4,7}", re.MULTILINE)
+        yield "], " + json.dumps(
+            {
+                **fields,
+                "previous_cursor": pagination["previous_cursor"],
+                "next_cursor": pagination["next_cursor"],
+            }
+        )[1:]
 
-    return re.sub(
-        pattern, r'<a href="/security/\g<0>">\g<0></a>', notice["description"]
+    return flask.Response(
+        flask.stream_with_context(generate()),
+        mimetype="application/json",
     )
 
 
-def notice(notice_id):
+def _get_notice(notice_id):
+    """
+    Build the notice dict, in the API response shape,
+    from the local database
+    """
 
-    notice = security_api.get_notice(notice_id)
+    notice = (
+        db_session.query(Notice)
+        .options(
+            selectinload(Notice.releases),
+            selectinload(Notice.cves),
+            undefer(Notice.rendered),
+        )
+        .get(notice_id.upper())
+    )
 
     if not notice:
-        flask.abort(404)
+        if security_api_fallback:
+            return security_api.get_notice(notice_id)
+
+        return None
+
+    cve_ids = [cve.id for cve in notice.cves]
+    related_notices = []
+
+    if cve_ids:
+        # An EXISTS rather than a DISTINCT join, as the JSON columns
+        # can't be compared
+        related_notices = (
+            db_session.query(Notice)
+            .filter(Notice.cves.any(CVE.id.in_(cve_ids)))
+            .filter(Notice.id != notice.id)
+            .order_by(desc(Notice.id))
+            .all()
+        )
 
-    package_descriptions = {}
-    package_versions = {}
-    release_packages = SortedDict()
+    notice_dict = notice.as_detail_dict(related_notices=related_notices)
 
-    releases = {
-        release["codename"]: release["version"]
-        for release in notice["releases"]
-    }
+    if notice.renderer_version == RENDERER_VERSION:
+        notice_dict["rendered"] = notice.rendered
 
-    if notice["release_packages"]:
-        for codename, pkgs in notice["release_packages"].items():
-            release_version = releases[codename]
-            release_packages[release_version] = {}
-            for package in pkgs:
-                if not package.get("is_visible", True):
-                    continue
+    return notice_dict
 
-                name = package["name"]
-                if not package["is_source"]:
-                    release_packages[release_version][name] = package
-                    continue
 
-                if notice["type"] == "LSN":
-                    if name not in package_descriptions:
-                        package_versions[name] = []
+def _get_cve(cve_id):
+    """
+    Build the CVE dict, in the API response shape,
+    from the local database
+    """
 
-                    package_versions[name].append(package["version"])
-                    versions = ", >= ".join(package_versions[name])
-                    description = (
-                        f"{package['description']} - " f"(>= {versions})"
-                    )
-                    package_descriptions[name] = description
+    cve = (
+        db_session.query(CVE)
+        .options(
+            selectinload(CVE.statuses).joinedload(Status.package),
+            selectinload(CVE.notices),
+        )
+        .get(cve_id.upper())
+    )
 
-                    continue
+    if not cve:
+        if security_api_fallback:
+            return security_api.get_cve(cve_id)
 
-                if name not in package_descriptions:
-                    package_descriptions[name] = package["description"]
+        return None
 
-        package_descriptions = {
-            key: package_descriptions[key]
-            for key in sorted(package_descriptions.keys())
-        }
+    return cve.as_dict()
+
+
+def notice(notice_id):
+
+    notice = _get_notice(notice_id)
+
+    if not notice:
+        flask.abort(404)
+
+    # Notices stored by an older renderer are rendered on the fly
+    rendered = notice.get("rendered") or render_notice(notice)
 
     if notice["type"] == "LSN":
         template = "security/notices/lsn.html"
     else:
         template = "security/notices/usn.html"
 
-    if notice.get("published"):
-        notice["published"] = dateutil.parser.parse(
-            notice["published"]
-        ).strftime("%-d %B %Y")
-
     notice = {
         "id": notice["id"],
         "title": notice["title"],
-        "published": notice["published"],
+        "published": rendered["published"],
         "summary": notice["summary"],
-        "details": markdown_parser(get_processed_details(notice)),
-        "instructions": markdown_parser(notice["instructions"]),
-        "package_descriptions": package_descriptions,
-        "release_packages": release_packages,
+        "details": rendered["details"],
+        "instructions": rendered["instructions"],
+        "package_descriptions": rendered["package_descriptions"],
+        "release_packages": dict(rendered["release_packages"]),
         "releases": notice["releases"],
         "cves": notice["cves"],
         "references": notice["references"],
@@ -124,57 +279,67 @@ def notice(notice_id):
 
 def notices():
     page = flask.request.args.get("page", default=1, type=int)
+    after = flask.request.args.get("after", type=str)
+    before = flask.request.args.get("before", type=str)
     details = flask.request.args.get("details", type=str)
     release = flask.request.args.get("release", type=str)
     order_by = flask.request.args.get("order", type=str)
 
-    releases = (
-        db_session.query(Release)
-        .order_by(desc(Release.release_date))
-        .filter(Release.version.isnot(None))
-        .all()
+    releases = [
+        rel for rel in release_registry.releases() if rel.version is not None
+    ]
+    notices_query, sort_keys, descending = get_notices_query(
+        details=details, release=release, order_by=order_by
     )
-    notices_query = db_session.query(Notice)
+    page_size = 10
 
-    if release:
-        notices_query = notices_query.join(Release, Notice.releases).filter(
-            Release.codename == release
-        )
+    if page < 1:
+        flask.abort(404)
 
-    if details:
-        notices_query = notices_query.filter(
-            or_(
-                Notice.id.ilike(f"%{details}%"),
-                Notice.details.ilike(f"%{details}%"),
-                Notice.title.ilike(f"%{details}%"),
-                Notice.cves.any(CVE.id.ilike(f"%{details}%")),
-            )
+    # Redirect legacy page links to the equivalent cursor
+    if page > 1 and not (after or before):
+        cursor = cursor_for_offset(
+            notices_query,
+            sort_keys,
+            offset=(page - 1) * page_size,
+            page=page,
+            descending=descending,
         )
 
-    # Snapshot total results for search
-    page_size = 10
-    total_results = notices_query.count()
-    total_pages = ceil(total_results / page_size)
-    offset = page * page_size - page_size
+        if not cursor:
+            flask.abort(404)
 
-    if page < 1 or 1 < page > total_pages:
-        flask.abort(404)
+        return _redirect_to_cursor(cursor, legacy_param="page")
 
-    sort = asc if order_by == "oldest" else desc
-    notices = (
-        notices_query.order_by(sort(Notice.published))
-        .offset(offset)
-        .limit(page_size)
-        .all()
+    try:
+        # The listing shows each notice's releases and CVE IDs, which
+        # are loaded for the whole page at once
+        notices, pagination = paginate(
+            notices_query.options(
+                selectinload(Notice.releases),
+                selectinload(Notice.cves).load_only(CVE.id),
+            ),
+            sort_keys,
+            page_size,
+            after=after,
+            before=before,
+            descending=descending,
+        )
+    except InvalidCursorError:
+        flask.abort(400, "Invalid pagination cursor")
+
+    total_results = results_count_cache.get_or_set(
+        ("notices", release, details), notices_query.count
     )
+    offset = (pagination["current_page"] - 1) * page_size
 
     return flask.render_template(
         "security/notices.html",
         notices=notices,
         releases=releases,
         pagination=dict(
-            current_page=page,
-            total_pages=total_pages,
+            pagination,
+            total_pages=ceil(total_results / page_size),
             total_results=total_results,
             page_first_result=offset + 1,
             page_last_result=offset + len(notices),
@@ -182,13 +347,79 @@ def notices():
     )
 
 
+def notices_json():
+    """
+    The notices listing as JSON, with the same filters as notices()
+    and cursor pagination
+    - limit - default 10
+    - after / before - pagination cursors
+    """
+
+    limit = flask.request.args.get("limit", default=10, type=int)
+    after = flask.request.args.get("after", type=str)
+    before = flask.request.args.get("before", type=str)
+    details = flask.request.args.get("details", type=str)
+    release = flask.request.args.get("release", type=str)
+    order_by = flask.request.args.get("order", type=str)
+
+    if limit < 1:
+        flask.abort(400, "limit must be a positive number")
+
+    notices_query, sort_keys, descending = get_notices_query(
+        details=details, release=release, order_by=order_by
+    )
+    total_results = results_count_cache.get_or_set(
+        ("notices", release, details), notices_query.count
+    )
+
+    try:
+        rows, pagination = stream_page(
+            notices_query.with_entities(*NOTICE_JSON_COLUMNS),
+            sort_keys,
+            limit,
+            after=after,
+            before=before,
+            descending=descending,
+        )
+    except InvalidCursorError:
+        flask.abort(400, "Invalid pagination cursor")
+
+    def notices():
+        for rows_batch in batches(rows, size=500):
+            notice_ids = [row[0] for row in rows_batch]
+            cve_ids, codenames = get_notices_associations(notice_ids)
+
+            for row in rows_batch:
+                notice = dict(zip(NOTICE_JSON_FIELDS, row))
+                notice["type"] = notice_type(notice["id"])
+                notice["cves_ids"] = sorted(cve_ids[notice["id"]])
+                notice["releases"] = codenames[notice["id"]]
+
+                yield notice
+
+    return _json_listing_response(
+        "notices",
+        notices(),
+        pagination,
+        total_results=total_results,
+        limit=limit,
+    )
+
+
 # USN Feeds
 # ===
 
 
-def notices_feed(feed_type):
-    if feed_type not in ["atom", "rss"]:
-        flask.abort(404)
+def _build_feed(feed_type, release, limit):
+    """
+    Generate a USN feed of the latest notices
+
+    Returns the payload, its ETag and when its notices last changed.
+    The feed's dates come from its notices rather than the time it's
+    built, and the ETag from their IDs and changes rather than the
+    payload, so that every worker builds the same feed with the same
+    ETag until a notice changes.
+    """
 
     url_root = flask.request.url_root
     base_url = flask.request.base_url
@@ -197,10 +428,6 @@ def notices_feed(feed_type):
     feed.generator("Feedgen")
 
     feed.id(url_root)
-    feed.copyright(
-        f"{datetime.now().year} Canonical Ltd. "
-        "Ubuntu and Canonical are registered trademarks of Canonical Ltd."
-    )
     feed.title("Ubuntu security notices")
     feed.description("Recent content on Ubuntu security notices")
     feed.link(href=base_url, rel="self")
@@ -219,29 +446,130 @@ def notices_feed(feed_type):
         entry.description(description)
         entry.link(href=link)
         entry.published(f"{published} UTC")
+        entry.updated(notice.updated_at.replace(tzinfo=timezone.utc))
         entry.author({"name": "Ubuntu Security Team"})
 
         return entry
 
+    notices_query, _, _ = get_notices_query(release=release)
     notices = (
-        db_session.query(Notice)
-        .order_by(desc(Notice.published))
-        .limit(10)
+        notices_query.with_entities(*FEED_COLUMNS)
+        .order_by(desc(Notice.published), desc(Notice.id))
+        .limit(limit)
         .all()
     )
 
     for notice in notices:
         feed.add_entry(feed_entry(notice, url_root), order="append")
 
+    last_modified = max(
+        (notice.updated_at for notice in notices), default=None
+    )
+
+    if last_modified:
+        feed.updated(last_modified.replace(tzinfo=timezone.utc))
+
+    feed.copyright(
+        f"{(last_modified or datetime.utcnow()).year} Canonical Ltd. "
+        "Ubuntu and Canonical are registered trademarks of Canonical Ltd."
+    )
+
     payload = feed.atom_str() if feed_type == "atom" else feed.rss_str()
-    return flask.Response(payload, mimetype="text/xml")
+    etag = hashlib.sha1(
+        "\n".join(
+            [base_url, str(release), str(limit)]
+            + [f"{notice.id} {notice.updated_at}" for notice in notices]
+        ).encode("utf-8")
+    ).hexdigest()
+
+    return payload, etag, last_modified
+
+
+def notices_feed(feed_type):
+    """
+    The latest notices as an Atom or RSS feed
+    - release - only notices for this release
+    - limit - default 10, at most FEED_MAX_LIMIT
+
+    Feeds are generated once and served from feed_cache until a
+    notice changes, with an ETag and Last-Modified for conditional
+    requests
+    """
+
+    if feed_type not in ["atom", "rss"]:
+        flask.abort(404)
+
+    release = flask.request.args.get("release", type=str)
+    limit = flask.request.args.get("limit", default=10, type=int)
+
+    if release and release not in release_registry.codenames():
+        flask.abort(404)
+
+    if not 1 <= limit <= FEED_MAX_LIMIT:
+        flask.abort(400, f"limit must be between 1 and {FEED_MAX_LIMIT}")
+
+    payload, etag, last_modified = feed_cache.get_or_set(
+        (flask.request.base_url, release, limit),
+        lambda: _build_feed(feed_type, release, limit),
+    )
+
+    response = flask.Response(payload, mimetype="text/xml")
+    response.headers["Cache-Control"] = "public, max-age=300"
+    response.set_etag(etag)
+    response.last_modified = last_modified
+
+    return response.make_conditional(flask.request)
 
 
 # USN API
 # ===
-def _update_notice_object(notice, data):
+def _get_notice_references(notices_data):
+    """
+    Load the releases and CVEs referenced by some notices, with one
+    query each, and insert stubs for the CVEs which don't exist yet
+
+    Returns the releases by codename and the CVEs by ID
+    """
+
+    codenames = {
+        codename
+        for data in notices_data
+        for codename in data["release_packages"].keys()
+    }
+    cve_ids = {cve_id for data in notices_data for cve_id in data["cves"]}
+
+    releases = {}
+    if codenames:
+        releases = {
+            release.codename: release
+            for release in db_session.query(Release).filter(
+                Release.codename.in_(codenames)
+            )
+        }
+
+    cves = {}
+    if cve_ids:
+        # Stubs which a concurrent request inserts first are left as
+        # they are, rather than failing on the primary key
+        db_session.execute(
+            insert(CVE.__table__)
+            .values([{"id": cve_id} for cve_id in sorted(cve_ids)])
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
+        cves = {
+            cve.id: cve
+            for cve in db_session.query(CVE)
+            .options(load_only(CVE.id))
+            .filter(CVE.id.in_(cve_ids))
+        }
+
+    return releases, cves
+
+
+def _update_notice_object(notice, data, releases, cves):
     """
-    Set fields on a Notice model object
+    Set fields on a Notice model object, with the releases and
+    CVEs from _get_notice_references
     """
 
     notice.title = data["title"]
@@ -254,65 +582,116 @@ def _update_notice_object(notice, data):
     notice.is_hidden = data.get("is_hidden", False)
 
     notice.releases = [
-        db_session.query(Release).get(codename)
-        for codename in data["release_packages"].keys()
+        releases[codename] for codename in data["release_packages"].keys()
     ]
+    notice.cves = [cves[cve_id] for cve_id in sorted(set(data["cves"]))]
 
-    notice.cves.clear()
-    for cve_id in set(data["cves"]):
-        notice.cves.append(db_session.query(CVE).get(cve_id) or CVE(id=cve_id))
+    store_rendered_notice(notice)
 
     return notice
 
 
-def single_notices_sitemap(offset):
-    notices = (
-        db_session.query(Notice)
-        .order_by(Notice.published)
-        .offset(offset)
-        .limit(10000)
-        .all()
-    )
+def _sitemap_shard_response(sitemap, offset):
+    """
+    Serve a pre-rendered sitemap shard, gzipped if the client accepts it
+    """
 
-    xml_sitemap = flask.render_template(
-        "sitemap.xml",
-        links=[
-            {
-                "url": f"https://ubuntu.com/security/notices/{notice.id}",
-                "last_updated": notice.published.strftime("%Y-%m-%d"),
-            }
-            for notice in notices
-        ],
-    )
+    if not offset.isdigit() or int(offset) % SITEMAP_PAGE_SIZE:
+        flask.abort(404)
+
+    shard = get_shard(sitemap, int(offset) // SITEMAP_PAGE_SIZE)
+
+    if not shard:
+        flask.abort(404)
+
+    if "gzip" in flask.request.accept_encodings:
+        response = flask.make_response(shard.content)
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(f"{shard.etag}-gzip")
+    else:
+        response = flask.make_response(gzip.decompress(shard.content))
+        response.set_etag(shard.etag)
 
-    response = flask.make_response(xml_sitemap)
     response.headers["Content-Type"] = "application/xml"
     response.headers["Cache-Control"] = "public, max-age=43200"
+    response.vary.add("Accept-Encoding")
+    response.last_modified = shard.updated_at
 
-    return response
+    return response.make_conditional(flask.request)
 
 
-def notices_sitemap():
-    notices_count = db_session.query(Notice).order_by(Notice.published).count()
+def _sitemap_index_response(sitemap, base_url):
+    shards = get_shards(sitemap)
 
-    base_url = "https://ubuntu.com/security/notices"
+    # Built by scripts/refresh-sitemaps.py, not while crawlers wait
+    if not shards:
+        flask.abort(503, f"The {sitemap} sitemap isn't built yet")
 
     xml_sitemap = flask.render_template(
         "sitemap_index_template.xml",
         base_url=base_url,
         links=[
             {
-                "url": f"{base_url}/sitemap-{link * 10000}.xml",
+                "url": (
+                    f"{base_url}/sitemap-"
+                    f"{shard.number * SITEMAP_PAGE_SIZE}.xml"
+                ),
             }
-            for link in range(ceil(notices_count / 10000))
+            for shard in shards
         ],
     )
 
     response = flask.make_response(xml_sitemap)
     response.headers["Content-Type"] = "application/xml"
     response.headers["Cache-Control"] = "public, max-age=43200"
+    response.set_etag(hashlib.sha1(xml_sitemap.encode("utf-8")).hexdigest())
+    response.last_modified = max(shard.updated_at for shard in shards)
+
+    return response.make_conditional(flask.request)
+
+
+def single_notices_sitemap(offset):
+    return _sitemap_shard_response("notices", offset)
+
+
+def notices_sitemap():
+    return _sitemap_index_response(
+        "notices", "https://ubuntu.com/security/notices"
+    )
+
+
+def _invalidate_caches(*caches):
+    """
+    Expire caches in every process, once the changes they're built
+    from are committed. The version stamps are committed on their own,
+    so that no process refills a cache with the data from before the
+    changes under the new version, and their rows aren't locked for
+    the length of the changes.
+    """
+
+    for cache in caches:
+        cache.invalidate()
+
+    db_session.commit()
 
-    return response
+
+def _changed_notices(notice_ids):
+    """
+    The number of the notices which the current transaction changed,
+    by the updated_at the database stamps changed rows with
+    """
+
+    db_session.flush()
+
+    return (
+        db_session.query(Notice.id)
+        .without_default_filters()
+        .filter(
+            Notice.id.in_(notice_ids),
+            Notice.updated_at == func.timezone("utc", func.now()),
+        )
+        .count()
+    )
 
 
 @authorization_required
@@ -322,9 +701,7 @@ def create_notice():
     """
 
     notice_schema = NoticeSchema()
-    notice_schema.context["release_codenames"] = [
-        rel.codename for rel in db_session.query(Release).all()
-    ]
+    notice_schema.context["release_codenames"] = release_registry.codenames()
 
     try:
         notice_data = notice_schema.load(flask.request.json)
@@ -336,8 +713,14 @@ def create_notice():
             400,
         )
 
+    sitemap_since = earliest_change(
+        Notice, [notice_data["id"]], [notice_data["published"]]
+    )
+    releases, cves = _get_notice_references([notice_data])
     db_session.add(
-        _update_notice_object(Notice(id=notice_data["id"]), notice_data)
+        _update_notice_object(
+            Notice(id=notice_data["id"]), notice_data, releases, cves
+        )
     )
 
     try:
@@ -350,6 +733,9 @@ def create_notice():
             400,
         )
 
+    _invalidate_caches(security_stats, feed_cache)
+    refresh_sitemap("notices", since=sitemap_since)
+
     return flask.jsonify({"message": "Notice created"}), 201
 
 
@@ -367,9 +753,7 @@ def update_notice(notice_id):
         )
 
     notice_schema = NoticeSchema()
-    notice_schema.context["release_codenames"] = [
-        rel.codename for rel in db_session.query(Release).all()
-    ]
+    notice_schema.context["release_codenames"] = release_registry.codenames()
 
     try:
         notice_data = notice_schema.load(flask.request.json, unknown=EXCLUDE)
@@ -381,14 +765,101 @@ def update_notice(notice_id):
             400,
         )
 
-    notice = _update_notice_object(notice, notice_data)
+    sitemap_since = earliest_change(
+        Notice, [notice.id], [notice_data["published"]]
+    )
+    releases, cves = _get_notice_references([notice_data])
+    notice = _update_notice_object(notice, notice_data, releases, cves)
 
     db_session.add(notice)
+    changed = _changed_notices([notice.id])
     db_session.commit()
 
+    if changed:
+        _invalidate_caches(security_stats, feed_cache)
+
+    refresh_sitemap("notices", since=sitemap_since)
+
     return flask.jsonify({"message": "Notice updated"}), 200
 
 
+@authorization_required
+def bulk_upsert_notices():
+    """
+    PUT method to create or update many notices at once, from a JSON
+    list of notices in the same shape create_notice accepts
+    @returns the number of notices created and updated
+    """
+
+    notice_schema = NoticeSchema(many=True)
+    notice_schema.context["release_codenames"] = release_registry.codenames()
+
+    try:
+        notices_data = notice_schema.load(
+            flask.request.json or [], unknown=EXCLUDE
+        )
+    except ValidationError as error:
+        return (
+            flask.jsonify(
+                {"message": "Invalid payload", "errors": error.messages}
+            ),
+            400,
+        )
+
+    # Only the last copy of a notice counts, like sequential updates
+    notices_data = list({data["id"]: data for data in notices_data}.values())
+
+    if not notices_data:
+        return flask.jsonify({"created": 0, "updated": 0}), 200
+
+    notice_ids = [data["id"] for data in notices_data]
+    notices = {
+        notice.id: notice
+        for notice in db_session.query(Notice)
+        .without_default_filters()
+        .options(selectinload(Notice.releases), selectinload(Notice.cves))
+        .filter(Notice.id.in_(notice_ids))
+    }
+    updated = len(notices)
+
+    sitemap_since = earliest_change(
+        Notice, notice_ids, [data["published"] for data in notices_data]
+    )
+    releases, cves = _get_notice_references(notices_data)
+
+    for data in notices_data:
+        notice = notices.get(data["id"]) or Notice(id=data["id"])
+        db_session.add(_update_notice_object(notice, data, releases, cves))
+
+    try:
+        changed = _changed_notices(notice_ids)
+        db_session.commit()
+    except (DataError, IntegrityError) as error:
+        db_session.rollback()
+
+        return (
+            flask.jsonify(
+                {
+                    "message": "Failed bulk upserting notices",
+                    "error": error.orig.args[0],
+                }
+            ),
+            400,
+        )
+
+    if changed:
+        _invalidate_caches(security_stats, feed_cache)
+
+    refresh_sitemap("notices", since=sitemap_since)
+
+    return (
+        flask.jsonify(
+            {"created": len(notices_data) - updated, "updated": updated}
+        ),
+        200,
+    )
+
+
 @authorization_required
 def delete_notice(notice_id):
     """
@@ -402,8 +873,13 @@ def delete_notice(notice_id):
             404,
         )
 
+    sitemap_since = notice.published
+
     db_session.delete(notice)
     db_session.commit()
+    _invalidate_caches(security_stats, feed_cache)
+
+    refresh_sitemap("notices", since=sitemap_since)
 
     return flask.jsonify({"message": f"Notice {notice_id} deleted"}), 200
 
@@ -438,6 +914,7 @@ def create_release():
     )
 
     db_session.add(release)
+    release_registry.invalidate()
 
     try:
         db_session.commit()
@@ -485,6 +962,7 @@ def delete_release(codename):
         )
 
     db_session.delete(release)
+    release_registry.invalidate()
     db_session.commit()
 
     return flask.jsonify({"message": f"Release {codename} deleted"}), 200
@@ -492,63 +970,30 @@ def delete_release(codename):
 
 # CVE views
 # ===
-def cve_index():
-    """
-    Display the list of CVEs, with pagination.
-    Also accepts the following filtering query parameters:
-    - order-by - "oldest" or "newest"
-    - query - search query for the description field
-    - priority
-    - limit - default 20
-    - offset - default 0
+def _get_cve_filters(args):
     """
-    # Query parameters
-    query = flask.request.args.get("q", "").strip()
-    priority = flask.request.args.get("priority")
-    package = flask.request.args.get("package")
-    limit = flask.request.args.get("limit", default=20, type=int)
-    offset = flask.request.args.get("offset", default=0, type=int)
-    component = flask.request.args.get("component")
-    versions = flask.request.args.getlist("version")
-    statuses = flask.request.args.getlist("status")
-
-    is_cve_id = re.match(r"^CVE-\d{4}-\d{4,7}$", query.upper())
+    Parse the CVE listing filters from the query parameters, for
+    the CVE index page and the CVEs JSON API
 
-    if is_cve_id and db_session.query(CVE).get(query.upper()):
-        return flask.redirect(f"/security/{query.lower()}")
-
-    all_releases = (
-        db_session.query(Release)
-        .order_by(desc(Release.release_date))
-        .filter(Release.codename != "upstream")
-        .all()
-    )
+    Returns the filters for get_cves_query and the releases in scope
+    """
 
-    releases_query = db_session.query(Release).order_by(Release.release_date)
+    versions = args.getlist("version")
+    statuses = args.getlist("status")
 
     if versions and not any(a in ["", "current"] for a in versions):
-        releases_query = releases_query.filter(Release.codename.in_(versions))
+        releases = [
+            release
+            for release in reversed(release_registry.releases())
+            if release.codename in versions
+        ]
     else:
-        releases_query = releases_query.filter(
-            or_(
-                Release.support_expires > datetime.now(),
-                Release.esm_expires > datetime.now(),
-            )
-        ).filter(Release.codename != "upstream")
-
-    releases = releases_query.all()
-
-    should_filter_by_version_and_status = (
-        versions and statuses and len(versions) == len(statuses)
-    )
+        releases = release_registry.supported_releases()
 
     clean_versions = []
     clean_statuses = []
-    if should_filter_by_version_and_status:
-        raw_all_statuses = db_session.execute(
-            "SELECT unnest(enum_range(NULL::statuses));"
-        ).fetchall()
-        all_statuses = ["".join(s) for s in raw_all_statuses]
+    if versions and statuses and len(versions) == len(statuses):
+        all_statuses = release_registry.statuses()
 
         clean_versions = [
             (
@@ -563,135 +1008,205 @@ def cve_index():
             ([status] if status != "" else all_statuses) for status in statuses
         ]
 
-    # query cves by filters
-    cves_query = db_session.query(
-        CVE, func.count("*").over().label("total")
-    ).filter(CVE.status == "active")
-
-    if priority:
-        cves_query = cves_query.filter(CVE.priority == priority)
-
-    if query:
-        cves_query = cves_query.filter(
-            or_(
-                CVE.description.ilike(f"%{query}%"),
-                CVE.ubuntu_description.ilike(f"%{query}%"),
-            )
-        )
+    filters = {
+        "query": args.get("q", "").strip(),
+        "priority": args.get("priority"),
+        "package": args.get("package"),
+        "component": args.get("component"),
+        "clean_versions": clean_versions,
+        "clean_statuses": clean_statuses,
+    }
+
+    return filters, releases
 
-    parameters = []
+
+def _filter_packages(packages, filters):
+    """
+    Narrow a CVE's {package_name: {codename: status}} dict down to the
+    packages that match the filters
+    """
+
+    package = filters["package"]
+    component = filters["component"]
+    clean_versions = filters["clean_versions"]
+    clean_statuses = filters["clean_statuses"]
+
+    # filter by package name
     if package:
-        parameters.append(Status.package_name == package)
+        packages = {
+            package_name: package_statuses
+            for package_name, package_statuses in packages.items()
+            if package_name == package
+        }
 
+    # filter by component
     if component:
-        parameters.append(Status.component == component)
-
-    if should_filter_by_version_and_status:
-        conditions = []
-        for key, version in enumerate(clean_versions):
-            conditions.append(
-                and_(
-                    Status.release_codename.in_(version),
-                    Status.status.in_(clean_statuses[key]),
+        packages = {
+            package_name: package_statuses
+            for package_name, package_statuses in packages.items()
+            if any(
+                status.component == component
+                for status in package_statuses.values()
+            )
+        }
+
+    if clean_versions:
+        packages = {
+            package_name: package_statuses
+            for package_name, package_statuses in packages.items()
+            if all(
+                any(
+                    package_status.release_codename in version
+                    and package_status.status in clean_statuses[key]
+                    for package_status in package_statuses.values()
                 )
+                for key, version in enumerate(clean_versions)
             )
+        }
+
+    return packages
+
+
+def _cves_count(filters):
+    return results_count_cache.get_or_set(
+        (
+            "cves",
+            filters["query"],
+            filters["priority"],
+            filters["package"],
+            filters["component"],
+            repr(filters["clean_versions"]),
+            repr(filters["clean_statuses"]),
+        ),
+        lambda: count_cves(**filters),
+    )
+
+
+def _cve_facet_counts(filters, releases):
+    codenames = [release.codename for release in releases]
+
+    return results_count_cache.get_or_set(
+        (
+            "cve_facets",
+            filters["query"],
+            filters["priority"],
+            filters["package"],
+            filters["component"],
+            repr(filters["clean_versions"]),
+            repr(filters["clean_statuses"]),
+            tuple(codenames),
+        ),
+        lambda: get_cve_facet_counts(codenames, **filters),
+    )
+
+
+def cve_index():
+    """
+    Display the list of CVEs, with pagination.
+    Also accepts the following filtering query parameters:
+    - order-by - "oldest" or "newest"
+    - query - search query for the description field
+    - priority
+    - limit - default 20
+    - after / before - pagination cursors
+    - offset - legacy, redirects to the equivalent cursor
+    """
+    # Query parameters
+    query = flask.request.args.get("q", "").strip()
+    priority = flask.request.args.get("priority")
+    package = flask.request.args.get("package")
+    limit = flask.request.args.get("limit", default=20, type=int)
+    offset = flask.request.args.get("offset", default=0, type=int)
+    after = flask.request.args.get("after", type=str)
+    before = flask.request.args.get("before", type=str)
+    component = flask.request.args.get("component")
+    versions = flask.request.args.getlist("version")
+    statuses = flask.request.args.getlist("status")
+
+    is_cve_id = re.match(r"^CVE-\d{4}-\d{4,7}$", query.upper())
+
+    if (
+        is_cve_id
+        and db_session.query(CVE.id).filter(CVE.id == query.upper()).scalar()
+    ):
+        return flask.redirect(f"/security/{query.lower()}")
 
-        parameters.append(or_(*[c for c in conditions]))
+    all_releases = [
+        release
+        for release in release_registry.releases()
+        if release.codename != "upstream"
+    ]
 
-        conditions = []
-        for key, version in enumerate(clean_versions):
-            sub_conditions = [
-                Status.release_codename.in_(version),
-                Status.status.in_(clean_statuses[key]),
-                CVE.id == Status.cve_id,
-            ]
+    # query cves by filters
+    filters, releases = _get_cve_filters(flask.request.args)
 
-            if package:
-                sub_conditions.append(Status.package_name == package)
+    # The in-process engine, when it's enabled, answers the filters
+    # without a text search
+    status_index = None if filters["query"] else status_engine.current()
 
-            if component:
-                sub_conditions.append(Status.component == component)
+    if not status_index:
+        cves_query, sort_keys = get_cves_query(**filters)
 
-            condition = Package.statuses.any(
-                and_(*[sc for sc in sub_conditions])
+    # Redirect legacy offset links to the equivalent cursor
+    if offset > 0 and not (after or before):
+        if status_index:
+            cursor = status_index.cursor_for_offset(
+                offset, offset // limit + 1, **filters
+            )
+        else:
+            cursor = cursor_for_offset(
+                cves_query, sort_keys, offset=offset, page=offset // limit + 1
             )
 
-            conditions.append(condition)
+        if not cursor:
+            flask.abort(404)
 
-        parameters.append(Status.package.has(and_(*[c for c in conditions])))
-    else:
-        parameters.append(Status.status.in_(Status.active_statuses))
+        return _redirect_to_cursor(cursor, legacy_param="offset")
 
-    if len(parameters) > 0:
-        cves_query = cves_query.filter(
-            CVE.statuses.any(and_(*[p for p in parameters]))
-        )
+    try:
+        if status_index:
+            cve_ids, pagination = status_index.paginate(
+                limit, after=after, before=before, **filters
+            )
+        else:
+            cve_ids, pagination = paginate(
+                cves_query, sort_keys, limit, after=after, before=before
+            )
+    except InvalidCursorError:
+        flask.abort(400, "Invalid pagination cursor")
 
-    cves_query = (
-        cves_query.group_by(CVE.id)
-        .order_by(
-            case(
-                [(CVE.published.is_(None), 1)],
-                else_=0,
-            ),
-            desc(CVE.published),
+    if status_index:
+        total_results = status_index.count(**filters)
+        facet_counts = status_index.facet_counts(
+            [release.codename for release in releases], **filters
         )
-        .limit(limit)
-        .offset(offset)
-        .from_self()
-        .join(CVE.statuses)
-        .options(contains_eager(CVE.statuses))
-    )
+        matching_packages = status_index.packages(cve_ids, **filters)
+    else:
+        total_results = _cves_count(filters)
+        facet_counts = _cve_facet_counts(filters, releases)
 
-    raw_cves = cves_query.all()
+    offset = (pagination["current_page"] - 1) * limit
 
-    # Pagination
-    total_results = raw_cves[0][1] if raw_cves else 0
+    raw_cves = get_cves_by_ids(cve_ids)
 
     cves = []
     for raw_cve in raw_cves:
-        packages = raw_cve[0].packages
-
-        # filter by package name
-        if package:
-            packages = {
-                package_name: package_statuses
-                for package_name, package_statuses in packages.items()
-                if package_name == package
-            }
-
-        # filter by component
-        if component:
+        if status_index:
             packages = {
                 package_name: package_statuses
-                for package_name, package_statuses in packages.items()
-                if any(
-                    status.component == component
-                    for status in package_statuses.values()
-                )
-            }
-
-        if should_filter_by_version_and_status:
-            packages = {
-                package_name: package_statuses
-                for package_name, package_statuses in packages.items()
-                if all(
-                    any(
-                        package_status.release_codename in version
-                        and package_status.status in clean_statuses[key]
-                        for package_status in package_statuses.values()
-                    )
-                    for key, version in enumerate(clean_versions)
-                )
+                for package_name, package_statuses in raw_cve.packages.items()
+                if package_name in matching_packages.get(raw_cve.id, ())
             }
+        else:
+            packages = _filter_packages(raw_cve.packages, filters)
 
         # do not return cve if it has no packages left
         if not packages:
             continue
 
         cve = {
-            "id": raw_cve[0].id,
-            "priority": raw_cve[0].priority,
+            "id": raw_cve.id,
+            "priority": raw_cve.priority,
             "packages": packages,
         }
 
@@ -703,9 +1218,11 @@ def cve_index():
         all_releases=all_releases,
         cves=cves,
         total_results=total_results,
+        facet_counts=facet_counts,
         total_pages=ceil(total_results / limit),
         offset=offset,
         limit=limit,
+        pagination=pagination,
         priority=priority,
         query=query,
         package=package,
@@ -715,12 +1232,297 @@ def cve_index():
     )
 
 
+def _packages_json(packages):
+    """
+    A {package_name: {codename: status}} dict of status rows
+    in the shape of the JSON APIs
+    """
+
+    return [
+        {
+            "name": name,
+            "statuses": [
+                {field: getattr(status, field) for field in STATUS_JSON_FIELDS}
+                for status in package_statuses.values()
+            ],
+        }
+        for name, package_statuses in packages.items()
+    ]
+
+
+def cves_json():
+    """
+    The CVE listing as JSON, with the same filters as cve_index()
+    and cursor pagination. Only the listing columns are fetched;
+    the CVE's page, /security/<cve_id>, has the full CVE.
+    - limit - default 20
+    - after / before - pagination cursors
+    """
+
+    limit = flask.request.args.get("limit", default=20, type=int)
+    after = flask.request.args.get("after", type=str)
+    before = flask.request.args.get("before", type=str)
+
+    if limit < 1:
+        flask.abort(400, "limit must be a positive number")
+
+    filters, _ = _get_cve_filters(flask.request.args)
+    cves_query, sort_keys = get_cves_query(**filters)
+    total_results = _cves_count(filters)
+
+    try:
+        rows, pagination = stream_page(
+            cves_query.with_entities(*CVE_JSON_COLUMNS),
+            sort_keys,
+            limit,
+            after=after,
+            before=before,
+        )
+    except InvalidCursorError:
+        flask.abort(400, "Invalid pagination cursor")
+
+    def cves():
+        for rows_batch in batches(rows, size=500):
+            statuses = get_statuses_by_cve_ids([row[0] for row in rows_batch])
+
+            for row in rows_batch:
+                cve = dict(zip(CVE_JSON_FIELDS, row))
+                packages = _filter_packages(statuses[cve["id"]], filters)
+
+                # Like the CVE index, skip CVEs with no packages left
+                if not packages:
+                    continue
+
+                cve["packages"] = _packages_json(packages)
+
+                yield cve
+
+    return _json_listing_response(
+        "cves", cves(), pagination, total_results=total_results, limit=limit
+    )
+
+
+def _package_cves_page(package_name):
+    """
+    Parse the query parameters of the package CVE views and fetch
+    a page of the CVEs affecting the package:
+    - release - only CVEs with a status in this release
+    - status - only CVEs with this status, in the release if given
+    - limit - default 20
+    - after / before - pagination cursors
+
+    Returns the CVE rows with their statuses, the package's releases,
+    the total number of CVEs and the pagination dict
+    """
+
+    release = flask.request.args.get("release")
+    status = flask.request.args.get("status")
+    limit = flask.request.args.get("limit", default=20, type=int)
+    after = flask.request.args.get("after", type=str)
+    before = flask.request.args.get("before", type=str)
+
+    if limit < 1:
+        flask.abort(400, "limit must be a positive number")
+
+    if release and release not in release_registry.codenames():
+        flask.abort(400, f"Unknown release '{release}'")
+
+    if status and status not in release_registry.statuses():
+        flask.abort(400, f"Unknown status '{status}'")
+
+    if not db_session.query(Package).get(package_name):
+        flask.abort(404, f"Cannot find a package named '{package_name}'")
+
+    cves_query, sort_keys = get_package_cves_query(
+        package_name, release=release, status=status
+    )
+    total_results = results_count_cache.get_or_set(
+        ("package_cves", package_name, release, status), cves_query.count
+    )
+
+    try:
+        rows, pagination = paginate(
+            cves_query.with_entities(*CVE_JSON_COLUMNS),
+            sort_keys,
+            limit,
+            after=after,
+            before=before,
+        )
+    except InvalidCursorError:
+        flask.abort(400, "Invalid pagination cursor")
+
+    statuses = get_statuses_by_cve_ids(
+        [row[0] for row in rows], package_name=package_name
+    )
+    codenames = get_package_release_codenames(package_name)
+    releases = [
+        release
+        for release in reversed(release_registry.releases())
+        if release.codename in codenames
+    ]
+    cves = [
+        {
+            **dict(zip(CVE_JSON_FIELDS, row)),
+            "statuses": statuses[row[0]][package_name],
+        }
+        for row in rows
+    ]
+
+    return cves, releases, total_results, pagination
+
+
+def cve_package(package_name):
+    """
+    The CVEs affecting a package, newest first, with the package's
+    status in each release
+    """
+
+    cves, releases, total_results, pagination = _package_cves_page(
+        package_name
+    )
+
+    return flask.render_template(
+        "security/cve/package.html",
+        package=package_name,
+        cves=[
+            {
+                "id": cve["id"],
+                "priority": cve["priority"],
+                "packages": {package_name: cve["statuses"]},
+            }
+            for cve in cves
+        ],
+        releases=releases,
+        total_results=total_results,
+        pagination=pagination,
+        release=flask.request.args.get("release"),
+        status=flask.request.args.get("status"),
+        all_releases=[
+            release
+            for release in release_registry.releases()
+            if release.codename != "upstream"
+        ],
+    )
+
+
+def cve_package_json(package_name):
+    """
+    The CVEs affecting a package as JSON, with the package's status
+    in each release
+    """
+
+    cves, releases, total_results, pagination = _package_cves_page(
+        package_name
+    )
+
+    for cve in cves:
+        cve["statuses"] = {
+            codename: {
+                field: getattr(status, field)
+                for field in STATUS_JSON_FIELDS
+                if field != "release_codename"
+            }
+            for codename, status in cve["statuses"].items()
+        }
+
+    return _json_listing_response(
+        "cves",
+        cves,
+        pagination,
+        package=package_name,
+        releases=[release.codename for release in releases],
+        total_results=total_results,
+    )
+
+
+def changes_json():
+    """
+    The CVEs and notices which changed, or were deleted, in the order
+    they changed, for mirrors to sync from. Each change has the
+    current CVE or notice, as in the JSON listings, unless it was
+    deleted.
+    - since - the next_cursor of the previous response, to list the
+      changes after it, or none to start from the beginning
+    - limit - default 100, at most 1000
+
+    next_cursor is always set, so that it can be stored for the next
+    sync, and has_more tells whether to fetch the next page now.
+    """
+
+    since = flask.request.args.get("since", type=str)
+    limit = flask.request.args.get("limit", default=100, type=int)
+
+    if not 1 <= limit <= CHANGES_MAX_LIMIT:
+        flask.abort(400, f"limit must be between 1 and {CHANGES_MAX_LIMIT}")
+
+    after = None
+    page = 1
+
+    if since:
+        try:
+            values, page = decode_cursor(since)
+            changed_at, kind, change_id = values
+            after = (dateutil.parser.isoparse(changed_at), kind, change_id)
+        except (InvalidCursorError, ValueError, TypeError):
+            flask.abort(400, "Invalid since cursor")
+
+    # Transactions still running on the primary, which settle the
+    # changes, can't be seen from a replica
+    db_session().use_primary()
+    changes, has_more = get_changes(after=after, limit=limit)
+    ids = {"cve": [], "notice": []}
+
+    for _, kind, change_id, deleted in changes:
+        if not deleted:
+            ids[kind].append(change_id)
+
+    pagination = {"previous_cursor": None, "next_cursor": since}
+
+    if changes:
+        pagination["next_cursor"] = encode_cursor(changes[-1][:3], page + 1)
+
+    def items():
+        payloads = {}
+        statuses = get_statuses_by_cve_ids(ids["cve"])
+
+        for row in db_session.query(*CVE_JSON_COLUMNS).filter(
+            CVE.id.in_(ids["cve"])
+        ):
+            cve = dict(zip(CVE_JSON_FIELDS, row))
+            cve["packages"] = _packages_json(statuses[cve["id"]])
+            payloads["cve", cve["id"]] = cve
+
+        cve_ids, codenames = get_notices_associations(ids["notice"])
+
+        for row in db_session.query(*NOTICE_JSON_COLUMNS).filter(
+            Notice.id.in_(ids["notice"])
+        ):
+            notice = dict(zip(NOTICE_JSON_FIELDS, row))
+            notice["type"] = notice_type(notice["id"])
+            notice["cves_ids"] = sorted(cve_ids[notice["id"]])
+            notice["releases"] = codenames[notice["id"]]
+            payloads["notice", notice["id"]] = notice
+
+        for changed_at, kind, change_id, deleted in changes:
+            yield {
+                "kind": kind,
+                "id": change_id,
+                "changed_at": changed_at,
+                "deleted": deleted,
+                "payload": payloads.get((kind, change_id)),
+            }
+
+    return _json_listing_response(
+        "changes", items(), pagination, has_more=has_more, limit=limit
+    )
+
+
 def cve(cve_id):
     """
     Retrieve and display an individual CVE details page
     """
 
-    cve = security_api.get_cve(cve_id)
+    cve = _get_cve(cve_id)
 
     if not cve:
         flask.abort(404, f"Cannot find a CVE with ID '{cve_id}'")
@@ -733,66 +1535,57 @@ def cve(cve_id):
     return flask.render_template("security/cve/cve.html", cve=cve)
 
 
-# CVE API
+# Exports
 # ===
-def update_statuses(cve, data, packages):
-    statuses = cve.packages
-
-    statuses_query = db_session.query(Status).filter(Status.cve_id == cve.id)
-    statuses_to_delete = {
-        f"{v.package_name}||{v.release_codename}": v
-        for v in statuses_query.all()
-    }
 
-    for package_data in data.get("packages", []):
-        name = package_data["name"]
 
-        if packages.get(name) is None:
-            package = Package(name=name)
-            package.source = package_data["source"]
-            package.ubuntu = package_data["ubuntu"]
-            package.debian = package_data["debian"]
-            packages[name] = package
+def exports_index():
+    """
+    The index of the current export files, see webapp.security.exports
+    """
 
-            db_session.add(package)
+    path = os.path.join(EXPORTS_DIR, MANIFEST)
 
-        for status_data in package_data["statuses"]:
-            update_status = False
-            codename = status_data["release_codename"]
+    if not os.path.exists(path):
+        flask.abort(404)
 
-            status = statuses[name].get(codename)
-            if status is None:
-                update_status = True
-                status = Status(
-                    cve_id=cve.id, package_name=name, release_codename=codename
-                )
-            elif f"{name}||{codename}" in statuses_to_delete:
-                del statuses_to_delete[f"{name}||{codename}"]
+    with open(path, "rb") as manifest_file:
+        manifest = manifest_file.read()
 
-            if status.status != status_data["status"]:
-                update_status = True
-                status.status = status_data["status"]
+    response = flask.make_response(manifest)
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Cache-Control"] = "public, max-age=300"
+    response.set_etag(hashlib.sha1(manifest).hexdigest())
 
-            if status.description != status_data["description"]:
-                update_status = True
-                status.description = status_data["description"]
+    return response.make_conditional(flask.request)
 
-            if status.component != status_data.get("component"):
-                update_status = True
-                status.component = status_data.get("component")
 
-            if status.pocket != status_data.get("pocket"):
-                update_status = True
-                status.pocket = status_data.get("pocket")
+def export_file(file_name):
+    """
+    An export file. Their names change with their content, so they
+    can be cached for as long as they exist.
+    """
 
-            if update_status:
-                statuses[name][codename] = status
-                db_session.add(status)
+    if file_name.startswith(".") or not file_name.endswith(
+        tuple(
+            export_format["extension"]
+            for export_format in EXPORT_FORMATS.values()
+        )
+    ):
+        flask.abort(404)
 
-    for key in statuses_to_delete:
-        db_session.delete(statuses_to_delete[key])
+    # Names are unique to their content
+    return flask.send_from_directory(
+        EXPORTS_DIR,
+        file_name,
+        max_age=EXPORT_RETENTION_SECONDS,
+        mimetype="application/gzip",
+        etag=file_name,
+    )
 
 
+# CVE API
+# ===
 @authorization_required
 def delete_cve(cve_id):
     """
@@ -802,6 +1595,14 @@ def delete_cve(cve_id):
     cve_query = db_session.query(CVE)
     cve = cve_query.filter(CVE.id == cve_id).first()
 
+    if not cve:
+        return (
+            flask.jsonify({"message": f"CVE {cve_id} doesn't exist"}),
+            404,
+        )
+
+    sitemap_since = cve.published or NULL_PUBLISHED
+
     try:
         db_session.delete(cve)
         db_session.commit()
@@ -809,199 +1610,118 @@ def delete_cve(cve_id):
     except IntegrityError as error:
         return flask.jsonify({"message": error.orig.args[0]}), 400
 
+    _invalidate_caches(security_stats)
+    refresh_sitemap("cves", since=sitemap_since)
+
     return flask.jsonify({"message": "CVE deleted successfully"}), 200
 
 
+def _ndjson_lines(stream):
+    """
+    Parse each non-empty line of a newline-delimited JSON stream,
+    along with its line number
+    """
+
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield number, json.loads(line)
+
+
 @authorization_required
 def bulk_upsert_cve():
     """
     Receives a PUT request from load_cve.py
     Parses the object and bulk inserts or updates
-    @returns 3 lists of CVEs, created CVEs, updated CVEs and failed CVEs
+
+    Accepts either a JSON list of CVEs, or any number of CVEs as
+    newline-delimited JSON (application/x-ndjson), which is read and
+    committed in batches as it streams in. If a batch fails, the
+    response has the line numbers of the errors, so the rest of the
+    stream can be resubmitted.
+    @returns the number of created, updated and deleted rows per model
     """
 
     cves_schema = CVESchema(many=True)
-    cves_schema.context["release_codenames"] = [
-        rel.codename for rel in db_session.query(Release).all()
-    ]
+    cves_schema.context["release_codenames"] = release_registry.codenames()
 
-    try:
-        cves_data = cves_schema.load(flask.request.json)
-    except ValidationError as error:
-        return (
-            flask.jsonify(
-                {"message": "Invalid payload", "errors": error.messages}
-            ),
-            400,
-        )
-
-    if len(cves_data) > 50:
-        return (
-            flask.jsonify(
-                {
-                    "message": (
-                        "Please only submit up to 50 CVEs at a time. "
-                        f"({len(cves_data)} submitted)"
-                    )
-                }
-            ),
-            413,
-        )
-
-    packages = {}
-    for package in db_session.query(Package).all():
-        packages[package.name] = package
-
-    for data in cves_data:
-        update_cve = False
-        cve = db_session.query(CVE).get(data["id"])
-
-        if cve is None:
-            update_cve = True
-            cve = CVE(id=data["id"])
-
-        if cve.status != data.get("status"):
-            update_cve = True
-            cve.status = data.get("status")
-
-        published_date = (
-            cve.published.strftime("%Y-%B-%d") if cve.published else None
-        )
-        data_published_date = (
-            data.get("published").strftime("%Y-%B-%d")
-            if data.get("published")
-            else None
-        )
-        if published_date != data_published_date:
-            update_cve = True
-            cve.published = data.get("published")
-
-        if cve.priority != data.get("priority"):
-            update_cve = True
-            cve.priority = data.get("priority")
-
-        if cve.cvss3 != data.get("cvss3"):
-            update_cve = True
-            cve.cvss3 = data.get("cvss3")
-
-        if cve.description != data.get("description"):
-            update_cve = True
-            cve.description = data.get("description")
-
-        if cve.ubuntu_description != data.get("ubuntu_description"):
-            update_cve = True
-            cve.ubuntu_description = data.get("ubuntu_description")
-
-        if cve.notes != data.get("notes"):
-            update_cve = True
-            cve.notes = data.get("notes")
-
-        if cve.references != data.get("references"):
-            update_cve = True
-            cve.references = data.get("references")
-
-        if cve.bugs != data.get("bugs"):
-            update_cve = True
-            cve.bugs = data.get("bugs")
-
-        if cve.patches != data.get("patches"):
-            update_cve = True
-            cve.patches = data.get("patches")
-
-        if cve.tags != data.get("tags"):
-            update_cve = True
-            cve.tags = data.get("tags")
-
-        if cve.mitigation != data.get("mitigation"):
-            update_cve = True
-            cve.mitigation = data.get("mitigation")
-
-        if update_cve:
-            db_session.add(cve)
-
-        update_statuses(cve, data, packages)
+    if flask.request.mimetype == "application/x-ndjson":
+        cve_batches = batches(_ndjson_lines(flask.request.stream))
+    else:
+        cve_batches = batches(enumerate(flask.request.json or [], start=1))
 
-    created = defaultdict(lambda: 0)
-    updated = defaultdict(lambda: 0)
-    deleted = defaultdict(lambda: 0)
+    # Rows in committed batches
+    counters = new_counters()
+    sitemap_since = None
 
-    for item in db_session.new:
-        created[type(item).__name__] += 1
+    def refresh_cves_caches():
+        # Once for all the committed batches, if any rows changed
+        if any(+count for count in counters.values()):
+            _invalidate_caches(security_stats)
 
-    for item in db_session.dirty:
-        updated[type(item).__name__] += 1
+        if sitemap_since is not None:
+            refresh_sitemap("cves", since=sitemap_since)
 
-    for item in db_session.deleted:
-        deleted[type(item).__name__] += 1
+    def error_response(message, **errors):
+        db_session.rollback()
+        refresh_cves_caches()
 
-    try:
-        db_session.commit()
-    except DataError as error:
         return (
             flask.jsonify(
                 {
-                    "message": "Failed bulk upserting session",
-                    "error": error.orig.args[0],
+                    "message": message,
+                    **errors,
+                    **{name: +count for name, count in counters.items()},
                 }
             ),
             400,
         )
 
-    return (
-        flask.jsonify(
-            {"created": created, "updated": updated, "deleted": deleted}
-        ),
-        200,
-    )
+    try:
+        for batch in cve_batches:
+            numbers = [number for number, _ in batch]
+
+            try:
+                cves_data = cves_schema.load([data for _, data in batch])
+            except ValidationError as error:
+                return error_response(
+                    "Invalid payload",
+                    errors={
+                        numbers[index]: messages
+                        for index, messages in error.messages.items()
+                    },
+                )
 
+            batch_since = earliest_change(
+                CVE,
+                [data["id"] for data in cves_data],
+                [data.get("published") for data in cves_data],
+            )
+            batch_counters = upsert_cves(cves_data)
+            db_session.commit()
+
+            for name, count in batch_counters.items():
+                counters[name] += count
+
+            if batch_since is not None:
+                sitemap_since = min(sitemap_since or batch_since, batch_since)
+    except (json.JSONDecodeError, UnicodeDecodeError) as error:
+        return error_response("Invalid JSON", error=str(error))
+    except (DataError, IntegrityError) as error:
+        return error_response(
+            "Failed bulk upserting session", error=error.orig.args[0]
+        )
 
-def single_cves_sitemap(offset):
-    cves = (
-        db_session.query(CVE)
-        .order_by(CVE.published)
-        .offset(offset)
-        .limit(10000)
-        .all()
-    )
+    refresh_cves_caches()
 
-    xml_sitemap = flask.render_template(
-        "sitemap.xml",
-        links=[
-            {
-                "url": f"https://ubuntu.com/security/{cve.id}",
-                "last_updated": (
-                    cve.published.strftime("%Y-%m-%d") if cve.published else ""
-                ),
-            }
-            for cve in cves
-        ],
+    return (
+        flask.jsonify({name: +count for name, count in counters.items()}),
+        200,
     )
 
-    response = flask.make_response(xml_sitemap)
-    response.headers["Content-Type"] = "application/xml"
-    response.headers["Cache-Control"] = "public, max-age=43200"
 
-    return response
+def single_cves_sitemap(offset):
+    return _sitemap_shard_response("cves", offset)
 
 
 def cves_sitemap():
-    cves_count = db_session.query(CVE).order_by(CVE.published).count()
-
-    base_url = "https://ubuntu.com/security/cve"
-
-    xml_sitemap = flask.render_template(
-        "sitemap_index_template.xml",
-        base_url=base_url,
-        links=[
-            {
-                "url": f"{base_url}/sitemap-{link * 10000}.xml",
-            }
-            for link in range(ceil(cves_count / 10000))
-        ],
-    )
-
-    response = flask.make_response(xml_sitemap)
-    response.headers["Content-Type"] = "application/xml"
-    response.headers["Cache-Control"] = "public, max-age=43200"
-
-    return response
+    return _sitemap_index_response("cves", "https://ubuntu.com/security/cve")
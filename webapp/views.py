@@ -5,7 +5,6 @@ import re
 import html
 
 # Packages
-import dateutil
 import feedparser
 import flask
 import talisker.requests
@@ -14,10 +13,10 @@ import jinja2
 from ubuntu_release_info.data import Data
 from geolite2 import geolite2
 from requests import Session
-from requests.exceptions import HTTPError
 from canonicalwebteam.search.models import get_search_results
 from canonicalwebteam.search.views import NoAPIKeyError
 from bs4 import BeautifulSoup
+from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import BadRequest
 from canonicalwebteam.discourse import (
     DiscourseAPI,
@@ -28,6 +27,7 @@ from canonicalwebteam.discourse import (
 # Local
 from webapp.login import user_info
 from webapp.marketo import MarketoAPI
+from webapp.security.stats import security_stats
 
 ip_reader = geolite2.reader()
 session = talisker.requests.get_session()
@@ -88,59 +88,37 @@ def _build_mirror_list(local=False):
 
 
 def sixteen_zero_four():
-    host = "https://ubuntu.com"
     total_notices_issued = "-"
     total_cves_issued = "-"
+    notices_since_esm = "-"
     latest_notices = []
 
     try:
-        response = session.request(
-            method="GET",
-            url=f"{host}/security/notices.json?release=xenial&limit=1",
-        )
-
-        total_notices_issued = response.json().get("total_results")
-    except HTTPError:
-        flask.current_app.extensions["sentry"].captureException()
-
-    try:
-        response = session.request(
-            method="GET",
-            url=(
-                f"{host}/security/cves.json"
-                f"?version=xenial&status=released&limit=1"
-            ),
-        )
-
-        total_cves_issued = response.json().get("total_results")
-    except HTTPError:
+        stats = security_stats.release_stats("xenial", latest=5)
+    except SQLAlchemyError:
         flask.current_app.extensions["sentry"].captureException()
-
-    try:
-        response = session.request(
-            method="GET",
-            url=f"{host}/security/notices.json?release=xenial&limit=5",
-        )
-
+    else:
+        total_notices_issued = f"{stats['notices']:,}"
+        total_cves_issued = f"{stats['released_cves']:,}"
+        notices_since_esm = stats["notices"] - 1477
         latest_notices = [
             {
-                "id": notice.get("id"),
-                "title": notice.get("title"),
-                "date": dateutil.parser.parse(
-                    notice.get("published")
-                ).strftime("%d %B %Y"),
-                "summary": notice.get("summary"),
+                "id": notice["id"],
+                "title": notice["title"],
+                "date": (
+                    notice["published"].strftime("%d %B %Y")
+                    if notice["published"]
+                    else ""
+                ),
+                "summary": notice["summary"],
             }
-            for notice in response.json().get("notices")
+            for notice in stats["latest_notices"]
         ]
-    except HTTPError:
-        flask.current_app.extensions["sentry"].captureException()
 
-    notices_since_esm = total_notices_issued - 1477
     context = {
         "total_patches_applied": 69,  # hard-coded for now
-        "total_notices_issued": f"{total_notices_issued:,}",
-        "total_cves_issued": f"{total_cves_issued:,}",
+        "total_notices_issued": total_notices_issued,
+        "total_cves_issued": total_cves_issued,
         "latest_notices": latest_notices,
         "notices_since_esm": notices_since_esm,
     }